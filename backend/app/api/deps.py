@@ -1,33 +1,68 @@
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
-from sqlalchemy.orm import Session
-from app.database import get_db
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import make_transient_to_detached
+from typing import Optional
+from uuid import UUID
+from app.database import get_db, get_read_db
 from app.utils.security import decode_token
 from app.models.user import User
+from app.services.principal_cache import principal_cache
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="api/v1/auth/login")
 
-async def get_current_user(
-    token: str = Depends(oauth2_scheme),
-    db: Session = Depends(get_db)
-) -> User:
-    """Get current authenticated user"""
-    credentials_exception = HTTPException(
-        status_code=status.HTTP_401_UNAUTHORIZED,
-        detail="Could not validate credentials",
-        headers={"WWW-Authenticate": "Bearer"},
-    )
+async def _attach(db: AsyncSession, columns: dict) -> User:
+    """Attach a user row loaded elsewhere to this session without a SELECT"""
+    user = User(**columns)
+    make_transient_to_detached(user)
+    return await db.merge(user, load=False)
 
+async def authenticate_token(token: str, db: AsyncSession, read_db: Optional[AsyncSession] = None) -> Optional[User]:
+    """User for a bearer token, or None if it is invalid; cache misses are looked up on `read_db` if given"""
     payload = decode_token(token)
     if payload is None:
-        raise credentials_exception
+        return None
 
     user_id: str = payload.get("sub")
     if user_id is None:
-        raise credentials_exception
+        return None
 
-    user = db.query(User).filter(User.id == user_id).first()
+    try:
+        user_id = UUID(user_id)
+    except ValueError:
+        return None
+
+    columns = await principal_cache.get(user_id)
+    if columns is not None:
+        return await _attach(db, columns)
+
+    lookup_db = read_db if read_db is not None else db
+    user = await lookup_db.get(User, user_id)
+    if user is None and lookup_db is not db:
+        # Not replicated yet, e.g. a user who just registered
+        lookup_db = db
+        user = await db.get(User, user_id)
     if user is None:
-        raise credentials_exception
+        return None
+
+    await principal_cache.set(user, payload.get("exp"))
 
+    if lookup_db is not db:
+        # Loaded from a replica; the endpoint works with the primary session
+        user = await _attach(db, {column.key: getattr(user, column.key) for column in User.__table__.columns})
+    return user
+
+async def get_current_user(
+    token: str = Depends(oauth2_scheme),
+    db: AsyncSession = Depends(get_db),
+    read_db: AsyncSession = Depends(get_read_db)
+) -> User:
+    """Get current authenticated user"""
+    user = await authenticate_token(token, db, read_db)
+    if user is None:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Could not validate credentials",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
     return user
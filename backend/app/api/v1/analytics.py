@@ -0,0 +1,49 @@
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from sqlalchemy.ext.asyncio import AsyncSession
+from datetime import date, datetime, timedelta
+from typing import Optional
+from app.database import get_read_db
+from app.schemas.analytics import TrainingSummary
+from app.models.user import User
+from app.api.deps import get_current_user
+from app.services.training_rollups import PERIODS, bucket_count, period_start, training_summary
+
+router = APIRouter(prefix="/analytics", tags=["Analytics"])
+
+# Default range per period when no start is given
+DEFAULT_SPAN_DAYS = {"day": 30, "week": 12 * 7, "month": 365}
+MAX_BUCKETS = 366
+
+@router.get("/training", response_model=TrainingSummary)
+async def get_training_summary(
+    period: str = Query("week"),
+    start: Optional[date] = Query(None),
+    end: Optional[date] = Query(None),
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_read_db)
+):
+    """
+    Current user's distance, time, run count and pace distribution per day,
+    week or month between start and end (inclusive, UTC days), with exact
+    totals for the whole range
+    """
+    if period not in PERIODS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Unknown period, expected one of: {', '.join(PERIODS)}"
+        )
+    end = end or datetime.utcnow().date()
+    if start is None:
+        start = period_start(period, end - timedelta(days=DEFAULT_SPAN_DAYS[period] - 1))
+    if start > end:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="start must not be after end"
+        )
+    if bucket_count(period, start, end) > MAX_BUCKETS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Range spans more than {MAX_BUCKETS} {period}s, use a coarser period"
+        )
+
+    return await training_summary(db, current_user.id, period, start, end)
@@ -0,0 +1,163 @@
+import asyncio
+import json
+import time
+from datetime import datetime
+from fastapi import APIRouter, Depends, HTTPException, WebSocket, WebSocketDisconnect, status
+from pydantic import ValidationError
+from sqlalchemy import select, or_
+from sqlalchemy.ext.asyncio import AsyncSession
+from uuid import UUID
+from app.config import settings
+from app.database import AsyncSessionLocal, get_db
+from app.schemas.battle import BattleCreate, BattleProgress, BattleResponse, MatchmakingStatus
+from app.models.battle import Battle
+from app.models.user import User
+from app.api.deps import authenticate_token, get_current_user
+from app.services.battle_channels import (
+    BattleConnection,
+    battle_hub,
+    reachable_distance,
+    record_finish,
+    start_battle,
+    touch_battle,
+)
+from app.services.matchmaking import matchmaker
+
+router = APIRouter(prefix="/battles", tags=["Battles"])
+
+def _matchmaking_status(user_id: UUID) -> MatchmakingStatus:
+    state, battle_id, wait_seconds = matchmaker.status(user_id)
+    return MatchmakingStatus(status=state, battle_id=battle_id, wait_seconds=wait_seconds)
+
+@router.post("/queue", response_model=MatchmakingStatus)
+async def join_matchmaking(
+    battle_data: BattleCreate,
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
+):
+    """Queue for a 1v1 battle at the given distance"""
+    battle_id = matchmaker.enqueue(current_user.id, current_user.elo_rating, battle_data.distance_km)
+
+    # Write the battle now so both players can open it right away
+    if battle_id is not None:
+        await matchmaker.flush(db)
+
+    return _matchmaking_status(current_user.id)
+
+@router.get("/queue", response_model=MatchmakingStatus)
+async def get_matchmaking_status(current_user: User = Depends(get_current_user)):
+    """Poll for an opponent"""
+    return _matchmaking_status(current_user.id)
+
+@router.delete("/queue", status_code=status.HTTP_204_NO_CONTENT)
+async def leave_matchmaking(current_user: User = Depends(get_current_user)):
+    """Stop searching for an opponent"""
+    matchmaker.dequeue(current_user.id)
+
+@router.get("/{battle_id}", response_model=BattleResponse)
+async def get_battle(
+    battle_id: UUID,
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
+):
+    """Get a battle the current user takes part in"""
+    battle = await db.scalar(
+        select(Battle).where(
+            Battle.id == battle_id,
+            or_(Battle.user1_id == current_user.id, Battle.user2_id == current_user.id)
+        )
+    )
+
+    if not battle:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Battle not found"
+        )
+
+    return BattleResponse.model_validate(battle)
+
+@router.websocket("/{battle_id}/live")
+async def battle_live(websocket: WebSocket, battle_id: UUID, token: str = ""):
+    """
+    Live battle channel. Participants send BattleProgress messages; players
+    and spectators receive coalesced progress of both players and the final
+    result. Browsers cannot set headers on WebSockets, so the access token
+    is passed as ?token=. Distances and times are checked against the
+    server's clock since the battle started.
+    """
+    # Short-lived sessions only: an open socket must not hold a pooled connection
+    async with AsyncSessionLocal() as db:
+        user = await authenticate_token(token, db)
+        battle = await db.get(Battle, battle_id) if user else None
+    if battle is None or battle.status in ('completed', 'cancelled'):
+        await websocket.close(code=status.WS_1008_POLICY_VIOLATION)
+        return
+
+    await websocket.accept()
+    is_player = user.id in (battle.user1_id, battle.user2_id)
+    started_at = battle.started_at if battle.status == 'active' else None
+    finished = False
+    last_distance = 0.0
+    # Heartbeats for the abandoned battle sweep, a few per abandon window
+    heartbeat_seconds = settings.BATTLE_ABANDON_SECONDS / 4
+    last_heartbeat = time.monotonic()
+
+    connection = BattleConnection(websocket, settings.BATTLE_UPDATES_PER_SECOND)
+    await battle_hub.connect(battle.id, connection)
+    sender = asyncio.create_task(connection.run())
+    try:
+        while True:
+            text = await websocket.receive_text()
+            # Spectators only listen
+            if not is_player or finished:
+                continue
+
+            try:
+                message = BattleProgress.model_validate(json.loads(text))
+            except (ValueError, ValidationError):
+                await websocket.send_json({"type": "error", "detail": "Invalid message"})
+                continue
+
+            if started_at is None:
+                async with AsyncSessionLocal() as db:
+                    started_at = await start_battle(db, battle.id)
+                last_heartbeat = time.monotonic()
+            elif time.monotonic() - last_heartbeat >= heartbeat_seconds:
+                async with AsyncSessionLocal() as db:
+                    await touch_battle(db, battle.id)
+                last_heartbeat = time.monotonic()
+
+            now = datetime.utcnow()
+            reachable_km = reachable_distance(started_at, now)
+            if message.distance_km > reachable_km:
+                await websocket.send_json({"type": "error", "detail": "Distance ahead of the time since the start, capped"})
+            # Distance never goes backwards, past the finish line or past what the time allows
+            distance_km = min(max(min(message.distance_km, reachable_km), last_distance), battle.distance_km)
+            last_distance = distance_km
+            # Only covering the battle distance finishes a race; an early finish counts as progress
+            done = distance_km >= battle.distance_km
+            if message.type == "finish" and not done:
+                await websocket.send_json({"type": "error", "detail": "Battle distance not covered yet"})
+
+            await battle_hub.publish(battle.id, {
+                "type": "progress",
+                "user_id": str(user.id),
+                "distance_km": distance_km,
+                "elapsed_seconds": message.elapsed_seconds,
+                "finished": done,
+            })
+
+            # The only result write: once per player, when they finish
+            if done:
+                finished = True
+                # Never faster than the server saw since the start
+                elapsed_seconds = max(message.elapsed_seconds, int((now - started_at).total_seconds()), 1)
+                async with AsyncSessionLocal() as db:
+                    result = await record_finish(db, battle, user.id, distance_km, elapsed_seconds)
+                if result is not None:
+                    await battle_hub.publish(battle.id, result)
+    except WebSocketDisconnect:
+        pass
+    finally:
+        sender.cancel()
+        await battle_hub.disconnect(battle.id, connection)
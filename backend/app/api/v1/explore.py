@@ -0,0 +1,120 @@
+from fastapi import APIRouter, Depends, HTTPException, Query, Response, status
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import List
+import numpy as np
+from app.config import settings
+from app.database import get_read_db
+from app.schemas.explore import NearbyRun, StartPoint
+from app.models.run import Run
+from app.models.user import User
+from app.api.deps import get_current_user
+from app.services.heatmap import heatmap
+from app.services.run_validation import UNCOUNTED_STATUSES
+from app.services.spatial_index import CELL_BITS, cell_to_geohash, run_start_index, runs_starting_near
+
+router = APIRouter(prefix="/explore", tags=["Explore"])
+
+@router.get("/runs/nearby", response_model=List[NearbyRun])
+async def get_nearby_runs(
+    lat: float = Query(..., ge=-90, le=90),
+    lng: float = Query(..., ge=-180, le=180),
+    radius_km: float = Query(2.0, gt=0, le=settings.NEARBY_MAX_RADIUS_KM),
+    limit: int = Query(50, ge=1, le=200),
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_read_db)
+):
+    """
+    Counted runs that started within radius_km of a point, nearest first.
+    Runs are anonymous and their start points coarsened, so they cannot be
+    traced back to a user's home.
+    """
+    hits = await runs_starting_near(db, lat, lng, radius_km)
+    ids = list(hits.ids[:limit])
+    if not ids:
+        return []
+
+    rows = {
+        row.id: row for row in (await db.execute(
+            select(Run.id, Run.distance_km, Run.start_lat, Run.start_lng, Run.completed_at, Run.validation_status)
+            .where(Run.id.in_(ids))
+        )).mappings().all()
+    }
+    # Runs rejected after they were indexed, e.g. by scripts.revalidate_runs
+    rejected = [run_id for run_id, row in rows.items() if row["validation_status"] in UNCOUNTED_STATUSES]
+    for run_id in rejected:
+        run_start_index.remove(run_id)
+        del rows[run_id]
+
+    decimals = settings.NEARBY_COORDINATE_DECIMALS
+    return [
+        NearbyRun(
+            id=run_id,
+            distance_km=rows[run_id]["distance_km"],
+            start_lat=round(rows[run_id]["start_lat"], decimals),
+            start_lng=round(rows[run_id]["start_lng"], decimals),
+            completed_at=rows[run_id]["completed_at"],
+            distance_from_km=round(float(distance), 1),
+        )
+        for run_id, distance in zip(ids, hits.distances_km[:limit])
+        if run_id in rows
+    ]
+
+@router.get("/start-points", response_model=List[StartPoint])
+async def get_popular_start_points(
+    lat: float = Query(..., ge=-90, le=90),
+    lng: float = Query(..., ge=-180, le=180),
+    radius_km: float = Query(5.0, gt=0, le=settings.NEARBY_MAX_RADIUS_KM),
+    precision: int = Query(7, ge=5, le=9),
+    limit: int = Query(20, ge=1, le=100),
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_read_db)
+):
+    """
+    Most common run start points within radius_km, grouped by geohash cell
+    (precision 7 is ~150 m, 8 is ~40 m)
+    """
+    hits = await runs_starting_near(db, lat, lng, radius_km)
+    if not len(hits.cells):
+        return []
+
+    # Group by the geohash prefix of each start cell
+    groups, inverse, counts = np.unique(
+        hits.cells >> (2 * CELL_BITS - 5 * precision), return_inverse=True, return_counts=True
+    )
+    mean_lats = np.bincount(inverse, weights=hits.lats) / counts
+    mean_lngs = np.bincount(inverse, weights=hits.lngs) / counts
+
+    top = np.argsort(-counts, kind="stable")[:limit]
+    geohashes = cell_to_geohash(groups[top] << (2 * CELL_BITS - 5 * precision), precision)
+    return [
+        StartPoint(geohash=geohash, lat=float(mean_lats[i]), lng=float(mean_lngs[i]), run_count=int(counts[i]))
+        for geohash, i in zip(geohashes, top)
+    ]
+
+@router.get(
+    "/heatmap/{zoom}/{x}/{y}.png",
+    response_class=Response,
+    responses={200: {"content": {"image/png": {}}, "description": "256x256 heatmap tile"}}
+)
+async def get_heatmap_tile(
+    zoom: int,
+    x: int,
+    y: int,
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_read_db)
+):
+    """
+    Community heatmap tile (web mercator, XYZ numbering) of where people
+    run, for zooms HEATMAP_MIN_ZOOM to HEATMAP_MAX_ZOOM
+    """
+    if not heatmap.has_tile(zoom, x, y):
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="No heatmap tile at this position"
+        )
+    return Response(
+        content=await heatmap.tile(db, zoom, x, y),
+        media_type="image/png",
+        headers={"Cache-Control": f"private, max-age={settings.HEATMAP_CACHE_TTL_SECONDS}"}
+    )
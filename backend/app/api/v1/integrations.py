@@ -0,0 +1,37 @@
+from fastapi import APIRouter, Depends, HTTPException, status
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.database import AsyncSessionLocal, get_db
+from app.schemas.integration import StravaImportStatus
+from app.models.user import User
+from app.api.deps import get_current_user
+from app.services.strava_import import import_jobs, start_import
+
+router = APIRouter(prefix="/integrations", tags=["Integrations"])
+
+@router.post("/strava/import", response_model=StravaImportStatus, status_code=status.HTTP_202_ACCEPTED)
+async def start_strava_import(
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
+):
+    """Import the user's Strava run history in the background"""
+    # The tokens are not in the principal cache, so read them from the primary
+    connected = await db.scalar(
+        select(User.strava_access_token.is_not(None)).where(User.id == current_user.id)
+    )
+    if not connected:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Strava is not connected"
+        )
+
+    job = start_import(AsyncSessionLocal, current_user.id)
+    return StravaImportStatus.model_validate(job)
+
+@router.get("/strava/import", response_model=StravaImportStatus)
+async def get_strava_import(current_user: User = Depends(get_current_user)):
+    """Progress of the user's latest Strava import"""
+    current = import_jobs.get(current_user.id)
+    if current is None:
+        return StravaImportStatus(status="idle")
+    return StravaImportStatus.model_validate(current[0])
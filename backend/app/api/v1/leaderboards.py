@@ -0,0 +1,109 @@
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import List, Optional, Tuple
+from uuid import UUID
+from app.database import get_read_db
+from app.schemas.leaderboard import LeaderboardEntry, LeaderboardResponse, MyRankResponse
+from app.models.crew import CrewMembership
+from app.models.user import User
+from app.api.deps import get_current_user
+from app.services.leaderboard import METRICS, SCOPES, board_key, leaderboards
+
+router = APIRouter(prefix="/leaderboards", tags=["Leaderboards"])
+
+async def _resolve_board(
+    metric: str,
+    scope: str,
+    crew_id: Optional[UUID],
+    current_user: User,
+    db: AsyncSession
+) -> str:
+    if metric not in METRICS:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Unknown metric, expected one of: {', '.join(METRICS)}"
+        )
+    if scope not in SCOPES:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Unknown scope, expected one of: {', '.join(SCOPES)}"
+        )
+
+    if scope == "global":
+        return board_key(metric)
+    if scope == "tier":
+        return board_key(metric, "tier", current_user.league_tier)
+
+    # Crew boards default to the user's first crew
+    if crew_id is None:
+        crew_id = await db.scalar(
+            select(CrewMembership.crew_id)
+            .where(CrewMembership.user_id == current_user.id)
+            .order_by(CrewMembership.joined_at)
+            .limit(1)
+        )
+        if crew_id is None:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Not a member of any crew"
+            )
+    return board_key(metric, "crew", crew_id)
+
+async def _with_usernames(db: AsyncSession, ranked: List[Tuple[int, str, float]]) -> List[LeaderboardEntry]:
+    """Attach usernames to a page of (rank, user_id, score) in one query"""
+    if not ranked:
+        return []
+    user_ids = [UUID(member) for _, member, _ in ranked]
+    usernames = dict((await db.execute(
+        select(User.id, User.username).where(User.id.in_(user_ids))
+    )).all())
+    return [
+        LeaderboardEntry(rank=rank, user_id=user_id, username=usernames.get(user_id), score=score)
+        for (rank, _, score), user_id in zip(ranked, user_ids)
+    ]
+
+@router.get("/{metric}", response_model=LeaderboardResponse)
+async def get_leaderboard(
+    metric: str,
+    scope: str = "global",
+    crew_id: Optional[UUID] = None,
+    start: int = Query(0, ge=0),
+    limit: int = Query(50, ge=1, le=200),
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_read_db)
+):
+    """Top of a leaderboard; metric is distance, elo or league_points"""
+    board = await _resolve_board(metric, scope, crew_id, current_user, db)
+
+    ranked = await leaderboards.top(board, start, limit)
+
+    return LeaderboardResponse(
+        metric=metric,
+        scope=scope,
+        total=await leaderboards.store.size(board),
+        entries=await _with_usernames(db, ranked)
+    )
+
+@router.get("/{metric}/me", response_model=MyRankResponse)
+async def get_my_rank(
+    metric: str,
+    scope: str = "global",
+    crew_id: Optional[UUID] = None,
+    radius: int = Query(5, ge=0, le=50),
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_read_db)
+):
+    """Current user's rank and the players around them"""
+    board = await _resolve_board(metric, scope, crew_id, current_user, db)
+
+    rank, ranked = await leaderboards.around(board, current_user.id, radius)
+
+    return MyRankResponse(
+        metric=metric,
+        scope=scope,
+        rank=rank,
+        score=await leaderboards.store.score(board, str(current_user.id)),
+        total=await leaderboards.store.size(board),
+        neighbors=await _with_usernames(db, ranked)
+    )
@@ -0,0 +1,37 @@
+from fastapi import APIRouter, Depends
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import List
+from app.database import get_read_db
+from app.schemas.personal_record import PersonalRecordResponse
+from app.models.personal_record import PersonalRecord
+from app.models.user import User
+from app.api.deps import get_current_user
+from app.services.gps_calculator import GPSCalculator
+
+router = APIRouter(prefix="/records", tags=["Personal Records"])
+
+@router.get("", response_model=List[PersonalRecordResponse])
+async def get_personal_records(
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_read_db)
+):
+    """Current user's fastest 1k, 5k, 10k, half marathon and marathon"""
+    records = (await db.scalars(
+        select(PersonalRecord)
+        .where(PersonalRecord.user_id == current_user.id)
+        .order_by(PersonalRecord.distance_km)
+    )).all()
+
+    return [
+        PersonalRecordResponse(
+            effort=record.effort,
+            distance_km=record.distance_km,
+            elapsed_seconds=record.elapsed_seconds,
+            pace=GPSCalculator.calculate_pace(record.distance_km, record.elapsed_seconds),
+            run_id=record.run_id,
+            start_offset_km=record.start_offset_km,
+            achieved_at=record.achieved_at
+        )
+        for record in records
+    ]
@@ -0,0 +1,204 @@
+from fastapi import APIRouter, Depends, HTTPException, status
+from sqlalchemy import select, func
+from sqlalchemy.ext.asyncio import AsyncSession
+from uuid import UUID
+from app.database import get_db
+from app.schemas.run import (
+    RunSessionCreate, RouteChunk, RunSessionFinalize, RunSessionResponse, RunResponse
+)
+from app.models.run import Run, RunSession
+from app.models.user import User
+from app.api.deps import get_current_user
+from app.services.gps_calculator import GPSCalculator
+from app.services.route_codec import RouteCodec
+from app.services.run_finalizer import run_finalizer
+from app.services.spatial_index import cell_id
+
+router = APIRouter(prefix="/runs/sessions", tags=["Live Runs"])
+
+
+async def _get_session(db: AsyncSession, session_id: UUID, user: User, lock: bool = False) -> RunSession:
+    """Load one of the user's run sessions or raise 404"""
+    query = select(RunSession).where(
+        RunSession.id == session_id,
+        RunSession.user_id == user.id
+    )
+    if lock:
+        query = query.with_for_update()
+
+    run_session = await db.scalar(query)
+    if not run_session:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Run session not found"
+        )
+    return run_session
+
+
+def _require_active(run_session: RunSession):
+    if run_session.status != 'active':
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail=f"Run session is {run_session.status}"
+        )
+
+
+@router.post("", response_model=RunSessionResponse, status_code=status.HTTP_201_CREATED)
+async def open_run_session(
+    session_data: RunSessionCreate,
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
+):
+    """Open a live run that route chunks are appended to"""
+    run_session = RunSession(
+        user_id=current_user.id,
+        route_polyline='',
+        started_at=session_data.start_time
+    )
+
+    db.add(run_session)
+    await db.commit()
+    await db.refresh(run_session)
+
+    return RunSessionResponse.model_validate(run_session)
+
+
+@router.post("/{session_id}/chunks", response_model=RunSessionResponse)
+async def append_route_chunk(
+    session_id: UUID,
+    chunk: RouteChunk,
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
+):
+    """Append a batch of route points and update the running totals"""
+    run_session = await _get_session(db, session_id, current_user, lock=True)
+    _require_active(run_session)
+
+    # Retried chunk that was already applied
+    if chunk.seq < run_session.chunk_count:
+        return RunSessionResponse.model_validate(run_session)
+
+    if chunk.seq > run_session.chunk_count:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail=f"Expected chunk {run_session.chunk_count}"
+        )
+
+    if chunk.points:
+        coords = [(p.lat, p.lng) for p in chunk.points]
+        previous = None
+        if run_session.last_lat is not None:
+            previous = (run_session.last_lat, run_session.last_lng)
+        else:
+            run_session.start_lat, run_session.start_lng = coords[0]
+
+        # Only the new segments are walked, including the one joining the previous chunk
+        segment_route = [previous] + coords if previous else coords
+        run_session.distance_km += GPSCalculator.calculate_total_distance(segment_route)
+
+        # Append server-side so the stored route is never read back
+        run_session.route_polyline = func.coalesce(RunSession.route_polyline, '') + RouteCodec.encode(
+            coords, previous=previous
+        )
+        run_session.last_lat, run_session.last_lng = coords[-1]
+        run_session.point_count += len(coords)
+
+    run_session.duration_seconds = max(run_session.duration_seconds, chunk.elapsed_seconds)
+    run_session.chunk_count += 1
+
+    await db.commit()
+    await db.refresh(run_session)
+
+    return RunSessionResponse.model_validate(run_session)
+
+
+@router.get("/{session_id}", response_model=RunSessionResponse)
+async def get_run_session(
+    session_id: UUID,
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
+):
+    """Get live run progress"""
+    return RunSessionResponse.model_validate(await _get_session(db, session_id, current_user))
+
+
+@router.post("/{session_id}/finalize", response_model=RunResponse)
+async def finalize_run_session(
+    session_id: UUID,
+    finalize_data: RunSessionFinalize,
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    Turn a live run into a saved run from its running totals. The route is
+    copied inside the database and never read here: the run is saved as
+    'pending' and the background finalizer validates it, simplifies its
+    route and adds it to records, stats, rollups, leaderboards and the
+    heatmap. Runs failing validation are kept as rejected.
+    """
+    run_session = await _get_session(db, session_id, current_user, lock=True)
+
+    # Retried finalize
+    if run_session.status == 'finalized' and run_session.run_id:
+        return RunResponse.model_validate(await db.get(Run, run_session.run_id))
+
+    _require_active(run_session)
+
+    duration_seconds = finalize_data.duration_seconds
+    if duration_seconds is None:
+        duration_seconds = run_session.duration_seconds
+    # Replaced by the validated route distance once finalized
+    distance_km = run_session.distance_km
+
+    calories_burned = finalize_data.calories_burned
+    if not calories_burned:
+        calories_burned = GPSCalculator.calculate_calories(distance_km, current_user.weight_kg)
+
+    new_run = Run(
+        user_id=current_user.id,
+        distance_km=distance_km,
+        duration_seconds=duration_seconds,
+        avg_pace=GPSCalculator.calculate_pace(distance_km, duration_seconds),
+        avg_speed=GPSCalculator.calculate_speed(distance_km, duration_seconds),
+        calories_burned=calories_burned,
+        # Copied inside the database rather than through Python
+        route_polyline=select(RunSession.route_polyline).where(
+            RunSession.id == run_session.id
+        ).scalar_subquery(),
+        start_lat=run_session.start_lat,
+        start_lng=run_session.start_lng,
+        end_lat=run_session.last_lat,
+        end_lng=run_session.last_lng,
+        start_cell=cell_id(run_session.start_lat, run_session.start_lng),
+        end_cell=cell_id(run_session.last_lat, run_session.last_lng),
+        validation_status='pending',
+        started_at=run_session.started_at,
+        completed_at=finalize_data.end_time,
+        source='app'
+    )
+
+    db.add(new_run)
+    await db.flush()
+
+    run_session.status = 'finalized'
+    run_session.run_id = new_run.id
+
+    await db.commit()
+    await db.refresh(new_run)
+    run_finalizer.wake()
+
+    return RunResponse.model_validate(new_run)
+
+
+@router.delete("/{session_id}", status_code=status.HTTP_204_NO_CONTENT)
+async def cancel_run_session(
+    session_id: UUID,
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
+):
+    """Abandon a live run without saving it"""
+    run_session = await _get_session(db, session_id, current_user, lock=True)
+    _require_active(run_session)
+
+    run_session.status = 'cancelled'
+    await db.commit()
@@ -1,24 +1,128 @@
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
-from typing import List
+from fastapi import APIRouter, Depends, HTTPException, Response, status
+from fastapi.responses import StreamingResponse
+from pydantic import TypeAdapter
+from sqlalchemy import func, select, tuple_
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import List, Optional
 from datetime import datetime
-from app.database import get_db
-from app.schemas.run import RunCreate, RunResponse
+from uuid import UUID, uuid4
+from app.config import settings
+from app.database import get_db, get_read_db, ReadSessionLocal
+from app.schemas.run import RunCreate, RunResponse, RunRouteResponse
 from app.models.run import Run
 from app.models.user import User
 from app.api.deps import get_current_user
 from app.services.gps_calculator import GPSCalculator
-import json
+from app.services.heatmap import heatmap
+from app.services.leaderboard import publish_scores
+from app.services.personal_records import personal_record_rows, record_best_efforts
+from app.services.route_codec import RouteCodec, ROUTE_LEVELS
+from app.services.route_work import process_routes, route_pool
+from app.services.run_export import EXPORT_FORMATS, export_filename, stream_runs_export
+from app.services.run_ingest import run_ingest_queue
+from app.services.spatial_index import cell_id, run_start_index
+from app.services.training_rollups import add_runs_to_rollups
+from app.services.user_stats import add_run_to_user_stats
+from app.utils.helpers import encode_cursor, decode_cursor
 
 router = APIRouter(prefix="/runs", tags=["Runs"])
 
-@router.post("", response_model=RunResponse, status_code=status.HTTP_201_CREATED)
+# Only the columns RunResponse needs; the route is loaded on request
+RUN_RESPONSE_COLUMNS = [getattr(Run, name) for name in RunResponse.model_fields]
+
+run_list_adapter = TypeAdapter(List[RunResponse])
+run_route_list_adapter = TypeAdapter(List[RunRouteResponse])
+
+
+def _wants_route(include: Optional[str]) -> bool:
+    return bool(include) and "route" in include.split(",")
+
+
+def _route_column(resolution: str):
+    """Route at the requested level of detail, falling back to finer levels not stored"""
+    if resolution == "full":
+        return Run.route_polyline
+    if resolution not in ROUTE_LEVELS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Unknown resolution, expected one of: full, {', '.join(ROUTE_LEVELS)}"
+        )
+    # ROUTE_LEVELS runs from finest to coarsest
+    levels = list(ROUTE_LEVELS)
+    finer = [getattr(Run, f"route_polyline_{level}") for level in reversed(levels[:levels.index(resolution) + 1])]
+    return func.coalesce(*finer, Run.route_polyline).label("route_polyline")
+
+
+def _run_columns(include_route: bool, resolution: str = "full") -> list:
+    if include_route:
+        return RUN_RESPONSE_COLUMNS + [_route_column(resolution)]
+    return RUN_RESPONSE_COLUMNS
+
+
+def _serialize_runs(rows, include_route: bool) -> bytes:
+    """Validate and dump a page of run rows to JSON in one pass"""
+    if include_route:
+        rows = [
+            {**row, "route_polyline": _normalize_route(row["route_polyline"])}
+            for row in rows
+        ]
+        return run_route_list_adapter.dump_json(run_route_list_adapter.validate_python(rows))
+    return run_list_adapter.dump_json(run_list_adapter.validate_python(rows))
+
+
+def _normalize_route(stored: Optional[str]) -> Optional[str]:
+    """Serve legacy JSON routes as polylines too"""
+    if RouteCodec.is_legacy_json(stored):
+        return RouteCodec.encode(RouteCodec.decode_stored(stored))
+    return stored
+
+
+@router.post(
+    "", response_model=RunResponse, status_code=status.HTTP_201_CREATED,
+    responses={status.HTTP_202_ACCEPTED: {"model": RunResponse, "description": "Queued for a batched write (RUN_INGEST_QUEUE)"}}
+)
 async def create_run(
     run_data: RunCreate,
+    response: Response,
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
-    """Save a completed run"""
+    """
+    Save a completed run. Distance, pace and speed are recomputed from the
+    route, and runs failing validation are refused (or, with
+    RUN_VALIDATION_REJECT off, stored as rejected and left out of totals).
+    With RUN_INGEST_QUEUE on, the run is spooled for a batched write and
+    202 is returned; it shows up in history once the batch is written.
+    """
+    coords = [(p.lat, p.lng) for p in run_data.route]
+    times = [p.t for p in run_data.route]
+    times = times if times and None not in times else None
+
+    # Validation, encoding, levels of detail, best efforts and heatmap bins run in the route pool
+    work, = await route_pool.run(
+        process_routes, [coords], [run_data.duration_seconds], [run_data.distance_km],
+        [times] if times else None, encode=True,
+        zooms=heatmap.zooms if settings.HEATMAP_ENABLED else (), reject=settings.RUN_VALIDATION_REJECT
+    )
+    if work.error is not None:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid route"
+        )
+    verdict = work.verdict
+    if verdict.status == 'rejected' and settings.RUN_VALIDATION_REJECT:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Run failed validation: {verdict.flags_text}"
+        )
+    counted = work.counted
+
+    # Route metrics replace the client's; runs without a route keep them
+    if len(coords) >= 2:
+        run_data.distance_km = verdict.distance_km
+        run_data.avg_pace = verdict.avg_pace
+        run_data.avg_speed = verdict.avg_speed
+
     # Calculate calories if not provided
     if run_data.calories_burned == 0:
         run_data.calories_burned = GPSCalculator.calculate_calories(
@@ -26,77 +130,171 @@ async def create_run(
             current_user.weight_kg
         )
 
-    # Create route polyline (simplified - store as JSON string)
-    route_polyline = json.dumps([{"lat": p.lat, "lng": p.lng} for p in run_data.route])
+    start = (run_data.route[0].lat, run_data.route[0].lng) if run_data.route else (None, None)
+    end = (run_data.route[-1].lat, run_data.route[-1].lng) if run_data.route else (None, None)
 
     # Create run
     new_run = Run(
+        id=uuid4(),
         user_id=current_user.id,
         distance_km=run_data.distance_km,
         duration_seconds=run_data.duration_seconds,
         avg_pace=run_data.avg_pace,
         avg_speed=run_data.avg_speed,
         calories_burned=run_data.calories_burned,
-        route_polyline=route_polyline,
-        start_lat=run_data.route[0].lat if run_data.route else None,
-        start_lng=run_data.route[0].lng if run_data.route else None,
-        end_lat=run_data.route[-1].lat if run_data.route else None,
-        end_lng=run_data.route[-1].lng if run_data.route else None,
+        route_polyline=work.polyline,
+        route_polyline_preview=work.levels["preview"],
+        route_polyline_thumbnail=work.levels["thumbnail"],
+        start_lat=start[0],
+        start_lng=start[1],
+        end_lat=end[0],
+        end_lng=end[1],
+        start_cell=cell_id(*start),
+        end_cell=cell_id(*end),
+        validation_status=verdict.status,
+        validation_flags=verdict.flags_text,
         started_at=run_data.start_time,
         completed_at=run_data.end_time,
+        created_at=datetime.utcnow(),
         source='app'
     )
 
+    # Personal records; point times are used when every point has one
+    efforts = work.efforts if counted else {}
+
+    if settings.RUN_INGEST_QUEUE:
+        await run_ingest_queue.enqueue(
+            new_run, personal_record_rows(current_user.id, new_run.id, efforts, run_data.end_time)
+        )
+        response.status_code = status.HTTP_202_ACCEPTED
+        return RunResponse.model_validate(new_run)
+
     db.add(new_run)
+    await db.flush()
+
+    if not counted:
+        await db.commit()
+        return RunResponse.model_validate(new_run)
+
+    await record_best_efforts(db, current_user.id, new_run.id, efforts, run_data.end_time)
 
     # Update user stats
-    current_user.total_distance_km += run_data.distance_km
-    current_user.total_duration_seconds += run_data.duration_seconds
-    current_user.total_runs += 1
+    totals = await add_run_to_user_stats(db, current_user.id, run_data.distance_km, run_data.duration_seconds)
+    await add_runs_to_rollups(db, [new_run])
 
-    # Recalculate average pace
-    if current_user.total_distance_km > 0:
-        current_user.avg_pace = (
-            current_user.total_duration_seconds / 60
-        ) / current_user.total_distance_km
+    await db.commit()
 
-    db.commit()
-    db.refresh(new_run)
+    await publish_scores(db, {current_user.id: ({"distance": totals.total_distance_km}, totals.league_tier)})
+    run_start_index.add(new_run.id, *start)
+    if settings.HEATMAP_ENABLED:
+        heatmap.add_tiles(work.tiles, new_run.created_at)
 
-    return RunResponse.from_orm(new_run)
+    return RunResponse.model_validate(new_run)
 
-@router.get("", response_model=List[RunResponse])
+@router.get("", response_model=List[RunRouteResponse])
 async def get_user_runs(
     skip: int = 0,
     limit: int = 20,
+    cursor: Optional[str] = None,
+    include: Optional[str] = None,
+    resolution: str = "full",
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_read_db)
 ):
-    """Get user's run history"""
-    runs = db.query(Run).filter(
+    """
+    Get user's run history, newest first.
+    Pass the X-Next-Cursor header of a page as `cursor` to get the next one;
+    `skip` is still accepted for older clients but gets slower on deep pages.
+    `include=route` adds each run's encoded polyline, at `resolution`
+    full, preview or thumbnail.
+    """
+    include_route = _wants_route(include)
+    query = select(*_run_columns(include_route, resolution)).where(
         Run.user_id == current_user.id
     ).order_by(
-        Run.completed_at.desc()
-    ).offset(skip).limit(limit).all()
+        Run.completed_at.desc(), Run.id.desc()
+    )
+
+    if cursor:
+        try:
+            completed_at, run_id = decode_cursor(cursor)
+            completed_at, run_id = datetime.fromisoformat(completed_at), UUID(run_id)
+        except ValueError:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Invalid cursor"
+            )
+        query = query.where(tuple_(Run.completed_at, Run.id) < tuple_(completed_at, run_id))
+    else:
+        query = query.offset(skip)
+
+    # One extra row tells us whether another page exists
+    rows = (await db.execute(query.limit(limit + 1))).mappings().all()
+    headers = {}
+    if len(rows) > limit:
+        rows = rows[:limit]
+        headers["X-Next-Cursor"] = encode_cursor(rows[-1]["completed_at"], rows[-1]["id"])
 
-    return [RunResponse.from_orm(run) for run in runs]
+    return Response(
+        content=_serialize_runs(rows, include_route),
+        media_type="application/json",
+        headers=headers
+    )
+
+@router.get("/export")
+async def export_runs(
+    format: str = "ndjson",
+    compress: bool = False,
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Download the full run history as ndjson, csv or gpx, oldest first,
+    streamed in batches from a server-side cursor. `compress=true` gzips
+    the stream on the fly.
+    """
+    export_format = EXPORT_FORMATS.get(format)
+    if export_format is None:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Unknown format, expected one of: {', '.join(EXPORT_FORMATS)}"
+        )
 
-@router.get("/{run_id}", response_model=RunResponse)
+    # The stream outlives this handler, so it reads through its own session
+    filename = export_filename(export_format, compress)
+    return StreamingResponse(
+        stream_runs_export(ReadSessionLocal, current_user.id, export_format, compress),
+        media_type="application/gzip" if compress else export_format.media_type,
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'}
+    )
+
+@router.get("/{run_id}", response_model=RunRouteResponse, response_model_exclude_unset=True)
 async def get_run_detail(
-    run_id: str,
+    run_id: UUID,
+    include: Optional[str] = None,
+    resolution: str = "full",
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_read_db)
 ):
-    """Get specific run details"""
-    run = db.query(Run).filter(
-        Run.id == run_id,
-        Run.user_id == current_user.id
-    ).first()
+    """
+    Get specific run details; `include=route` adds the encoded polyline at
+    `resolution` full, preview (~1000 points) or thumbnail (~200 points).
+    """
+    include_route = _wants_route(include)
+    row = (await db.execute(
+        select(*_run_columns(include_route, resolution)).where(
+            Run.id == run_id,
+            Run.user_id == current_user.id
+        )
+    )).mappings().first()
 
-    if not run:
+    if not row:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Run not found"
         )
 
-    return RunResponse.from_orm(run)
+    if include_route:
+        return RunRouteResponse.model_validate(
+            {**row, "route_polyline": _normalize_route(row["route_polyline"])}
+        )
+    return RunResponse.model_validate(row)
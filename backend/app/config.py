@@ -10,11 +10,83 @@ class Settings(BaseSettings):
     # Database
     DATABASE_URL: str
     REDIS_URL: str
+    DB_POOL_SIZE: int = 10
+    DB_MAX_OVERFLOW: int = 20
+    DB_POOL_TIMEOUT: int = 30  # seconds to wait for a pooled connection
+    DB_POOL_RECYCLE: int = 1800  # seconds before a connection is replaced
+    DB_CONNECT_TIMEOUT: int = 10
+    DB_COMMAND_TIMEOUT: int = 30
+
+    # Read replicas: read-only endpoints use them when set (a JSON list of URLs)
+    DATABASE_REPLICA_URLS: List[str] = []
+    REPLICA_SELECTION: str = "round_robin"  # or "least_loaded": fewest checked-out connections
+    REPLICA_HEALTH_CHECK_SECONDS: float = 5.0
+    REPLICA_MAX_LAG_SECONDS: float = 10.0  # Postgres replicas further behind are ejected
 
     # Security
     SECRET_KEY: str
     ALGORITHM: str = "HS256"
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 1440
+    PASSWORD_HASH_WORKERS: int = 4
+    PASSWORD_HASH_MAX_PENDING: int = 64  # queued + running hashes before returning 503
+
+    # Principal cache
+    PRINCIPAL_CACHE_MAX_ENTRIES: int = 10000
+    PRINCIPAL_CACHE_TTL_SECONDS: int = 60
+    PRINCIPAL_CACHE_REDIS: bool = False  # shared tier and cross-worker invalidation; needed with several workers
+
+    # Metrics
+    METRICS_ENABLED: bool = True  # request/SQL instrumentation and the /metrics endpoint
+    SLOW_REQUEST_SECONDS: float = 1.0  # requests at least this slow are sampled with their SQL
+    SLOW_REQUEST_SAMPLES: int = 50  # most recent slow requests kept
+    METRICS_SLOW_STATEMENTS: int = 10  # slowest distinct statements exported
+
+    # Matchmaking
+    MATCHMAKING_BASE_WINDOW: int = 50  # ELO gap accepted immediately
+    MATCHMAKING_WINDOW_GROWTH: float = 5.0  # ELO points added per second waited
+    MATCHMAKING_MAX_WINDOW: int = 400
+    MATCHMAKING_TICK_SECONDS: float = 1.0
+
+    # Live battles
+    BATTLE_UPDATES_PER_SECOND: float = 2.0  # max progress messages sent per connection
+    BATTLE_CHANNELS_REDIS: bool = False  # fan out through Redis pub/sub for multiple workers
+    BATTLE_DISTANCE_SLACK_KM: float = 0.1  # GPS error allowed beyond the distance reachable since the start
+    BATTLE_ABANDON_SECONDS: float = 300.0  # battles without progress this long are forfeited or cancelled
+    BATTLE_SWEEP_SECONDS: float = 30.0
+
+    # Rankings
+    ELO_K_FACTOR: int = 32
+    LEADERBOARD_REDIS: bool = False  # in-process sorted sets when off
+
+    # Write-behind run ingestion: POST /runs spools runs locally and returns 202
+    RUN_INGEST_QUEUE: bool = False
+    RUN_INGEST_SPOOL_PATH: str = "run_ingest_spool.db"
+    RUN_INGEST_BATCH_SIZE: int = 500  # runs per multi-row INSERT
+    RUN_INGEST_FLUSH_SECONDS: float = 1.0  # drain at least this often
+    RUN_INGEST_CLAIM_SECONDS: float = 300.0  # a batch claimed by a worker that died is retaken after this
+
+    # Live-run sessions are validated and scored by a background finalizer
+    RUN_FINALIZE_BATCH_SIZE: int = 100  # pending runs per transaction
+    RUN_FINALIZE_POLL_SECONDS: float = 1.0  # look for pending runs at least this often
+
+    # Per-run route work (validation, simplification, best efforts, heatmap) runs in this many processes
+    ROUTE_WORKERS: int = 2  # 0 runs it in a thread instead
+
+    # Run validation
+    RUN_VALIDATION_REJECT: bool = True  # refuse runs that fail validation; when off, and always for live-run sessions, they are stored as rejected
+
+    # Spatial index
+    SPATIAL_INDEX_IN_MEMORY: bool = True  # serve radius queries from memory once loaded
+    NEARBY_MAX_RADIUS_KM: float = 50.0
+    NEARBY_COORDINATE_DECIMALS: int = 3  # ~110 m; other users' exact start points are never served
+
+    # Heatmap
+    HEATMAP_ENABLED: bool = True  # rasterize counted runs into heatmap tiles at ingest
+    HEATMAP_MIN_ZOOM: int = 10
+    HEATMAP_MAX_ZOOM: int = 16
+    HEATMAP_FLUSH_SECONDS: float = 5.0  # pending tile counts are merged into the table this often
+    HEATMAP_CACHE_ENTRIES: int = 2000  # rendered tiles kept in memory
+    HEATMAP_CACHE_TTL_SECONDS: int = 300
 
     # Google Maps
     GOOGLE_MAPS_API_KEY: str = ""
@@ -23,6 +95,12 @@ class Settings(BaseSettings):
     STRAVA_CLIENT_ID: str = ""
     STRAVA_CLIENT_SECRET: str = ""
     STRAVA_REDIRECT_URI: str = ""
+    STRAVA_API_URL: str = "https://www.strava.com/api/v3"
+    STRAVA_OAUTH_URL: str = "https://www.strava.com/oauth/token"
+    STRAVA_IMPORT_CONCURRENCY: int = 4  # requests in flight per process
+    STRAVA_IMPORT_PAGE_SIZE: int = 200  # Strava's maximum per_page
+    STRAVA_IMPORT_BATCH_SIZE: int = 200  # runs per INSERT
+    STRAVA_RATE_LIMIT_WINDOW_SECONDS: int = 900
 
     # Firebase
     FIREBASE_CREDENTIALS_PATH: str = ""
@@ -1,8 +1,51 @@
-from sqlalchemy import create_engine
+import asyncio
+import itertools
+import logging
+from typing import List, Optional
+from fastapi import Depends
+from sqlalchemy import create_engine, event, text
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, create_async_engine, async_sessionmaker
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session, sessionmaker
+from sqlalchemy.sql.dml import UpdateBase
 from app.config import settings
 
+logger = logging.getLogger(__name__)
+
+
+def _async_url(url: str) -> str:
+    """Map a sync database URL to its async driver"""
+    for prefix, async_prefix in (
+        ("postgresql://", "postgresql+asyncpg://"),
+        ("postgresql+psycopg2://", "postgresql+asyncpg://"),
+        ("postgres://", "postgresql+asyncpg://"),
+        ("sqlite://", "sqlite+aiosqlite://"),
+    ):
+        if url.startswith(prefix):
+            return async_prefix + url[len(prefix):]
+    return url
+
+
+def _pool_options(url: str) -> dict:
+    """Pool sizing from settings; SQLite uses its own pool defaults"""
+    if url.startswith("sqlite"):
+        return {}
+    return {
+        "pool_size": settings.DB_POOL_SIZE,
+        "max_overflow": settings.DB_MAX_OVERFLOW,
+        "pool_timeout": settings.DB_POOL_TIMEOUT,
+        "pool_recycle": settings.DB_POOL_RECYCLE,
+    }
+
+
+def _connect_args(url: str) -> dict:
+    if url.startswith("postgresql+asyncpg"):
+        return {"timeout": settings.DB_CONNECT_TIMEOUT, "command_timeout": settings.DB_COMMAND_TIMEOUT}
+    return {}
+
+
+# Sync engine for table creation and maintenance scripts
 engine = create_engine(
     settings.DATABASE_URL,
     pool_pre_ping=True,
@@ -11,12 +54,172 @@ engine = create_engine(
 
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# Async engine for the API
+ASYNC_DATABASE_URL = _async_url(settings.DATABASE_URL)
+
+async_engine = create_async_engine(
+    ASYNC_DATABASE_URL,
+    pool_pre_ping=True,
+    echo=settings.DEBUG,
+    connect_args=_connect_args(ASYNC_DATABASE_URL),
+    **_pool_options(ASYNC_DATABASE_URL)
+)
+
+AsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+
+# Replication lag of a Postgres standby in seconds; 0 when it has replayed everything it received
+REPLICA_LAG_SQL = text(
+    "SELECT CASE WHEN NOT pg_is_in_recovery() OR pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() "
+    "THEN 0 ELSE EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()) END"
+)
+
+
+class ReplicaSet:
+    """
+    Read replicas of the primary database. Reads pick a replica round-robin
+    or by fewest checked-out connections; a replica is ejected when a
+    health check fails, it falls more than `max_lag_seconds` behind, or a
+    connection to it drops, and comes back on the next passing check.
+    """
+
+    def __init__(self, urls: List[str], selection: str = "round_robin", max_lag_seconds: float = 10.0):
+        if selection not in ("round_robin", "least_loaded"):
+            raise ValueError(f"Unknown replica selection {selection!r}")
+        self.selection = selection
+        self.max_lag_seconds = max_lag_seconds
+        self.engines: List[AsyncEngine] = []
+        for url in urls:
+            async_url = _async_url(url)
+            self.engines.append(create_async_engine(
+                async_url,
+                pool_pre_ping=True,
+                echo=settings.DEBUG,
+                connect_args=_connect_args(async_url),
+                **_pool_options(async_url)
+            ))
+        self.healthy = [True] * len(self.engines)
+        self._turn = itertools.count()
+        self.ejections = 0
+        self.primary_fallbacks = 0  # reads sent to the primary because no replica was healthy
+
+        for index, replica in enumerate(self.engines):
+            event.listen(replica.sync_engine, "handle_error", self._on_error(index))
+
+    def _on_error(self, index: int):
+        def handle_error(context):
+            if context.is_disconnect:
+                self.eject(index, "connection lost")
+        return handle_error
+
+    def eject(self, index: int, reason: str):
+        if self.healthy[index]:
+            self.healthy[index] = False
+            self.ejections += 1
+            logger.warning("Ejected read replica %d: %s", index, reason)
+
+    def choose(self) -> Optional[AsyncEngine]:
+        """A healthy replica for a new read session, or None to read from the primary"""
+        candidates = [replica for replica, healthy in zip(self.engines, self.healthy) if healthy]
+        if not candidates:
+            if self.engines:
+                self.primary_fallbacks += 1
+            return None
+        if self.selection == "least_loaded":
+            return min(candidates, key=lambda replica: replica.pool.checkedout())
+        return candidates[next(self._turn) % len(candidates)]
+
+    async def check(self):
+        """Ping every replica, ejecting failing or lagging ones and restoring recovered ones"""
+        for index, replica in enumerate(self.engines):
+            try:
+                async with replica.connect() as conn:
+                    if replica.dialect.name == "postgresql":
+                        lag = await asyncio.wait_for(conn.scalar(REPLICA_LAG_SQL), timeout=settings.DB_CONNECT_TIMEOUT)
+                    else:
+                        await asyncio.wait_for(conn.execute(text("SELECT 1")), timeout=settings.DB_CONNECT_TIMEOUT)
+                        lag = 0
+            except Exception as exc:
+                self.eject(index, f"health check failed ({type(exc).__name__})")
+                continue
+            if lag is not None and float(lag) > self.max_lag_seconds:
+                self.eject(index, f"{float(lag):.1f}s behind the primary")
+            elif not self.healthy[index]:
+                self.healthy[index] = True
+                logger.info("Read replica %d is healthy again", index)
+
+    async def run_health_checks(self, interval_seconds: float):
+        while True:
+            await self.check()
+            await asyncio.sleep(interval_seconds)
+
+    async def dispose(self):
+        for replica in self.engines:
+            await replica.dispose()
+
+    def stats(self) -> dict:
+        return {
+            "configured": len(self.engines),
+            "healthy": sum(self.healthy),
+            "ejections": self.ejections,
+            "primary_fallbacks": self.primary_fallbacks,
+        }
+
+
+replica_set = ReplicaSet(
+    settings.DATABASE_REPLICA_URLS,
+    settings.REPLICA_SELECTION,
+    settings.REPLICA_MAX_LAG_SECONDS
+)
+
+# Set on a session once it has committed, so paired read sessions switch to the primary
+_COMMITTED_KEY = "committed"
+
+
+@event.listens_for(Session, "after_commit")
+def _mark_committed(session):
+    session.info[_COMMITTED_KEY] = True
+
+
+class ReadSession(Session):
+    """
+    Session for read-only endpoints. It reads from one replica for its
+    whole life, but flushes and DML go to the primary, and once the
+    request's primary session (info["primary"]) has committed every read
+    goes to the primary too, so a request reads its own writes.
+    """
+
+    def get_bind(self, mapper=None, clause=None, **kw):
+        primary = self.info.get("primary")
+        if self._flushing or isinstance(clause, UpdateBase) or (
+            primary is not None and primary.info.get(_COMMITTED_KEY)
+        ):
+            return async_engine.sync_engine
+        if "replica" not in self.info:
+            self.info["replica"] = replica_set.choose() or async_engine
+        return self.info["replica"].sync_engine
+
+
+ReadSessionLocal = async_sessionmaker(sync_session_class=ReadSession, autoflush=False, expire_on_commit=False)
+
 Base = declarative_base()
 
-def get_db():
+def dialect_insert(session, table):
+    """INSERT for the session's database, supporting ON CONFLICT clauses"""
+    dialect = postgresql if session.get_bind().dialect.name == "postgresql" else sqlite
+    return dialect.insert(table)
+
+async def get_db():
     """Database dependency for FastAPI"""
-    db = SessionLocal()
-    try:
+    async with AsyncSessionLocal() as db:
+        yield db
+
+async def get_read_db(db: AsyncSession = Depends(get_db)):
+    """
+    Database dependency for read-only work: a replica session when replicas
+    are configured, otherwise the request's primary session itself
+    """
+    if not replica_set.engines:
         yield db
-    finally:
-        db.close()
+        return
+    async with ReadSessionLocal(info={"primary": db.sync_session}) as read_db:
+        yield read_db
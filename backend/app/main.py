@@ -1,8 +1,24 @@
-from fastapi import FastAPI
+import asyncio
+import time
+from fastapi import FastAPI, Request, status
+from fastapi.responses import JSONResponse, PlainTextResponse
 from fastapi.middleware.cors import CORSMiddleware
+from sqlalchemy import text
 from app.config import settings
-from app.database import engine, Base
-from app.api.v1 import auth, runs
+from app.database import engine, async_engine, AsyncSessionLocal, Base, replica_set
+from app.api.v1 import auth, runs, run_sessions, battles, leaderboards, explore, records, integrations, analytics
+from app.services.leaderboard import rebuild_leaderboards
+from app.services.battle_channels import battle_hub, run_battle_sweeper
+from app.services.heatmap import heatmap
+from app.services.matchmaking import matchmaker, run_matchmaking
+from app.services.metrics import metrics, MetricsMiddleware, PROMETHEUS_CONTENT_TYPE
+from app.services.principal_cache import principal_cache
+from app.services.run_finalizer import run_finalizer
+from app.services.run_ingest import run_ingest_queue
+from app.services.route_work import route_pool
+from app.services.spatial_index import load_run_start_index, run_start_index
+from app.services.strava_import import strava_client
+from app.utils.security import PasswordHashPoolBusy, password_hash_pool
 
 # Create database tables
 Base.metadata.create_all(bind=engine)
@@ -21,11 +37,78 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor"],
 )
 
+# Request latency and SQL accounting, outermost so it times everything
+if settings.METRICS_ENABLED:
+    metrics.instrument_engine(engine, "sync")
+    metrics.instrument_engine(async_engine.sync_engine, "async")
+    for index, replica in enumerate(replica_set.engines):
+        metrics.instrument_engine(replica.sync_engine, f"replica{index}")
+    app.add_middleware(MetricsMiddleware, metrics=metrics)
+
 # Include routers
 app.include_router(auth.router, prefix="/api/v1")
 app.include_router(runs.router, prefix="/api/v1")
+app.include_router(run_sessions.router, prefix="/api/v1")
+app.include_router(battles.router, prefix="/api/v1")
+app.include_router(leaderboards.router, prefix="/api/v1")
+app.include_router(explore.router, prefix="/api/v1")
+app.include_router(records.router, prefix="/api/v1")
+app.include_router(integrations.router, prefix="/api/v1")
+app.include_router(analytics.router, prefix="/api/v1")
+
+@app.exception_handler(PasswordHashPoolBusy)
+async def password_hash_pool_busy(request: Request, exc: PasswordHashPoolBusy):
+    """Shed auth load quickly instead of queueing behind bcrypt"""
+    return JSONResponse(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        content={"detail": "Authentication is busy, please retry"},
+        headers={"Retry-After": "1"}
+    )
+
+@app.on_event("startup")
+async def startup():
+    """Start background workers"""
+    app.state.matchmaking_task = asyncio.create_task(
+        run_matchmaking(AsyncSessionLocal, settings.MATCHMAKING_TICK_SECONDS)
+    )
+    app.state.battle_sweep_task = asyncio.create_task(
+        run_battle_sweeper(AsyncSessionLocal, settings.BATTLE_SWEEP_SECONDS)
+    )
+    if not settings.LEADERBOARD_REDIS:
+        # In-process boards start empty
+        app.state.leaderboard_task = asyncio.create_task(rebuild_leaderboards(AsyncSessionLocal))
+    if settings.SPATIAL_INDEX_IN_MEMORY:
+        app.state.spatial_index_task = asyncio.create_task(load_run_start_index(AsyncSessionLocal))
+    await principal_cache.start()
+    if settings.RUN_INGEST_QUEUE:
+        await run_ingest_queue.start(AsyncSessionLocal)
+    run_finalizer.start(AsyncSessionLocal)
+    if settings.HEATMAP_ENABLED:
+        heatmap.start(AsyncSessionLocal, settings.HEATMAP_FLUSH_SECONDS)
+    if replica_set.engines:
+        app.state.replica_health_task = asyncio.create_task(
+            replica_set.run_health_checks(settings.REPLICA_HEALTH_CHECK_SECONDS)
+        )
+
+@app.on_event("shutdown")
+async def shutdown():
+    """Stop background workers and close pooled database connections"""
+    app.state.matchmaking_task.cancel()
+    app.state.battle_sweep_task.cancel()
+    if replica_set.engines:
+        app.state.replica_health_task.cancel()
+    await run_ingest_queue.stop(AsyncSessionLocal)
+    await run_finalizer.stop()
+    await heatmap.stop(AsyncSessionLocal)
+    route_pool.shutdown()
+    await principal_cache.close()
+    await strava_client.aclose()
+    await battle_hub.close()
+    await async_engine.dispose()
+    await replica_set.dispose()
 
 @app.get("/")
 async def root():
@@ -38,12 +121,57 @@ async def root():
 
 @app.get("/health")
 async def health_check():
-    """Detailed health check"""
-    return {
+    """Detailed health check; pings the database through the pool"""
+    start = time.perf_counter()
+    try:
+        async with async_engine.connect() as conn:
+            await asyncio.wait_for(conn.execute(text("SELECT 1")), timeout=settings.DB_CONNECT_TIMEOUT)
+    except Exception as exc:
+        return JSONResponse(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            content={
+                "status": "degraded",
+                "database": "unavailable",
+                "error": type(exc).__name__,
+                "version": settings.APP_VERSION
+            }
+        )
+    result = {
         "status": "ok",
         "database": "connected",
+        "database_latency_ms": round((time.perf_counter() - start) * 1000, 2),
         "version": settings.APP_VERSION
     }
+    if replica_set.engines:
+        # Reads fall back to the primary, so unhealthy replicas do not fail the check
+        result["replicas"] = f"{sum(replica_set.healthy)}/{len(replica_set.engines)} healthy"
+    return result
+
+if settings.METRICS_ENABLED:
+    @app.get("/metrics", include_in_schema=False)
+    async def prometheus_metrics():
+        """Prometheus metrics: request latency, SQL per request, pool waits and worker stats"""
+        return PlainTextResponse(
+            metrics.render({
+                "password_hash_pool": password_hash_pool.stats(),
+                "principal_cache": principal_cache.stats(),
+                "matchmaking": matchmaker.stats(),
+                "battle_channels": battle_hub.stats(),
+                "strava_client": strava_client.stats(),
+                "spatial_index": run_start_index.stats(),
+                "run_ingest": run_ingest_queue.stats(),
+                "run_finalizer": run_finalizer.stats(),
+                "route_pool": route_pool.stats(),
+                "replicas": replica_set.stats(),
+                "heatmap": heatmap.stats(),
+            }),
+            media_type=PROMETHEUS_CONTENT_TYPE
+        )
+
+    @app.get("/metrics/slow-requests", include_in_schema=False)
+    async def slow_requests():
+        """Most recent requests over SLOW_REQUEST_SECONDS, with the SQL they ran"""
+        return list(reversed(metrics.slow_requests))
 
 if __name__ == "__main__":
     import uvicorn
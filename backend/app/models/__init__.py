@@ -0,0 +1,7 @@
+from app.models.user import User
+from app.models.run import Run, RunSession
+from app.models.battle import Battle
+from app.models.crew import Crew, CrewMembership
+from app.models.personal_record import PersonalRecord
+from app.models.heatmap_tile import HeatmapTile, HeatmapGeneration
+from app.models.training_rollup import TrainingRollup
@@ -39,6 +39,7 @@ class Battle(Base):
     created_at = Column(DateTime, default=datetime.utcnow)
     started_at = Column(DateTime, nullable=True)
     completed_at = Column(DateTime, nullable=True)
+    last_progress_at = Column(DateTime, nullable=True)  # heartbeat for the abandoned battle sweep
 
     # Relationships
     user1 = relationship("User", foreign_keys=[user1_id], back_populates="battles_as_user1")
@@ -39,7 +39,7 @@ class CrewMembership(Base):
 
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
     crew_id = Column(UUID(as_uuid=True), ForeignKey('crews.id', ondelete='CASCADE'), nullable=False)
-    user_id = Column(UUID(as_uuid=True), ForeignKey('users.id', ondelete='CASCADE'), nullable=False)
+    user_id = Column(UUID(as_uuid=True), ForeignKey('users.id', ondelete='CASCADE'), nullable=False, index=True)
 
     role = Column(String(20), default='member')  # 'captain', 'admin', 'member'
 
@@ -0,0 +1,32 @@
+from sqlalchemy import Column, Integer, SmallInteger, String, LargeBinary, DateTime
+from datetime import datetime
+from app.database import Base
+
+class HeatmapTile(Base):
+    """Run counts of one web-mercator tile as a grid of bins (see services.heatmap)"""
+    __tablename__ = "heatmap_tiles"
+
+    # Tiles of one full build; the live generation is served (see HeatmapGeneration)
+    generation = Column(Integer, primary_key=True, default=0)
+    zoom = Column(SmallInteger, primary_key=True)
+    x = Column(Integer, primary_key=True)
+    y = Column(Integer, primary_key=True)
+
+    # zlib-compressed TILE_BINS x TILE_BINS little-endian uint32 grid, rows top to bottom
+    counts = Column(LargeBinary, nullable=False)
+    max_count = Column(Integer, default=0)
+
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+class HeatmapGeneration(Base):
+    """
+    A generation of heatmap tiles: 'live' (served) or 'building' (being
+    rebuilt by scripts.build_heatmap). Without a live row, generation 0 is live.
+    """
+    __tablename__ = "heatmap_generations"
+
+    generation = Column(Integer, primary_key=True)
+    status = Column(String(10), nullable=False)  # 'building', 'live'
+    # A building generation gets runs created up to this time from the rebuild, later ones from the API
+    fence_at = Column(DateTime, nullable=False)
+    created_at = Column(DateTime, default=datetime.utcnow)
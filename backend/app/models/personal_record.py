@@ -0,0 +1,31 @@
+from sqlalchemy import Column, String, Float, DateTime, ForeignKey, UniqueConstraint
+from sqlalchemy.dialects.postgresql import UUID
+from sqlalchemy.orm import relationship
+import uuid
+from datetime import datetime
+from app.database import Base
+
+class PersonalRecord(Base):
+    __tablename__ = "personal_records"
+    __table_args__ = (
+        UniqueConstraint('user_id', 'effort', name='uq_personal_records_user_effort'),
+    )
+
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    user_id = Column(UUID(as_uuid=True), ForeignKey('users.id', ondelete='CASCADE'), nullable=False)
+
+    # Best effort: '1k', '5k', '10k', 'half_marathon', 'marathon'
+    effort = Column(String(20), nullable=False)
+    distance_km = Column(Float, nullable=False)
+    elapsed_seconds = Column(Float, nullable=False)
+
+    # Where the fastest window was found
+    run_id = Column(UUID(as_uuid=True), ForeignKey('runs.id', ondelete='CASCADE'), nullable=False)
+    start_offset_km = Column(Float, default=0.0)  # window start, from the run's start
+
+    achieved_at = Column(DateTime, nullable=False)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    # Relationships
+    user = relationship("User")
+    run = relationship("Run")
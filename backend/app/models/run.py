@@ -1,12 +1,18 @@
-from sqlalchemy import Column, String, Float, Integer, DateTime, ForeignKey, Text
+from sqlalchemy import Column, String, Float, Integer, BigInteger, DateTime, ForeignKey, Text, Index, UniqueConstraint
 from sqlalchemy.dialects.postgresql import UUID
-from sqlalchemy.orm import relationship
+from sqlalchemy.orm import relationship, deferred
 import uuid
 from datetime import datetime
 from app.database import Base
 
 class Run(Base):
     __tablename__ = "runs"
+    __table_args__ = (
+        # Covers run history keyset pagination: WHERE user_id = ? ORDER BY completed_at DESC, id DESC
+        Index('ix_runs_user_completed_at_id', 'user_id', 'completed_at', 'id'),
+        # Dedupes imported activities; app runs have no external_id
+        UniqueConstraint('user_id', 'source', 'external_id', name='uq_runs_user_source_external_id'),
+    )
 
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
     user_id = Column(UUID(as_uuid=True), ForeignKey('users.id', ondelete='CASCADE'), nullable=False)
@@ -20,11 +26,22 @@ class Run(Base):
 
     # Route data (encoded polyline string)
     route_polyline = Column(Text)
+    # Simplified levels of detail (NULL when the route is already small enough)
+    route_polyline_preview = deferred(Column(Text))
+    route_polyline_thumbnail = deferred(Column(Text))
     start_lat = Column(Float)
     start_lng = Column(Float)
     end_lat = Column(Float)
     end_lng = Column(Float)
 
+    # Spatial cell ids of the start and end points (see services.spatial_index)
+    start_cell = Column(BigInteger, index=True)
+    end_cell = Column(BigInteger, index=True)
+
+    # Anti-cheat verdict (see services.run_validation); rejected runs are left out of totals
+    validation_status = Column(String(20), default='ok')  # 'ok', 'flagged', 'rejected', 'pending' (see services.run_finalizer)
+    validation_flags = Column(String(200))  # comma-separated reasons
+
     # Timestamps
     started_at = Column(DateTime, nullable=False)
     completed_at = Column(DateTime, nullable=False)
@@ -36,3 +53,36 @@ class Run(Base):
 
     # Relationship
     user = relationship("User", back_populates="runs")
+
+
+class RunSession(Base):
+    __tablename__ = "run_sessions"
+
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    user_id = Column(UUID(as_uuid=True), ForeignKey('users.id', ondelete='CASCADE'), nullable=False, index=True)
+
+    # Status: 'active', 'finalized', 'cancelled'
+    status = Column(String(20), default='active')
+
+    # Running totals, updated per chunk
+    distance_km = Column(Float, default=0.0)
+    duration_seconds = Column(Integer, default=0)
+    point_count = Column(Integer, default=0)
+    chunk_count = Column(Integer, default=0)  # also the next expected chunk seq
+
+    # Route data (encoded polyline, appended per chunk; deferred so appends never load it)
+    route_polyline = deferred(Column(Text, default=''))
+    start_lat = Column(Float)
+    start_lng = Column(Float)
+    last_lat = Column(Float)
+    last_lng = Column(Float)
+
+    # Timestamps
+    started_at = Column(DateTime, nullable=False)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    # Run created on finalize
+    run_id = Column(UUID(as_uuid=True), ForeignKey('runs.id', ondelete='SET NULL'), nullable=True)
+
+    # Relationship
+    user = relationship("User")
@@ -0,0 +1,31 @@
+from sqlalchemy import Column, String, Float, Integer, Date, DateTime, ForeignKey
+from sqlalchemy.dialects.postgresql import UUID
+from datetime import datetime
+from app.database import Base
+
+class TrainingRollup(Base):
+    """A user's training totals for one day, week (from Monday) or month (see services.training_rollups)"""
+    __tablename__ = "training_rollups"
+
+    # Primary key order serves range reads: WHERE user_id = ? AND period = ? AND period_start BETWEEN ..
+    user_id = Column(UUID(as_uuid=True), ForeignKey('users.id', ondelete='CASCADE'), primary_key=True)
+    period = Column(String(5), primary_key=True)  # 'day', 'week', 'month'
+    period_start = Column(Date, primary_key=True)
+
+    distance_km = Column(Float, nullable=False, default=0.0)
+    duration_seconds = Column(Integer, nullable=False, default=0)
+    run_count = Column(Integer, nullable=False, default=0)
+    best_pace = Column(Float)  # min/km of the fastest run long enough to count (BEST_PACE_MIN_KM)
+
+    # Runs per average-pace bucket; bucket i is below PACE_BUCKET_EDGES[i] and at or above the edge before it
+    pace_bucket_0 = Column(Integer, nullable=False, default=0)
+    pace_bucket_1 = Column(Integer, nullable=False, default=0)
+    pace_bucket_2 = Column(Integer, nullable=False, default=0)
+    pace_bucket_3 = Column(Integer, nullable=False, default=0)
+    pace_bucket_4 = Column(Integer, nullable=False, default=0)
+    pace_bucket_5 = Column(Integer, nullable=False, default=0)
+    pace_bucket_6 = Column(Integer, nullable=False, default=0)
+    pace_bucket_7 = Column(Integer, nullable=False, default=0)
+    pace_bucket_8 = Column(Integer, nullable=False, default=0)
+
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
@@ -5,6 +5,9 @@ import uuid
 from datetime import datetime
 from app.database import Base
 
+# League tiers, lowest first
+LEAGUE_TIERS = ["Bronze", "Silver", "Gold", "Platinum", "Diamond"]
+
 class User(Base):
     __tablename__ = "users"
 
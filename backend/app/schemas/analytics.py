@@ -0,0 +1,22 @@
+from pydantic import BaseModel
+from typing import List, Optional
+from datetime import date
+
+class TrainingTotals(BaseModel):
+    distance_km: float
+    duration_seconds: int
+    run_count: int
+    avg_pace: Optional[float]  # min/km
+    best_pace: Optional[float]  # min/km, runs of at least 1 km
+    pace_distribution: List[int]  # runs per pace bucket, see pace_bucket_edges
+
+class TrainingBucket(TrainingTotals):
+    period_start: date
+
+class TrainingSummary(BaseModel):
+    period: str  # 'day', 'week' (from Monday) or 'month'
+    start: date
+    end: date
+    pace_bucket_edges: List[float]  # upper edges in min/km; the last bucket is everything slower
+    totals: TrainingTotals
+    buckets: List[TrainingBucket]
@@ -1,16 +1,17 @@
-from pydantic import BaseModel
-from typing import Optional
+from pydantic import BaseModel, Field
+from typing import Literal, Optional
 from datetime import datetime
+from uuid import UUID
 
 class BattleCreate(BaseModel):
-    distance_km: float
+    distance_km: float = Field(..., gt=0, le=100)
 
 class BattleResponse(BaseModel):
-    id: str
-    user1_id: str
-    user2_id: str
+    id: UUID
+    user1_id: UUID
+    user2_id: UUID
     distance_km: float
-    winner_id: Optional[str]
+    winner_id: Optional[UUID]
     status: str
     created_at: datetime
     started_at: Optional[datetime]
@@ -18,3 +19,14 @@ class BattleResponse(BaseModel):
 
     class Config:
         from_attributes = True
+
+class BattleProgress(BaseModel):
+    """Message a participant sends over the live battle socket"""
+    type: Literal["progress", "finish"]
+    distance_km: float = Field(..., ge=0)
+    elapsed_seconds: int = Field(..., ge=0)
+
+class MatchmakingStatus(BaseModel):
+    status: str  # 'queued', 'matched', 'idle'
+    battle_id: Optional[UUID] = None
+    wait_seconds: float = 0.0
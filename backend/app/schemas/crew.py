@@ -1,6 +1,7 @@
 from pydantic import BaseModel
 from typing import Optional
 from datetime import datetime
+from uuid import UUID
 
 class CrewCreate(BaseModel):
     name: str
@@ -9,10 +10,10 @@ class CrewCreate(BaseModel):
     max_members: int = 50
 
 class CrewResponse(BaseModel):
-    id: str
+    id: UUID
     name: str
     description: Optional[str]
-    captain_id: str
+    captain_id: UUID
     total_members: int
     total_distance_km: float
     total_runs: int
@@ -0,0 +1,17 @@
+from pydantic import BaseModel
+from datetime import datetime
+from uuid import UUID
+
+class NearbyRun(BaseModel):
+    id: UUID
+    distance_km: float
+    start_lat: float  # rounded to NEARBY_COORDINATE_DECIMALS
+    start_lng: float
+    completed_at: datetime
+    distance_from_km: float  # from the query point to the run's start, to 0.1 km
+
+class StartPoint(BaseModel):
+    geohash: str
+    lat: float  # mean start point of the runs in the cell
+    lng: float
+    run_count: int
@@ -0,0 +1,17 @@
+from pydantic import BaseModel
+from typing import Optional
+from datetime import datetime
+
+class StravaImportStatus(BaseModel):
+    status: str  # 'idle', 'running', 'completed', 'failed'
+    pages: int = 0
+    activities: int = 0
+    imported: int = 0
+    skipped: int = 0
+    rejected: int = 0  # imported but failed validation, not counted
+    error: Optional[str] = None
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+
+    class Config:
+        from_attributes = True
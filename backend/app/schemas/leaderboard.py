@@ -0,0 +1,23 @@
+from pydantic import BaseModel
+from typing import List, Optional
+from uuid import UUID
+
+class LeaderboardEntry(BaseModel):
+    rank: int
+    user_id: UUID
+    username: Optional[str] = None
+    score: float
+
+class LeaderboardResponse(BaseModel):
+    metric: str
+    scope: str
+    total: int
+    entries: List[LeaderboardEntry]
+
+class MyRankResponse(BaseModel):
+    metric: str
+    scope: str
+    rank: Optional[int]
+    score: Optional[float]
+    total: int
+    neighbors: List[LeaderboardEntry]
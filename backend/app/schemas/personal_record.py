@@ -0,0 +1,15 @@
+from pydantic import BaseModel
+from datetime import datetime
+from uuid import UUID
+
+class PersonalRecordResponse(BaseModel):
+    effort: str
+    distance_km: float
+    elapsed_seconds: float
+    pace: float  # min/km
+    run_id: UUID
+    start_offset_km: float
+    achieved_at: datetime
+
+    class Config:
+        from_attributes = True
@@ -1,10 +1,12 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 from typing import List, Optional
 from datetime import datetime
+from uuid import UUID
 
 class RoutePoint(BaseModel):
     lat: float
     lng: float
+    t: Optional[float] = None  # seconds since the run started
 
 class RunCreate(BaseModel):
     distance_km: float
@@ -17,8 +19,8 @@ class RunCreate(BaseModel):
     calories_burned: Optional[float] = 0.0
 
 class RunResponse(BaseModel):
-    id: str
-    user_id: str
+    id: UUID
+    user_id: UUID
     distance_km: float
     duration_seconds: int
     avg_pace: float
@@ -27,6 +29,39 @@ class RunResponse(BaseModel):
     started_at: datetime
     completed_at: datetime
     source: str
+    validation_status: Optional[str] = None
 
     class Config:
         from_attributes = True
+
+class RunSessionCreate(BaseModel):
+    start_time: datetime
+
+class RouteChunk(BaseModel):
+    seq: int = Field(..., ge=0)  # chunk sequence number, starting at 0
+    points: List[RoutePoint] = Field(default_factory=list, max_length=600)
+    elapsed_seconds: int = Field(..., ge=0)  # seconds since start at the last point
+
+class RunSessionFinalize(BaseModel):
+    end_time: datetime
+    duration_seconds: Optional[int] = None  # defaults to the last chunk's elapsed_seconds
+    calories_burned: Optional[float] = 0.0
+
+class RunSessionResponse(BaseModel):
+    id: UUID
+    status: str
+    distance_km: float
+    duration_seconds: int
+    point_count: int
+    chunk_count: int
+    last_lat: Optional[float]
+    last_lng: Optional[float]
+    started_at: datetime
+    updated_at: datetime
+    run_id: Optional[UUID]
+
+    class Config:
+        from_attributes = True
+
+class RunRouteResponse(RunResponse):
+    route_polyline: Optional[str] = None  # Google encoded polyline
@@ -0,0 +1,292 @@
+import asyncio
+import json
+import logging
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Set
+from uuid import UUID
+from sqlalchemy import and_, func, or_, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.config import settings
+from app.models.battle import Battle
+from app.services.gps_calculator import GPSCalculator
+from app.services.run_validation import VEHICLE_SPEED_KMH
+
+logger = logging.getLogger(__name__)
+
+
+def channel_name(battle_id) -> str:
+    return f"battle:{battle_id}"
+
+
+class BattleConnection:
+    """
+    One WebSocket watching a battle. Progress is coalesced to the latest
+    update per player and sent at most `max_rate` times a second, so a slow
+    client never builds a backlog; other events are sent in order. A
+    "closed" event ends the battle's channel and closes the socket.
+    """
+
+    def __init__(self, websocket, max_rate: float):
+        self.websocket = websocket
+        self.interval = 1.0 / max_rate
+        self._progress: Dict[str, dict] = {}
+        self._events: List[dict] = []
+        self._wake = asyncio.Event()
+        self.sent = 0
+        self.coalesced = 0
+
+    def deliver(self, message: dict):
+        if message.get("type") == "progress":
+            if message["user_id"] in self._progress:
+                self.coalesced += 1
+            self._progress[message["user_id"]] = message
+        else:
+            self._events.append(message)
+        self._wake.set()
+
+    async def run(self):
+        """Send loop; runs until the socket closes"""
+        while True:
+            await self._wake.wait()
+            self._wake.clear()
+            progress, self._progress = self._progress, {}
+            events, self._events = self._events, []
+
+            if progress:
+                await self.websocket.send_json({"type": "progress", "players": progress})
+                self.sent += 1
+            for event in events:
+                await self.websocket.send_json(event)
+                self.sent += 1
+                if event.get("type") == "closed":
+                    await self.websocket.close()
+                    return
+            await asyncio.sleep(self.interval)
+
+
+class BattleHub:
+    """
+    Pub/sub for live battles. Messages go straight to this process's
+    subscribers, or through Redis pub/sub when a Redis URL is given so that
+    players connected to different workers see each other; each worker then
+    subscribes only to the battles it has sockets for.
+    """
+
+    def __init__(self, redis_url: str = ""):
+        self._connections: Dict[str, Set[BattleConnection]] = {}
+        self._redis = None
+        self._pubsub = None
+        self._listener: Optional[asyncio.Task] = None
+        if redis_url:
+            import redis.asyncio as redis
+            self._redis = redis.from_url(redis_url, decode_responses=True)
+        self.published = 0
+
+    def __len__(self) -> int:
+        return sum(len(connections) for connections in self._connections.values())
+
+    def stats(self) -> dict:
+        return {
+            "channels": len(self._connections),
+            "connections": len(self),
+            "published": self.published,
+        }
+
+    async def connect(self, battle_id, connection: BattleConnection):
+        channel = channel_name(battle_id)
+        first = channel not in self._connections
+        self._connections.setdefault(channel, set()).add(connection)
+        if first and self._redis is not None:
+            await self._ensure_listener()
+            await self._pubsub.subscribe(channel)
+
+    async def disconnect(self, battle_id, connection: BattleConnection):
+        channel = channel_name(battle_id)
+        connections = self._connections.get(channel)
+        if connections is None:
+            return
+        connections.discard(connection)
+        if not connections:
+            del self._connections[channel]
+            if self._pubsub is not None:
+                await self._pubsub.unsubscribe(channel)
+
+    async def publish(self, battle_id, message: dict):
+        self.published += 1
+        if self._redis is not None:
+            await self._redis.publish(channel_name(battle_id), json.dumps(message))
+        else:
+            self._deliver(channel_name(battle_id), message)
+
+    def _deliver(self, channel: str, message: dict):
+        for connection in self._connections.get(channel, ()):
+            connection.deliver(message)
+
+    async def _ensure_listener(self):
+        if self._pubsub is None:
+            self._pubsub = self._redis.pubsub()
+        if self._listener is None or self._listener.done():
+            self._listener = asyncio.create_task(self._listen())
+
+    async def _listen(self):
+        while True:
+            try:
+                if not self._pubsub.subscribed:
+                    await asyncio.sleep(0.1)
+                    continue
+                message = await self._pubsub.get_message(ignore_subscribe_messages=True, timeout=1.0)
+                if message is not None:
+                    self._deliver(message["channel"], json.loads(message["data"]))
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception("Battle channel listener failed")
+                await asyncio.sleep(1.0)
+
+    async def close(self):
+        if self._listener is not None:
+            self._listener.cancel()
+        if self._pubsub is not None:
+            await self._pubsub.aclose()
+
+
+battle_hub = BattleHub(settings.REDIS_URL if settings.BATTLE_CHANNELS_REDIS else "")
+
+
+async def start_battle(db: AsyncSession, battle_id) -> Optional[datetime]:
+    """Mark a pending battle active on its first progress update; returns when it started"""
+    now = datetime.utcnow()
+    started_at = (await db.execute(
+        update(Battle)
+        .where(Battle.id == battle_id, Battle.status == 'pending')
+        .values(status='active', started_at=now, last_progress_at=now)
+        .returning(Battle.started_at)
+    )).scalar()
+    if started_at is None:
+        # The other player started it
+        started_at = await db.scalar(select(Battle.started_at).where(Battle.id == battle_id))
+    await db.commit()
+    return started_at
+
+
+async def touch_battle(db: AsyncSession, battle_id):
+    """Record that a player is still making progress, see sweep_abandoned_battles"""
+    await db.execute(
+        update(Battle)
+        .where(Battle.id == battle_id, Battle.status == 'active')
+        .values(last_progress_at=datetime.utcnow())
+    )
+    await db.commit()
+
+
+def reachable_distance(started_at: datetime, now: Optional[datetime] = None) -> float:
+    """
+    The farthest a runner can have got since the battle started: sustained
+    VEHICLE_SPEED_KMH plus BATTLE_DISTANCE_SLACK_KM of GPS error. Reported
+    distances are capped to this, so a car or a forged message cannot win.
+    """
+    elapsed_seconds = max(((now or datetime.utcnow()) - started_at).total_seconds(), 0.0)
+    return elapsed_seconds / 3600 * VEHICLE_SPEED_KMH + settings.BATTLE_DISTANCE_SLACK_KM
+
+
+async def record_finish(db: AsyncSession, battle: Battle, user_id: UUID,
+                        distance_km: float, elapsed_seconds: int) -> Optional[dict]:
+    """
+    Write one participant's final distance and time, once. When both have
+    finished the battle is completed and the result returned; both UPDATEs
+    are guarded so a retried or concurrent finish cannot apply twice.
+    Finishes short of the battle distance are ignored.
+    """
+    if distance_km < battle.distance_km:
+        return None
+    side = 1 if user_id == battle.user1_id else 2
+    time_column = getattr(Battle, f"user{side}_time")
+    row = (await db.execute(
+        update(Battle)
+        .where(Battle.id == battle.id, Battle.status == 'active', time_column == 0)
+        .values(**{
+            f"user{side}_distance": distance_km,
+            f"user{side}_time": elapsed_seconds,
+            f"user{side}_pace": GPSCalculator.calculate_pace(distance_km, elapsed_seconds),
+        })
+        .returning(Battle.user1_distance, Battle.user1_time, Battle.user2_distance, Battle.user2_time)
+    )).first()
+
+    result = None
+    if row is not None and row.user1_time and row.user2_time:
+        # Farther first, then faster
+        rank1 = (-row.user1_distance, row.user1_time)
+        rank2 = (-row.user2_distance, row.user2_time)
+        if rank1 == rank2:
+            winner_id = None
+        else:
+            winner_id = battle.user1_id if rank1 < rank2 else battle.user2_id
+        completed = (await db.execute(
+            update(Battle)
+            .where(Battle.id == battle.id, Battle.status == 'active')
+            .values(status='completed', winner_id=winner_id, completed_at=datetime.utcnow())
+            .returning(Battle.id)
+        )).first()
+        if completed is not None:
+            result = {
+                "type": "result",
+                "winner_id": str(winner_id) if winner_id else None,
+                "times": {str(battle.user1_id): row.user1_time, str(battle.user2_id): row.user2_time},
+            }
+    await db.commit()
+    return result
+
+
+async def sweep_abandoned_battles(db: AsyncSession, hub: BattleHub, abandon_seconds: float) -> int:
+    """
+    End battles nobody is racing any more: active battles with no progress
+    for `abandon_seconds`, and matched battles nobody started. A battle one
+    player finished is completed as a forfeit, so it is rated; the rest are
+    cancelled. Each battle's channel gets the outcome and is closed.
+    Returns the number of battles ended.
+    """
+    cutoff = datetime.utcnow() - timedelta(seconds=abandon_seconds)
+    battles = (await db.execute(
+        select(Battle.id, Battle.status, Battle.user1_id, Battle.user2_id, Battle.user1_time, Battle.user2_time)
+        .where(or_(
+            and_(Battle.status == 'active', func.coalesce(Battle.last_progress_at, Battle.started_at) < cutoff),
+            and_(Battle.status == 'pending', Battle.created_at < cutoff),
+        ))
+        .with_for_update(skip_locked=True)
+    )).all()
+
+    outcomes = []
+    for battle in battles:
+        winner_id = None
+        if battle.status == 'active' and bool(battle.user1_time) != bool(battle.user2_time):
+            winner_id = battle.user1_id if battle.user1_time else battle.user2_id
+        status = 'completed' if winner_id is not None else 'cancelled'
+        # Guarded, so a finish landing first wins
+        ended = (await db.execute(
+            update(Battle)
+            .where(Battle.id == battle.id, Battle.status == battle.status)
+            .values(status=status, winner_id=winner_id, completed_at=datetime.utcnow())
+            .returning(Battle.id)
+        )).first()
+        if ended is not None:
+            outcomes.append((battle.id, status, winner_id))
+    await db.commit()
+
+    for battle_id, status, winner_id in outcomes:
+        if status == 'completed':
+            await hub.publish(battle_id, {"type": "result", "winner_id": str(winner_id), "forfeit": True})
+        await hub.publish(battle_id, {"type": "closed", "status": status})
+    return len(outcomes)
+
+
+async def run_battle_sweeper(session_factory, interval: float):
+    """Background loop ending abandoned battles"""
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            async with session_factory() as db:
+                ended = await sweep_abandoned_battles(db, battle_hub, settings.BATTLE_ABANDON_SECONDS)
+            if ended:
+                logger.info("Ended %d abandoned battles", ended)
+        except Exception:
+            logger.exception("Battle sweep failed")
@@ -1,5 +1,7 @@
 from math import radians, cos, sin, asin, sqrt
+import numpy as np
 from typing import List, Tuple
+from app.services.route_engine import RouteEngine, RouteMetrics
 
 class GPSCalculator:
     """GPS distance and statistics calculator"""
@@ -29,14 +31,23 @@ class GPSCalculator:
         if len(route) < 2:
             return 0.0
 
-        total_distance = 0.0
-        for i in range(len(route) - 1):
-            lat1, lon1 = route[i]
-            lat2, lon2 = route[i + 1]
-            segment_distance = GPSCalculator.haversine_distance(lat1, lon1, lat2, lon2)
-            total_distance += segment_distance
+        return RouteEngine.total_distance(route)
 
-        return total_distance
+    @staticmethod
+    def distances_from(lat: float, lng: float, lats, lngs) -> np.ndarray:
+        """Distance in kilometers from one point to each of many, vectorized"""
+        return RouteEngine.haversine(lat, lng, np.asarray(lats, dtype=np.float64), np.asarray(lngs, dtype=np.float64))
+
+    @staticmethod
+    def calculate_route_metrics(route, times=None, duration_seconds: int = None) -> RouteMetrics:
+        """Segment, cumulative distance, speed and pace arrays for a whole route"""
+        return RouteEngine.compute(route, times, duration_seconds)
+
+    @staticmethod
+    def simplify_route(route, tolerance_m: float = None, max_points: int = None) -> np.ndarray:
+        """Douglas-Peucker simplified (n, 2) route, optionally capped at max_points"""
+        coords = RouteEngine.to_array(route)
+        return coords[RouteEngine.simplify(coords, tolerance_m, max_points)]
 
     @staticmethod
     def calculate_pace(distance_km: float, duration_seconds: int) -> float:
@@ -0,0 +1,399 @@
+import asyncio
+import logging
+import struct
+import time
+import zlib
+from collections import OrderedDict
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Tuple
+import numpy as np
+from sqlalchemy import select, tuple_, update
+from app.config import settings
+from app.database import dialect_insert
+from app.models.heatmap_tile import HeatmapGeneration, HeatmapTile
+from app.services.route_codec import RouteCodec
+
+# Bins per tile side; a tile is TILE_PIXELS wide when rendered
+TILE_BITS = 7
+TILE_BINS = 1 << TILE_BITS
+TILE_PIXELS = 256
+MAX_MERCATOR_LAT = 85.05112878
+
+# Longest segment filled in when densifying a route, in bins at the finest zoom; longer ones are GPS jumps
+MAX_GAP_BINS = 256
+# Runs through a bin drawn at full intensity
+SATURATION_COUNT = 50
+# Tiles read and written per statement when merging
+MERGE_BATCH = 500
+
+TileKey = Tuple[int, int, int]  # (zoom, x, y)
+
+logger = logging.getLogger(__name__)
+
+
+def mercator(coords) -> Tuple[np.ndarray, np.ndarray]:
+    """Web-mercator position of (lat, lng) points as fractions of the world, from the top-left"""
+    coords = np.asarray(coords, dtype=np.float64).reshape(-1, 2)
+    lat = np.radians(np.clip(coords[:, 0], -MAX_MERCATOR_LAT, MAX_MERCATOR_LAT))
+    x = (coords[:, 1] + 180.0) / 360.0
+    y = 0.5 - np.arcsinh(np.tan(lat)) / (2 * np.pi)
+    edge = np.nextafter(1.0, 0.0)
+    return np.clip(x, 0.0, edge), np.clip(y, 0.0, edge)
+
+
+def _densify(x: np.ndarray, y: np.ndarray, scale: int) -> Tuple[np.ndarray, np.ndarray]:
+    """Points added along each segment so consecutive points are at most one bin apart at `scale` bins per world"""
+    if len(x) < 2:
+        return x, y
+    steps = np.ceil(np.maximum(np.abs(np.diff(x)), np.abs(np.diff(y))) * scale).astype(np.int64)
+    steps = np.maximum(steps, 1)
+    # Jumps are not drawn across
+    steps[steps > MAX_GAP_BINS] = 1
+
+    owner = np.repeat(np.arange(len(steps)), steps)
+    t = (np.arange(len(owner)) - np.repeat(np.cumsum(steps) - steps, steps)) / steps[owner]
+    xs = x[owner] + (x[owner + 1] - x[owner]) * t
+    ys = y[owner] + (y[owner + 1] - y[owner]) * t
+    return np.append(xs, x[-1]), np.append(ys, y[-1])
+
+
+def rasterize_route(coords, zooms: Iterable[int]) -> Dict[TileKey, np.ndarray]:
+    """
+    Bins a route passes through at each zoom, as tile key -> flat bin
+    indices (row-major, top row first). A bin counts once per run, however
+    many points fall in it.
+    """
+    zooms = list(zooms)
+    coords = np.asarray(coords, dtype=np.float64).reshape(-1, 2)
+    if not len(coords) or not zooms:
+        return {}
+    finest = max(zooms)
+    bits = finest + TILE_BITS
+    x, y = _densify(*mercator(coords), 1 << bits)
+
+    # Distinct bins at the finest zoom; a coarser zoom's bins are these shifted down
+    cells = np.unique(((x * (1 << bits)).astype(np.int64) << bits) | (y * (1 << bits)).astype(np.int64))
+    cells_x, cells_y = cells >> bits, cells & ((1 << bits) - 1)
+
+    tiles = {}
+    for zoom in zooms:
+        gx = cells_x >> (finest - zoom)
+        gy = cells_y >> (finest - zoom)
+        tile = ((gx >> TILE_BITS) << zoom) | (gy >> TILE_BITS)
+        local = ((gy & (TILE_BINS - 1)) << TILE_BITS) | (gx & (TILE_BINS - 1))
+        # Sorted by tile, then bin, so each tile's bins are one slice
+        tile, local = np.divmod(np.unique(tile * TILE_BINS * TILE_BINS + local), TILE_BINS * TILE_BINS)
+        starts = np.flatnonzero(np.concatenate(([True], tile[1:] != tile[:-1])))
+        for index, bins in zip(tile[starts].tolist(), np.split(local, starts[1:])):
+            tiles[(zoom, index >> zoom, index & ((1 << zoom) - 1))] = bins
+    return tiles
+
+
+class TileDeltas:
+    """Count grids per tile, accumulated in memory before they are merged into stored tiles"""
+
+    def __init__(self):
+        self.grids: Dict[TileKey, np.ndarray] = {}
+
+    def __len__(self) -> int:
+        return len(self.grids)
+
+    def _grid(self, key: TileKey) -> np.ndarray:
+        grid = self.grids.get(key)
+        if grid is None:
+            grid = self.grids[key] = np.zeros(TILE_BINS * TILE_BINS, dtype=np.uint32)
+        return grid
+
+    def add_route(self, coords, zooms: Iterable[int]):
+        self.add_tiles(rasterize_route(coords, zooms))
+
+    def add_tiles(self, tiles: Dict[TileKey, np.ndarray]):
+        """Count one run's rasterized bins (see rasterize_route)"""
+        for key, bins in tiles.items():
+            self._grid(key)[bins] += 1
+
+    def add_sparse(self, sparse: Dict[TileKey, Tuple[np.ndarray, np.ndarray]]):
+        for key, (bins, counts) in sparse.items():
+            self._grid(key)[bins] += counts
+
+    def add(self, other: "TileDeltas"):
+        for key, grid in other.grids.items():
+            self._grid(key)[:] += grid
+
+    def sparse(self) -> Dict[TileKey, Tuple[np.ndarray, np.ndarray]]:
+        """Non-zero bins of every grid, far smaller to pass between processes"""
+        result = {}
+        for key, grid in self.grids.items():
+            bins = np.flatnonzero(grid).astype(np.int32)
+            result[key] = (bins, grid[bins])
+        return result
+
+
+def rasterize_polylines(polylines: List[Optional[str]], zooms: List[int]) -> Dict[TileKey, Tuple[np.ndarray, np.ndarray]]:
+    """Sparse tile counts of a batch of stored routes; a process pool task for backfills"""
+    deltas = TileDeltas()
+    for polyline in polylines:
+        deltas.add_route(RouteCodec.decode_stored(polyline), zooms)
+    return deltas.sparse()
+
+
+def encode_grid(grid: np.ndarray) -> bytes:
+    return zlib.compress(grid.astype("<u4").tobytes(), 6)
+
+
+def decode_grid(blob: bytes) -> np.ndarray:
+    return np.frombuffer(zlib.decompress(blob), dtype="<u4").astype(np.uint32)
+
+
+EMPTY_GRID = encode_grid(np.zeros(TILE_BINS * TILE_BINS, dtype=np.uint32))
+
+
+def generation_state(db) -> Tuple[int, Optional[Tuple[int, datetime]]]:
+    """The live tile generation, and the (generation, fence_at) being built if any; takes a sync Session"""
+    rows = db.execute(
+        select(HeatmapGeneration.generation, HeatmapGeneration.status, HeatmapGeneration.fence_at)
+    ).all()
+    live = max((row.generation for row in rows if row.status == 'live'), default=0)
+    building = max(((row.generation, row.fence_at) for row in rows if row.status == 'building'), default=None)
+    return live, building
+
+
+def merge_tiles(db, grids: Dict[TileKey, np.ndarray], generation: int = 0) -> int:
+    """
+    Add count grids into a generation's stored tiles and commit; returns the
+    number of tiles written. Takes a sync Session (async callers go through
+    run_sync). Missing tiles are created empty first so that every merge is
+    a locked read-modify-write, and concurrent writers never overwrite each other.
+    """
+    keys = sorted(grids)
+    now = datetime.utcnow()
+    for start in range(0, len(keys), MERGE_BATCH):
+        chunk = keys[start:start + MERGE_BATCH]
+        db.execute(
+            dialect_insert(db, HeatmapTile).values([
+                {"generation": generation, "zoom": zoom, "x": x, "y": y,
+                 "counts": EMPTY_GRID, "max_count": 0, "updated_at": now}
+                for zoom, x, y in chunk
+            ]).on_conflict_do_nothing(
+                index_elements=[HeatmapTile.generation, HeatmapTile.zoom, HeatmapTile.x, HeatmapTile.y]
+            )
+        )
+        stored = {
+            (row.zoom, row.x, row.y): row.counts
+            for row in db.execute(
+                select(HeatmapTile.zoom, HeatmapTile.x, HeatmapTile.y, HeatmapTile.counts)
+                .where(
+                    HeatmapTile.generation == generation,
+                    tuple_(HeatmapTile.zoom, HeatmapTile.x, HeatmapTile.y).in_(chunk)
+                )
+                .with_for_update()
+            )
+        }
+        rows = []
+        for key in chunk:
+            grid = decode_grid(stored[key]) + grids[key]
+            zoom, x, y = key
+            rows.append({
+                "generation": generation, "zoom": zoom, "x": x, "y": y,
+                "counts": encode_grid(grid), "max_count": int(grid.max()), "updated_at": now,
+            })
+        db.execute(update(HeatmapTile), rows)
+    db.commit()
+    return len(keys)
+
+
+def _png(rgba: np.ndarray) -> bytes:
+    """Minimal RGBA PNG encoder"""
+    height, width, _ = rgba.shape
+    # Each scanline starts with filter type 0
+    raw = np.concatenate([np.zeros((height, 1), dtype=np.uint8), rgba.reshape(height, width * 4)], axis=1)
+
+    def chunk(tag: bytes, data: bytes) -> bytes:
+        return struct.pack(">I", len(data)) + tag + data + struct.pack(">I", zlib.crc32(tag + data) & 0xFFFFFFFF)
+
+    return (
+        b"\x89PNG\r\n\x1a\n"
+        + chunk(b"IHDR", struct.pack(">IIBBBBB", width, height, 8, 6, 0, 0, 0))
+        + chunk(b"IDAT", zlib.compress(raw.tobytes(), 6))
+        + chunk(b"IEND", b"")
+    )
+
+
+def render_tile(grid: np.ndarray) -> bytes:
+    """PNG of a count grid: transparent where nobody ran, red to yellow by log count"""
+    intensity = np.clip(np.log1p(grid.reshape(TILE_BINS, TILE_BINS)) / np.log1p(SATURATION_COUNT), 0.0, 1.0)
+    scale = TILE_PIXELS // TILE_BINS
+    intensity = intensity.repeat(scale, axis=0).repeat(scale, axis=1)
+    rgba = np.empty(intensity.shape + (4,), dtype=np.uint8)
+    rgba[..., 0] = 255
+    rgba[..., 1] = (intensity * 230).astype(np.uint8)
+    rgba[..., 2] = (intensity * 60).astype(np.uint8)
+    rgba[..., 3] = np.where(intensity > 0, 80 + intensity * 175, 0).astype(np.uint8)
+    return _png(rgba)
+
+
+class Heatmap:
+    """
+    Community heatmap. Counted runs are rasterized at ingest into pending
+    per-tile deltas, which a background task merges into heatmap_tiles
+    every `flush_seconds`. Rendered tiles are served from an LRU cache
+    whose entries expire after `cache_ttl_seconds`, so tiles merged by
+    other workers show up too.
+
+    Each flush also re-reads the tile generations. While a rebuild is
+    building a new generation, runs created after its fence are counted
+    into it as well. Deltas for a generation that has since been replaced
+    are dropped, because the rebuild already counted those runs.
+    """
+
+    def __init__(self, min_zoom: int, max_zoom: int, cache_entries: int, cache_ttl_seconds: int):
+        self.zooms = list(range(min_zoom, max_zoom + 1))
+        self.cache_entries = cache_entries
+        self.cache_ttl_seconds = cache_ttl_seconds
+        self.live_generation = 0
+        self.building: Optional[Tuple[int, datetime]] = None  # (generation, fence_at)
+        self.pending: Dict[int, TileDeltas] = {}  # generation -> deltas
+        self._cache = OrderedDict()  # key -> (expires_at, png)
+        self._empty_png: Optional[bytes] = None
+        self._task: Optional[asyncio.Task] = None
+
+        self.runs_added = 0
+        self.tiles_merged = 0
+        self.flushes = 0
+        self.failures = 0
+        self.hits = 0
+        self.misses = 0
+
+    def add_route(self, coords, created_at: datetime):
+        """Count a run's route; it is written with the next flush"""
+        if not len(coords):
+            return
+        self.add_tiles(rasterize_route(coords, self.zooms), created_at)
+
+    def add_tiles(self, tiles: Dict[TileKey, np.ndarray], created_at: datetime):
+        """Count a run rasterized at self.zooms (see rasterize_route), e.g. in a route_work process"""
+        if not tiles:
+            return
+        generations = [self.live_generation]
+        # Runs up to the fence are counted by the rebuild itself
+        if self.building is not None and created_at > self.building[1]:
+            generations.append(self.building[0])
+        for generation in generations:
+            self.pending.setdefault(generation, TileDeltas()).add_tiles(tiles)
+        self.runs_added += 1
+
+    async def refresh(self, session_factory):
+        """Re-read the live and building tile generations"""
+        async with session_factory() as db:
+            live, building = await db.run_sync(generation_state)
+        if live != self.live_generation:
+            self._cache.clear()
+        self.live_generation, self.building = live, building
+
+    async def flush(self, session_factory) -> int:
+        """Merge pending deltas into stored tiles; returns the number of tiles written"""
+        if not self.pending:
+            return 0
+        pending, self.pending = self.pending, {}
+        current = {self.live_generation} | ({self.building[0]} if self.building is not None else set())
+        written = 0
+        try:
+            async with session_factory() as db:
+                while pending:
+                    generation, deltas = next(iter(pending.items()))
+                    if generation in current:
+                        written += await db.run_sync(merge_tiles, deltas.grids, generation)
+                    if generation == self.live_generation:
+                        for key in deltas.grids:
+                            self._cache.pop(key, None)
+                    del pending[generation]
+        except Exception:
+            # Kept for the next flush
+            for generation, deltas in pending.items():
+                deltas.add(self.pending.get(generation, TileDeltas()))
+                self.pending[generation] = deltas
+            self.failures += 1
+            raise
+        finally:
+            self.tiles_merged += written
+        self.flushes += 1
+        return written
+
+    async def _run(self, session_factory, flush_seconds: float):
+        while True:
+            try:
+                await self.refresh(session_factory)
+                await self.flush(session_factory)
+            except Exception:
+                logger.exception("Heatmap flush failed")
+            await asyncio.sleep(flush_seconds)
+
+    def start(self, session_factory, flush_seconds: float):
+        self._task = asyncio.create_task(self._run(session_factory, flush_seconds))
+
+    async def stop(self, session_factory):
+        """Stop flushing and write what is pending"""
+        if self._task is None:
+            return
+        self._task.cancel()
+        self._task = None
+        try:
+            await self.flush(session_factory)
+        except Exception:
+            logger.exception("Heatmap counts for %d tiles not written at shutdown",
+                             sum(len(deltas) for deltas in self.pending.values()))
+
+    def has_tile(self, zoom: int, x: int, y: int) -> bool:
+        return zoom in self.zooms and 0 <= x < (1 << zoom) and 0 <= y < (1 << zoom)
+
+    async def tile(self, db, zoom: int, x: int, y: int) -> bytes:
+        """Rendered PNG of a tile; transparent where nobody has run"""
+        key = (zoom, x, y)
+        now = time.time()
+        entry = self._cache.get(key)
+        if entry is not None and entry[0] > now:
+            self._cache.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+        self.misses += 1
+        blob = await db.scalar(
+            select(HeatmapTile.counts).where(
+                HeatmapTile.generation == self.live_generation,
+                HeatmapTile.zoom == zoom, HeatmapTile.x == x, HeatmapTile.y == y
+            )
+        )
+        if blob is None:
+            if self._empty_png is None:
+                self._empty_png = render_tile(np.zeros(TILE_BINS * TILE_BINS, dtype=np.uint32))
+            png = self._empty_png
+        else:
+            png = render_tile(decode_grid(blob))
+
+        self._cache[key] = (now + self.cache_ttl_seconds, png)
+        self._cache.move_to_end(key)
+        while len(self._cache) > self.cache_entries:
+            self._cache.popitem(last=False)
+        return png
+
+    def stats(self) -> dict:
+        return {
+            "live_generation": self.live_generation,
+            "building_generation": self.building[0] if self.building is not None else None,
+            "pending_tiles": sum(len(deltas) for deltas in self.pending.values()),
+            "runs_added": self.runs_added,
+            "tiles_merged": self.tiles_merged,
+            "flushes": self.flushes,
+            "failures": self.failures,
+            "cache_entries": len(self._cache),
+            "cache_hits": self.hits,
+            "cache_misses": self.misses,
+        }
+
+
+heatmap = Heatmap(
+    settings.HEATMAP_MIN_ZOOM,
+    settings.HEATMAP_MAX_ZOOM,
+    settings.HEATMAP_CACHE_ENTRIES,
+    settings.HEATMAP_CACHE_TTL_SECONDS
+)
@@ -0,0 +1,273 @@
+import logging
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, List, Optional, Tuple
+from uuid import UUID
+from sortedcontainers import SortedList
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.config import settings
+from app.models.crew import CrewMembership
+from app.models.user import User, LEAGUE_TIERS
+
+# Ranked metric -> User column
+METRICS = {
+    "distance": User.total_distance_km,
+    "elo": User.elo_rating,
+    "league_points": User.league_points,
+}
+SCOPES = ("global", "tier", "crew")
+
+# Users changed this long before a rebuild started are re-applied after its swap too, for clock skew
+REBUILD_REPLAY_MARGIN = timedelta(seconds=5)
+
+logger = logging.getLogger(__name__)
+
+
+def board_key(metric: str, scope: str = "global", scope_id=None) -> str:
+    if scope == "global":
+        return f"leaderboard:{metric}:global"
+    return f"leaderboard:{metric}:{scope}:{scope_id}"
+
+
+class _SortedSet:
+    """Sorted set ranked by descending score; O(log n) updates and rank lookups"""
+
+    def __init__(self):
+        self._keys = SortedList()  # (-score, member)
+        self._scores: Dict[str, float] = {}
+
+    def add(self, member: str, score: float):
+        old = self._scores.get(member)
+        if old is not None:
+            if old == score:
+                return
+            self._keys.remove((-old, member))
+        self._keys.add((-score, member))
+        self._scores[member] = score
+
+    def remove(self, member: str):
+        old = self._scores.pop(member, None)
+        if old is not None:
+            self._keys.remove((-old, member))
+
+    def rank(self, member: str) -> Optional[int]:
+        score = self._scores.get(member)
+        if score is None:
+            return None
+        return self._keys.bisect_left((-score, member))
+
+    def score(self, member: str) -> Optional[float]:
+        return self._scores.get(member)
+
+    def range(self, start: int, stop: int) -> List[Tuple[str, float]]:
+        return [(member, -neg) for neg, member in self._keys.islice(start, stop + 1)]
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+
+class InMemorySortedSets:
+    """Per-process fallback with the subset of Redis sorted-set commands we use"""
+
+    def __init__(self):
+        self._sets: Dict[str, _SortedSet] = {}
+
+    async def add(self, board: str, mapping: Dict[str, float]):
+        sorted_set = self._sets.setdefault(board, _SortedSet())
+        for member, score in mapping.items():
+            sorted_set.add(member, score)
+
+    async def remove(self, board: str, member: str):
+        if board in self._sets:
+            self._sets[board].remove(member)
+
+    async def rank(self, board: str, member: str) -> Optional[int]:
+        return self._sets[board].rank(member) if board in self._sets else None
+
+    async def score(self, board: str, member: str) -> Optional[float]:
+        return self._sets[board].score(member) if board in self._sets else None
+
+    async def range(self, board: str, start: int, stop: int) -> List[Tuple[str, float]]:
+        return self._sets[board].range(start, stop) if board in self._sets else []
+
+    async def size(self, board: str) -> int:
+        return len(self._sets.get(board, ()))
+
+    async def rename(self, source: str, target: str):
+        self._sets[target] = self._sets.pop(source, _SortedSet())
+
+
+class RedisSortedSets:
+    """Redis sorted sets shared by all workers"""
+
+    def __init__(self, redis_url: str):
+        import redis.asyncio as redis
+        self._redis = redis.from_url(redis_url, decode_responses=True)
+
+    async def add(self, board: str, mapping: Dict[str, float]):
+        await self._redis.zadd(board, mapping)
+
+    async def remove(self, board: str, member: str):
+        await self._redis.zrem(board, member)
+
+    async def rank(self, board: str, member: str) -> Optional[int]:
+        return await self._redis.zrevrank(board, member)
+
+    async def score(self, board: str, member: str) -> Optional[float]:
+        return await self._redis.zscore(board, member)
+
+    async def range(self, board: str, start: int, stop: int) -> List[Tuple[str, float]]:
+        return await self._redis.zrevrange(board, start, stop, withscores=True)
+
+    async def size(self, board: str) -> int:
+        return await self._redis.zcard(board)
+
+    async def rename(self, source: str, target: str):
+        if await self._redis.exists(source):
+            await self._redis.rename(source, target)
+        else:
+            await self._redis.delete(target)
+
+
+class Leaderboards:
+    """
+    Global, per-league-tier and per-crew rankings for each metric, kept in
+    sorted sets and updated incrementally as scores change.
+    """
+
+    def __init__(self, store):
+        self.store = store
+
+    async def update_user(self, user_id: UUID, scores: Dict[str, float],
+                          tier: Optional[str] = None, crew_ids: Iterable = ()):
+        """Set a user's new scores on every board they appear on"""
+        member = str(user_id)
+        for metric, score in scores.items():
+            await self.store.add(board_key(metric), {member: score})
+            for crew_id in crew_ids:
+                await self.store.add(board_key(metric, "crew", crew_id), {member: score})
+        if tier is not None:
+            await self._place_on_tier(member, tier, scores)
+
+    async def _place_on_tier(self, member: str, tier: str, scores: Dict[str, float]):
+        """
+        Put the user on their tier's board of every metric. A tier change
+        moves them off the other tier boards, including the boards of
+        metrics not in `scores`, whose score is taken from the global board.
+        """
+        for metric in METRICS:
+            board = board_key(metric, "tier", tier)
+            moved = await self.store.score(board, member) is None
+            score = scores.get(metric)
+            if score is None and moved:
+                score = await self.store.score(board_key(metric), member)
+            if score is not None:
+                await self.store.add(board, {member: score})
+            if moved:
+                for other in LEAGUE_TIERS:
+                    if other != tier:
+                        await self.store.remove(board_key(metric, "tier", other), member)
+
+    async def top(self, board: str, start: int, limit: int) -> List[Tuple[int, str, float]]:
+        """(rank, user_id, score) for a page of a board, rank starting at 1"""
+        entries = await self.store.range(board, start, start + limit - 1)
+        return [(start + i + 1, member, score) for i, (member, score) in enumerate(entries)]
+
+    async def around(self, board: str, user_id: UUID, radius: int) -> Tuple[Optional[int], List[Tuple[int, str, float]]]:
+        """A user's rank (from 1) and the players ranked up to `radius` places either side"""
+        rank = await self.store.rank(board, str(user_id))
+        if rank is None:
+            return None, []
+        start = max(rank - radius, 0)
+        return rank + 1, await self.top(board, start, rank - start + radius + 1)
+
+    async def rebuild(self, db: AsyncSession, batch_size: int = 10000) -> int:
+        """
+        Rebuild every board from the users table; boards are swapped in when
+        complete. Users changed while the rebuild ran (their updates went to
+        the old boards) are re-read and applied to the new ones after the swap.
+        """
+        started = datetime.utcnow() - REBUILD_REPLAY_MARGIN
+        boards = set()
+        memberships = await self._memberships(db)
+
+        users = 0
+        result = await db.stream(
+            select(User.id, User.league_tier, *METRICS.values()).execution_options(yield_per=batch_size)
+        )
+        async for partition in result.partitions():
+            staged: Dict[str, Dict[str, float]] = {}
+            for row in partition:
+                member = str(row.id)
+                for metric, column in METRICS.items():
+                    score = float(getattr(row, column.key) or 0)
+                    keys = [board_key(metric), board_key(metric, "tier", row.league_tier)]
+                    keys += [board_key(metric, "crew", crew_id) for crew_id in memberships.get(row.id, ())]
+                    for key in keys:
+                        staged.setdefault(key, {})[member] = score
+            for key, mapping in staged.items():
+                await self.store.add(f"{key}:rebuild", mapping)
+                boards.add(key)
+            users += len(partition)
+
+        for metric in METRICS:
+            boards.add(board_key(metric))
+            boards.update(board_key(metric, "tier", tier) for tier in LEAGUE_TIERS)
+        for key in boards:
+            await self.store.rename(f"{key}:rebuild", key)
+
+        changed = (await db.execute(
+            select(User.id, User.league_tier, *METRICS.values()).where(User.updated_at >= started)
+        )).all()
+        if changed:
+            memberships = await self._memberships(db, [row.id for row in changed])
+            for row in changed:
+                scores = {metric: float(getattr(row, column.key) or 0) for metric, column in METRICS.items()}
+                await self.update_user(row.id, scores, row.league_tier, memberships.get(row.id, ()))
+        return users
+
+    @staticmethod
+    async def _memberships(db: AsyncSession, user_ids=None) -> Dict[UUID, List[UUID]]:
+        query = select(CrewMembership.user_id, CrewMembership.crew_id)
+        if user_ids is not None:
+            query = query.where(CrewMembership.user_id.in_(user_ids))
+        memberships: Dict[UUID, List[UUID]] = {}
+        for user_id, crew_id in (await db.execute(query)).all():
+            memberships.setdefault(user_id, []).append(crew_id)
+        return memberships
+
+
+leaderboards = Leaderboards(
+    RedisSortedSets(settings.REDIS_URL) if settings.LEADERBOARD_REDIS else InMemorySortedSets()
+)
+
+
+async def publish_scores(db: AsyncSession, changes: Dict[UUID, Tuple[Dict[str, float], Optional[str]]]):
+    """
+    Push committed score changes ({user_id: (scores, tier)}) to the boards.
+    Failures are logged, not raised: the boards can always be rebuilt.
+    """
+    if not changes:
+        return
+    try:
+        crews: Dict[UUID, List[UUID]] = {}
+        for user_id, crew_id in (await db.execute(
+            select(CrewMembership.user_id, CrewMembership.crew_id)
+            .where(CrewMembership.user_id.in_(changes.keys()))
+        )).all():
+            crews.setdefault(user_id, []).append(crew_id)
+
+        for user_id, (scores, tier) in changes.items():
+            await leaderboards.update_user(user_id, scores, tier, crews.get(user_id, ()))
+    except Exception:
+        logger.exception("Leaderboard update failed")
+
+
+async def rebuild_leaderboards(session_factory):
+    """Background rebuild of every board"""
+    try:
+        async with session_factory() as db:
+            users = await leaderboards.rebuild(db)
+        logger.info("Rebuilt leaderboards for %d users", users)
+    except Exception:
+        logger.exception("Leaderboard rebuild failed")
@@ -0,0 +1,208 @@
+import asyncio
+import bisect
+import logging
+import time
+import uuid
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+from sqlalchemy import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.config import settings
+from app.models.battle import Battle
+
+logger = logging.getLogger(__name__)
+
+# How long a match stays visible to polling players
+MATCH_RESULT_TTL_SECONDS = 300
+
+
+class MatchmakingEngine:
+    """
+    In-process 1v1 matchmaking. Waiting players sit in a rating-sorted list
+    per battle distance; the nearest-rated opponent is found by bisection and
+    the acceptable rating gap widens the longer a player waits. Matches are
+    buffered and written as Battle rows in batches by flush().
+
+    State lives in this process, so run one matchmaking worker (or route
+    queue requests to a single worker).
+    """
+
+    def __init__(self, base_window: float, window_growth: float, max_window: float):
+        self.base_window = base_window
+        self.window_growth = window_growth  # rating points per second waited
+        self.max_window = max_window
+
+        self._queues: Dict[float, List[Tuple[int, int, uuid.UUID]]] = {}  # distance -> sorted (rating, seq, user_id)
+        self._tickets: Dict[uuid.UUID, Tuple[float, int, int, float]] = {}  # user_id -> (distance, rating, seq, enqueued_at)
+        self._matches: Dict[uuid.UUID, Tuple[uuid.UUID, float]] = {}  # user_id -> (battle_id, matched_at)
+        self._pending: List[dict] = []  # Battle rows not yet written
+        self._seq = 0
+
+    @staticmethod
+    def _distance_key(distance_km: float) -> float:
+        return round(distance_km, 1)
+
+    def window(self, waited_seconds: float) -> float:
+        """Largest rating gap a player accepts after waiting this long"""
+        return min(self.base_window + self.window_growth * waited_seconds, self.max_window)
+
+    def __len__(self) -> int:
+        return len(self._tickets)
+
+    @property
+    def pending_battles(self) -> int:
+        return len(self._pending)
+
+    def stats(self) -> dict:
+        return {
+            "queued": len(self._tickets),
+            "matched_awaiting_poll": len(self._matches),
+            "pending_battles": len(self._pending),
+        }
+
+    def enqueue(self, user_id: uuid.UUID, rating: int, distance_km: float,
+                now: Optional[float] = None, try_match: bool = True) -> Optional[uuid.UUID]:
+        """Queue a player; returns the battle id if an opponent was found right away"""
+        now = time.monotonic() if now is None else now
+        self.dequeue(user_id)
+        self._matches.pop(user_id, None)
+
+        key = self._distance_key(distance_km)
+        queue = self._queues.setdefault(key, [])
+
+        if try_match:
+            index = self._nearest(queue, rating, now)
+            if index is not None:
+                _, _, opponent_id = queue.pop(index)
+                opponent = self._tickets.pop(opponent_id)
+                return self._pair(opponent_id, opponent[1], user_id, rating, key, now)
+
+        self._seq += 1
+        bisect.insort(queue, (rating, self._seq, user_id))
+        self._tickets[user_id] = (key, rating, self._seq, now)
+        return None
+
+    def dequeue(self, user_id: uuid.UUID) -> bool:
+        """Remove a waiting player; returns False if they were not queued"""
+        ticket = self._tickets.pop(user_id, None)
+        if ticket is None:
+            return False
+
+        key, rating, seq, _ = ticket
+        queue = self._queues[key]
+        index = bisect.bisect_left(queue, (rating, seq))
+        if index < len(queue) and queue[index][2] == user_id:
+            del queue[index]
+        return True
+
+    def status(self, user_id: uuid.UUID, now: Optional[float] = None) -> Tuple[str, Optional[uuid.UUID], float]:
+        """('matched', battle_id, 0), ('queued', None, waited_seconds) or ('idle', None, 0)"""
+        now = time.monotonic() if now is None else now
+        if user_id in self._matches:
+            return "matched", self._matches[user_id][0], 0.0
+        if user_id in self._tickets:
+            return "queued", None, now - self._tickets[user_id][3]
+        return "idle", None, 0.0
+
+    def _nearest(self, queue: list, rating: int, now: float) -> Optional[int]:
+        """Index of the closest-rated acceptable opponent, O(log n)"""
+        index = bisect.bisect_left(queue, (rating,))
+        best = None
+        best_gap = None
+        for candidate in (index - 1, index):
+            if not 0 <= candidate < len(queue):
+                continue
+            opponent_rating, _, opponent_id = queue[candidate]
+            gap = abs(opponent_rating - rating)
+            # The opponent's window has been widening while they waited
+            waited = now - self._tickets[opponent_id][3]
+            if gap <= self.window(waited) and (best_gap is None or gap < best_gap):
+                best, best_gap = candidate, gap
+        return best
+
+    def _pair(self, user1_id, user1_rating, user2_id, user2_rating, distance_km, now) -> uuid.UUID:
+        battle_id = uuid.uuid4()
+        self._pending.append({
+            "id": battle_id,
+            "user1_id": user1_id,
+            "user2_id": user2_id,
+            "distance_km": distance_km,
+            "user1_elo_before": user1_rating,
+            "user2_elo_before": user2_rating,
+            "status": "pending",
+            "created_at": datetime.utcnow(),
+        })
+        self._matches[user1_id] = (battle_id, now)
+        self._matches[user2_id] = (battle_id, now)
+        return battle_id
+
+    def sweep(self, now: Optional[float] = None) -> int:
+        """
+        Pair adjacent waiting players whose widened windows now overlap.
+        One linear pass per distance; returns the number of battles created.
+        """
+        now = time.monotonic() if now is None else now
+        created = 0
+
+        for key, queue in self._queues.items():
+            remaining = []
+            i = 0
+            while i < len(queue):
+                if i + 1 < len(queue):
+                    rating_a, _, user_a = queue[i]
+                    rating_b, _, user_b = queue[i + 1]
+                    window = max(
+                        self.window(now - self._tickets[user_a][3]),
+                        self.window(now - self._tickets[user_b][3])
+                    )
+                    if rating_b - rating_a <= window:
+                        del self._tickets[user_a], self._tickets[user_b]
+                        self._pair(user_a, rating_a, user_b, rating_b, key, now)
+                        created += 1
+                        i += 2
+                        continue
+                remaining.append(queue[i])
+                i += 1
+            queue[:] = remaining
+
+        # Forget matches nobody polled for
+        expired = [uid for uid, (_, at) in self._matches.items() if now - at > MATCH_RESULT_TTL_SECONDS]
+        for user_id in expired:
+            del self._matches[user_id]
+
+        return created
+
+    async def flush(self, db: AsyncSession) -> int:
+        """Write buffered battles in one multi-row INSERT; returns the number written"""
+        rows, self._pending = self._pending, []
+        if not rows:
+            return 0
+
+        try:
+            await db.execute(insert(Battle), rows)
+            await db.commit()
+        except Exception:
+            # Keep them for the next flush
+            self._pending = rows + self._pending
+            raise
+        return len(rows)
+
+
+matchmaker = MatchmakingEngine(
+    settings.MATCHMAKING_BASE_WINDOW,
+    settings.MATCHMAKING_WINDOW_GROWTH,
+    settings.MATCHMAKING_MAX_WINDOW
+)
+
+
+async def run_matchmaking(session_factory, interval: float):
+    """Background loop: widen windows, pair players and flush battles"""
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            matchmaker.sweep()
+            if matchmaker.pending_battles:
+                async with session_factory() as db:
+                    await matchmaker.flush(db)
+        except Exception:
+            logger.exception("Matchmaking tick failed")
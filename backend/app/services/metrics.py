@@ -0,0 +1,322 @@
+import bisect
+import heapq
+import logging
+import time
+from collections import deque
+from contextvars import ContextVar
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Tuple
+from sqlalchemy import event
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+PROMETHEUS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+STATEMENT_COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+
+# Statements kept per request for slow-request samples
+MAX_SAMPLED_STATEMENTS = 200
+MAX_STATEMENT_CHARS = 500
+
+
+class Histogram:
+    """Cumulative-bucket histogram per label set, in Prometheus form"""
+
+    def __init__(self, name: str, help_text: str, buckets: Tuple[float, ...]):
+        self.name = name
+        self.help_text = help_text
+        self.buckets = buckets
+        self._series: Dict[tuple, list] = {}  # labels -> [bucket counts..., sum, count]
+
+    def observe(self, value: float, labels: tuple = ()):
+        series = self._series.get(labels)
+        if series is None:
+            series = self._series[labels] = [0] * (len(self.buckets) + 2)
+        index = bisect.bisect_left(self.buckets, value)
+        if index < len(self.buckets):
+            series[index] += 1
+        series[-2] += value
+        series[-1] += 1
+
+    def render(self, label_names: Tuple[str, ...] = ()) -> Iterable[str]:
+        yield f"# HELP {self.name} {self.help_text}"
+        yield f"# TYPE {self.name} histogram"
+        for labels, series in sorted(self._series.items()):
+            base = _labels(zip(label_names, labels))
+            cumulative = 0
+            for bound, count in zip(self.buckets, series):
+                cumulative += count
+                yield f"{self.name}_bucket{_labels(zip(label_names, labels), le=_number(bound))} {cumulative}"
+            yield f'{self.name}_bucket{_labels(zip(label_names, labels), le="+Inf")} {series[-1]}'
+            yield f"{self.name}_sum{base} {_number(series[-2])}"
+            yield f"{self.name}_count{base} {series[-1]}"
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(pairs, **extra) -> str:
+    items = [f'{name}="{_escape(value)}"' for name, value in list(pairs) + list(extra.items())]
+    return "{" + ",".join(items) + "}" if items else ""
+
+
+def _compact(statement: str) -> str:
+    return " ".join(statement.split())[:MAX_STATEMENT_CHARS]
+
+
+def _number(value) -> str:
+    if isinstance(value, bool):
+        return "1" if value else "0"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class RequestStats:
+    """SQL work done on behalf of one request"""
+
+    __slots__ = ("statements", "db_seconds", "sampled")
+
+    def __init__(self):
+        self.statements = 0
+        self.db_seconds = 0.0
+        self.sampled: List[Tuple[str, float]] = []
+
+    def add(self, statement: str, seconds: float):
+        self.statements += 1
+        self.db_seconds += seconds
+        if len(self.sampled) < MAX_SAMPLED_STATEMENTS:
+            self.sampled.append((statement, seconds))
+
+
+current_request: ContextVar[Optional[RequestStats]] = ContextVar("current_request", default=None)
+
+
+class Metrics:
+    """
+    Process-wide request and database metrics. SQL statements are timed by
+    engine events and charged to the request running them through a
+    context variable; requests slower than `slow_request_seconds` are kept,
+    with their statements, for inspection.
+    """
+
+    def __init__(self, slow_request_seconds: float, slow_request_samples: int, slow_statements: int):
+        self.slow_request_seconds = slow_request_seconds
+        self.slow_statements = slow_statements
+        self.request_duration = Histogram(
+            "http_request_duration_seconds", "Request latency by route", LATENCY_BUCKETS
+        )
+        self.request_statements = Histogram(
+            "http_request_db_statements", "SQL statements per request by route", STATEMENT_COUNT_BUCKETS
+        )
+        self.request_db_time = Histogram(
+            "http_request_db_seconds", "Time spent in SQL per request by route", LATENCY_BUCKETS
+        )
+        self.statement_duration = Histogram(
+            "db_statement_duration_seconds", "SQL statement latency", LATENCY_BUCKETS
+        )
+        self.pool_checkout = Histogram(
+            "db_pool_checkout_seconds", "Wait for a pooled connection, including opening new ones", LATENCY_BUCKETS
+        )
+        self.slow_requests: deque = deque(maxlen=slow_request_samples)
+        self.slow_requests_total = 0
+        self._slowest: List[Tuple[float, str]] = []  # min-heap of (seconds, statement)
+        self._slowest_index: Dict[str, float] = {}
+        self._pools = []
+        self._histograms: List[Histogram] = []
+
+    def register_histogram(self, histogram: Histogram):
+        """Export a histogram kept by another component"""
+        self._histograms.append(histogram)
+
+    # Engine instrumentation
+
+    def instrument_engine(self, engine, name: str):
+        """Time every statement and pool checkout on a (sync) Engine, labelled `name`"""
+        event.listen(engine, "before_cursor_execute", self._before_cursor_execute)
+        event.listen(engine, "after_cursor_execute", self._after_cursor_execute)
+        self._time_checkouts(engine.pool)
+        self._pools.append((name, engine.pool))
+
+    def _time_checkouts(self, pool):
+        # Pools have no event before a checkout starts waiting; wrap the call that waits
+        do_get = getattr(pool, "_do_get", None)
+        if do_get is None:
+            return
+
+        def timed_do_get():
+            start = time.perf_counter()
+            try:
+                return do_get()
+            finally:
+                self.pool_checkout.observe(time.perf_counter() - start)
+
+        pool._do_get = timed_do_get
+
+    @staticmethod
+    def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("query_start", []).append(time.perf_counter())
+
+    def _after_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        starts = conn.info.get("query_start")
+        if not starts:
+            return
+        seconds = time.perf_counter() - starts.pop()
+        self.statement_duration.observe(seconds)
+        self._track_slowest(statement, seconds)
+        stats = current_request.get()
+        if stats is not None:
+            stats.add(statement, seconds)
+
+    def _track_slowest(self, statement: str, seconds: float):
+        """Keep the slowest distinct statements seen, by their worst time"""
+        # Compiled statements are cached, so the same SQL arrives as the same string
+        known = self._slowest_index.get(statement)
+        if known is not None:
+            if seconds > known:
+                self._slowest_index[statement] = seconds
+                self._slowest = [(s, text) for s, text in self._slowest if text != statement] + [(seconds, statement)]
+                heapq.heapify(self._slowest)
+            return
+        if len(self._slowest) < self.slow_statements:
+            heapq.heappush(self._slowest, (seconds, statement))
+        elif seconds > self._slowest[0][0]:
+            _, evicted = heapq.heapreplace(self._slowest, (seconds, statement))
+            del self._slowest_index[evicted]
+        else:
+            return
+        self._slowest_index[statement] = seconds
+
+    # Requests
+
+    def record_request(self, method: str, route: str, path: str, status_code: int,
+                       seconds: float, stats: RequestStats):
+        self.request_duration.observe(seconds, (method, route, str(status_code)))
+        self.request_statements.observe(stats.statements, (route,))
+        self.request_db_time.observe(stats.db_seconds, (route,))
+
+        if seconds >= self.slow_request_seconds:
+            self.slow_requests_total += 1
+            sample = {
+                "method": method,
+                "route": route,
+                "path": path,
+                "status": status_code,
+                "seconds": round(seconds, 4),
+                "db_seconds": round(stats.db_seconds, 4),
+                "statement_count": stats.statements,
+                "statements": [
+                    {"sql": _compact(sql), "seconds": round(s, 4)}
+                    for sql, s in stats.sampled
+                ],
+                "at": datetime.utcnow().isoformat(),
+            }
+            self.slow_requests.append(sample)
+            logger.warning(
+                "Slow request %s %s took %.3fs (%d statements, %.3fs in SQL)",
+                method, path, seconds, stats.statements, stats.db_seconds
+            )
+
+    # Exposition
+
+    def render(self, components: Dict[str, dict] = None) -> str:
+        """All metrics in the Prometheus text format"""
+        lines = []
+        lines += self.request_duration.render(("method", "route", "status"))
+        lines += self.request_statements.render(("route",))
+        lines += self.request_db_time.render(("route",))
+        lines += self.statement_duration.render()
+        lines += self.pool_checkout.render()
+        for histogram in self._histograms:
+            lines += histogram.render()
+
+        lines.append("# HELP http_slow_requests_total Requests slower than the slow-request threshold")
+        lines.append("# TYPE http_slow_requests_total counter")
+        lines.append(f"http_slow_requests_total {self.slow_requests_total}")
+
+        lines.append("# HELP db_slowest_statement_seconds Worst time of the slowest distinct statements")
+        lines.append("# TYPE db_slowest_statement_seconds gauge")
+        for seconds, statement in sorted(self._slowest, reverse=True):
+            statement = _compact(statement)
+            lines.append(f"db_slowest_statement_seconds{_labels([('statement', statement)])} {_number(seconds)}")
+
+        lines.append("# HELP db_pool_connections Pooled connections by state")
+        lines.append("# TYPE db_pool_connections gauge")
+        for backend, pool in self._pools:
+            for state, method in (("size", "size"), ("checked_out", "checkedout"), ("overflow", "overflow")):
+                if hasattr(pool, method):
+                    value = getattr(pool, method)()
+                    lines.append(f"db_pool_connections{_labels([('engine', backend), ('state', state)])} {value}")
+
+        for component, stats in (components or {}).items():
+            for key, value in stats.items():
+                if isinstance(value, (int, float)):
+                    name = f"{component}_{key}"
+                    lines.append(f"# TYPE {name} gauge")
+                    lines.append(f"{name} {_number(value)}")
+        return "\n".join(lines) + "\n"
+
+
+def route_template(scope) -> str:
+    """
+    The matched route as a template (/api/v1/runs/{run_id}), so labels stay
+    bounded; built from the request path since the matched route's own path
+    may not include the prefixes of the routers it was included through.
+    """
+    if scope.get("route") is None:
+        return "unmatched"
+    names = {str(value): name for name, value in (scope.get("path_params") or {}).items()}
+    return "/".join(
+        "{" + names[segment] + "}" if segment in names else segment
+        for segment in scope["path"].split("/")
+    )
+
+
+class MetricsMiddleware:
+    """
+    ASGI middleware timing each HTTP request by its route template, and
+    charging SQL statements run while handling it to that request.
+    Timing ends when the last body chunk is sent, so streamed responses
+    are measured in full.
+    """
+
+    def __init__(self, app, metrics: Metrics):
+        self.app = app
+        self.metrics = metrics
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        stats = RequestStats()
+        token = current_request.set(stats)
+        start = time.perf_counter()
+        status_code = 500
+
+        async def send_wrapper(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            current_request.reset(token)
+            self.metrics.record_request(
+                scope["method"],
+                route_template(scope),
+                scope["path"],
+                status_code,
+                time.perf_counter() - start,
+                stats
+            )
+
+
+metrics = Metrics(
+    settings.SLOW_REQUEST_SECONDS,
+    settings.SLOW_REQUEST_SAMPLES,
+    settings.METRICS_SLOW_STATEMENTS
+)
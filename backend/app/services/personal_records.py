@@ -0,0 +1,129 @@
+import numpy as np
+from datetime import datetime
+from typing import Dict, List, NamedTuple, Optional
+from app.database import dialect_insert
+from app.models.personal_record import PersonalRecord
+from app.services.route_engine import RouteEngine
+
+# Best-effort targets: effort -> distance in km
+BEST_EFFORTS = {
+    "1k": 1.0,
+    "5k": 5.0,
+    "10k": 10.0,
+    "half_marathon": 21.0975,
+    "marathon": 42.195,
+}
+
+
+class BestEffort(NamedTuple):
+    """Fastest window of one target distance within a run"""
+    distance_km: float
+    elapsed_seconds: float
+    start_offset_km: float
+
+
+def fastest_windows(cumulative_km: np.ndarray, elapsed: np.ndarray, targets) -> List[Optional[BestEffort]]:
+    """
+    Fastest time to cover each target distance anywhere in a route.
+    For every point as the window end, the window start is the point where
+    the distance covered reaches end - target, interpolated inside its
+    segment. Cumulative distance is monotonic, so the starts for all ends
+    come from one vectorized sorted search rather than a per-point loop.
+    """
+    results = []
+    total_km = cumulative_km[-1] if len(cumulative_km) else 0.0
+    for target in targets:
+        if len(cumulative_km) < 2 or total_km < target:
+            results.append(None)
+            continue
+
+        ends = np.flatnonzero(cumulative_km >= target)
+        start_km = cumulative_km[ends] - target
+        i = np.searchsorted(cumulative_km, start_km, side="right") - 1
+        j = np.minimum(i + 1, len(cumulative_km) - 1)
+
+        span = cumulative_km[j] - cumulative_km[i]
+        fraction = np.zeros_like(span)
+        np.divide(start_km - cumulative_km[i], span, out=fraction, where=span > 0)
+        start_seconds = elapsed[i] + fraction * (elapsed[j] - elapsed[i])
+
+        window = elapsed[ends] - start_seconds
+        best = int(np.argmin(window))
+        results.append(BestEffort(target, float(window[best]), float(start_km[best])))
+    return results
+
+
+def compute_best_efforts(route, times=None, duration_seconds: Optional[float] = None,
+                         efforts: Dict[str, float] = BEST_EFFORTS) -> Dict[str, BestEffort]:
+    """
+    Best efforts of one run keyed by effort name; efforts longer than the
+    run are left out. Without per-point `times` the duration is spread
+    evenly over the points, as recorded at a fixed sampling rate.
+    """
+    metrics = RouteEngine.compute(route, times, duration_seconds)
+    if times is not None:
+        elapsed = np.asarray(times, dtype=np.float64) - float(times[0])
+    else:
+        elapsed = np.linspace(0.0, float(duration_seconds or 0), len(metrics.cumulative_km))
+
+    windows = fastest_windows(metrics.cumulative_km, elapsed, efforts.values())
+    return {
+        effort: best
+        for effort, best in zip(efforts, windows)
+        if best is not None and best.elapsed_seconds > 0
+    }
+
+
+def personal_record_rows(user_id, run_id, efforts: Dict[str, BestEffort], achieved_at: datetime) -> List[dict]:
+    return [
+        {
+            "user_id": user_id,
+            "effort": effort,
+            "distance_km": best.distance_km,
+            "elapsed_seconds": round(best.elapsed_seconds, 1),
+            "run_id": run_id,
+            "start_offset_km": round(best.start_offset_km, 3),
+            "achieved_at": achieved_at,
+            "updated_at": datetime.utcnow(),
+        }
+        for effort, best in efforts.items()
+    ]
+
+
+def fastest_per_effort(rows: List[dict]) -> List[dict]:
+    """One row per (user, effort), as a single upsert may not touch a row twice"""
+    best = {}
+    for row in rows:
+        key = (row["user_id"], row["effort"])
+        if key not in best or row["elapsed_seconds"] < best[key]["elapsed_seconds"]:
+            best[key] = row
+    return list(best.values())
+
+
+def upsert_personal_records_statement(db, rows: List[dict]):
+    """
+    INSERT .. ON CONFLICT that keeps the faster time per (user, effort), so
+    a new run only touches the records it beats and never rescans history.
+    """
+    statement = dialect_insert(db, PersonalRecord).values(rows)
+    excluded = statement.excluded
+    return statement.on_conflict_do_update(
+        index_elements=[PersonalRecord.user_id, PersonalRecord.effort],
+        set_={
+            "elapsed_seconds": excluded.elapsed_seconds,
+            "distance_km": excluded.distance_km,
+            "run_id": excluded.run_id,
+            "start_offset_km": excluded.start_offset_km,
+            "achieved_at": excluded.achieved_at,
+            "updated_at": excluded.updated_at,
+        },
+        where=excluded.elapsed_seconds < PersonalRecord.elapsed_seconds
+    )
+
+
+async def record_best_efforts(db, user_id, run_id, efforts: Dict[str, BestEffort], achieved_at: datetime):
+    """Fold one run's best efforts into the user's personal records"""
+    if not efforts:
+        return
+    rows = personal_record_rows(user_id, run_id, efforts, achieved_at)
+    await db.execute(upsert_personal_records_statement(db, rows))
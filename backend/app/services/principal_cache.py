@@ -0,0 +1,251 @@
+import asyncio
+import json
+import logging
+import time
+import uuid
+from collections import OrderedDict
+from datetime import datetime
+from typing import Optional
+from sqlalchemy import DateTime, event
+from sqlalchemy.orm import Session, object_session
+from app.config import settings
+from app.models.user import User
+
+logger = logging.getLogger(__name__)
+
+# The only columns cached, in process and in Redis: what handlers read from
+# current_user. Secrets (password_hash, the Strava tokens) are never copied out
+# of the database; a handler needing one reloads the user.
+CACHED_COLUMNS = frozenset({
+    "id", "email", "username", "full_name", "avatar_url", "weight_kg",
+    "total_distance_km", "total_duration_seconds", "total_runs", "avg_pace",
+    "elo_rating", "league_tier", "league_points", "is_premium", "premium_expires_at", "created_at",
+})
+_CHANGED_USERS_KEY = "principal_cache_changed_users"
+# Redis pub/sub channel carrying invalidated user ids to every worker
+INVALIDATION_CHANNEL = "principal_cache:invalidations"
+
+
+def _dump_user(user: User) -> dict:
+    """Loaded column values of a user, JSON-safe"""
+    data = {}
+    for column in User.__table__.columns:
+        if column.key not in CACHED_COLUMNS or column.key not in user.__dict__:
+            continue
+        value = user.__dict__[column.key]
+        if isinstance(value, uuid.UUID):
+            value = str(value)
+        elif isinstance(value, datetime):
+            value = value.isoformat()
+        data[column.key] = value
+    return data
+
+
+def _load_user(data: dict) -> dict:
+    """Column values from _dump_user converted back to their Python types"""
+    values = {key: value for key, value in data.items() if key in CACHED_COLUMNS}
+    for column in User.__table__.columns:
+        value = values.get(column.key)
+        if value is None:
+            continue
+        if column.key == "id":
+            values[column.key] = uuid.UUID(value)
+        elif isinstance(column.type, DateTime):
+            values[column.key] = datetime.fromisoformat(value)
+    return values
+
+
+class PrincipalCache:
+    """
+    Two-tier cache of authenticated users keyed by user id: an in-process
+    LRU and an optional shared Redis tier. Entries never outlive the token
+    that populated them. With Redis, invalidations are broadcast over
+    pub/sub so every worker drops its local copy; the local tier is
+    skipped while this worker is not subscribed.
+    """
+
+    def __init__(self, max_entries: int, ttl_seconds: int, redis_url: str = ""):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries = OrderedDict()  # user_id -> (expires_at, columns)
+        self._redis = None
+        self._pubsub = None
+        self._listener: Optional[asyncio.Task] = None
+        self._subscribed = False
+        if redis_url:
+            import redis.asyncio as redis
+            self._redis = redis.from_url(redis_url)
+
+        self.hits = 0
+        self.redis_hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        self.remote_invalidations = 0
+
+    @staticmethod
+    def _key(user_id) -> str:
+        # v2: entries cached before CACHED_COLUMNS held the Strava tokens
+        return f"principal:v2:{user_id}"
+
+    async def get(self, user_id: uuid.UUID) -> Optional[dict]:
+        """Cached column values for a user, or None"""
+        now = time.time()
+        # Without the subscription another worker's invalidations would be missed
+        local = self._redis is None or self._subscribed
+        entry = self._entries.get(user_id) if local else None
+        if entry is not None:
+            expires_at, columns = entry
+            if expires_at > now:
+                self._entries.move_to_end(user_id)
+                self.hits += 1
+                return columns
+            del self._entries[user_id]
+
+        if self._redis is not None:
+            try:
+                raw = await self._redis.get(self._key(user_id))
+            except Exception:
+                raw = None
+            if raw:
+                cached = json.loads(raw)
+                columns = _load_user(cached["user"])
+                self._store_local(user_id, columns, cached["expires_at"])
+                self.redis_hits += 1
+                return columns
+
+        self.misses += 1
+        return None
+
+    async def set(self, user: User, token_exp: Optional[float] = None):
+        """Cache a user loaded for a token expiring at token_exp (unix time)"""
+        now = time.time()
+        expires_at = now + self.ttl_seconds
+        if token_exp is not None:
+            expires_at = min(expires_at, token_exp)
+        if expires_at <= now:
+            return
+
+        data = _dump_user(user)
+        self._store_local(user.id, _load_user(data), expires_at)
+
+        if self._redis is not None:
+            try:
+                await self._redis.set(
+                    self._key(user.id),
+                    json.dumps({"expires_at": expires_at, "user": data}),
+                    ex=max(int(expires_at - now), 1)
+                )
+            except Exception:
+                pass
+
+    def _store_local(self, user_id, columns: dict, expires_at: float):
+        self._entries[user_id] = (expires_at, columns)
+        self._entries.move_to_end(user_id)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def invalidate(self, user_id):
+        """Drop a user from both tiers and from every other worker's local tier"""
+        self.invalidations += 1
+        self._entries.pop(user_id, None)
+
+        if self._redis is not None:
+            try:
+                asyncio.get_running_loop().create_task(self._invalidate_remote(user_id))
+            except RuntimeError:
+                # No running loop (scripts); the entries expire on their own
+                pass
+
+    async def _invalidate_remote(self, user_id):
+        try:
+            # Deleted first so a worker reloading on the broadcast cannot read the stale copy
+            await self._redis.delete(self._key(user_id))
+            await self._redis.publish(INVALIDATION_CHANNEL, str(user_id))
+        except Exception:
+            pass
+
+    async def start(self):
+        """Subscribe to invalidations broadcast by other workers"""
+        if self._redis is not None:
+            self._listener = asyncio.create_task(self._listen())
+
+    async def _listen(self):
+        while True:
+            try:
+                if self._pubsub is None:
+                    self._pubsub = self._redis.pubsub()
+                    await self._pubsub.subscribe(INVALIDATION_CHANNEL)
+                    self._subscribed = True
+                message = await self._pubsub.get_message(ignore_subscribe_messages=True, timeout=1.0)
+                if message is not None:
+                    self.remote_invalidations += 1
+                    self._entries.pop(uuid.UUID(message["data"].decode()), None)
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception("Principal cache invalidation listener failed")
+                # Broadcasts may have been missed while disconnected
+                self._subscribed = False
+                self._entries.clear()
+                if self._pubsub is not None:
+                    try:
+                        await self._pubsub.aclose()
+                    except Exception:
+                        pass
+                    self._pubsub = None
+                await asyncio.sleep(1.0)
+
+    async def close(self):
+        self._subscribed = False
+        if self._listener is not None:
+            self._listener.cancel()
+            try:
+                await self._listener
+            except asyncio.CancelledError:
+                pass
+            self._listener = None
+        if self._pubsub is not None:
+            await self._pubsub.aclose()
+            self._pubsub = None
+
+    def stats(self) -> dict:
+        return {
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "redis_hits": self.redis_hits,
+            "misses": self.misses,
+            "invalidations": self.invalidations,
+            "remote_invalidations": self.remote_invalidations,
+        }
+
+
+principal_cache = PrincipalCache(
+    settings.PRINCIPAL_CACHE_MAX_ENTRIES,
+    settings.PRINCIPAL_CACHE_TTL_SECONDS,
+    settings.REDIS_URL if settings.PRINCIPAL_CACHE_REDIS else ""
+)
+
+
+def mark_user_changed(session, user_id):
+    """Invalidate a user once the session's transaction commits; for bulk UPDATEs the ORM events miss"""
+    session.info.setdefault(_CHANGED_USERS_KEY, set()).add(user_id)
+
+
+# Invalidate once a transaction that changed a user row commits
+@event.listens_for(User, "after_update")
+@event.listens_for(User, "after_delete")
+def _mark_user_changed(mapper, connection, target):
+    session = object_session(target)
+    if session is not None:
+        mark_user_changed(session, target.id)
+
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_changed_users(session):
+    for user_id in session.info.pop(_CHANGED_USERS_KEY, ()):
+        principal_cache.invalidate(user_id)
+
+
+@event.listens_for(Session, "after_rollback")
+def _forget_changed_users(session):
+    session.info.pop(_CHANGED_USERS_KEY, None)
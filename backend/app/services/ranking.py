@@ -0,0 +1,190 @@
+import numpy as np
+from typing import List, NamedTuple
+from sqlalchemy import case, or_, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.config import settings
+from app.models.battle import Battle
+from app.models.user import User, LEAGUE_TIERS
+from app.services.leaderboard import publish_scores
+from app.services.principal_cache import mark_user_changed
+
+# Lower ELO bound of each tier above Bronze
+TIER_THRESHOLDS = [1300, 1500, 1700, 1900]
+
+# League points per battle result
+POINTS_WIN = 3
+POINTS_DRAW = 1
+
+# Users per leaderboard publish after a season-end recompute
+PUBLISH_BATCH_SIZE = 5000
+
+
+class EloUpdate(NamedTuple):
+    """Result of settling a batch of battles"""
+    user_ids: np.ndarray      # unique participants
+    new_ratings: np.ndarray   # rating per participant after the batch
+    points: np.ndarray        # league points earned per participant
+    before1: np.ndarray       # per battle ratings used for each side
+    before2: np.ndarray
+    after1: np.ndarray
+    after2: np.ndarray
+
+
+def tiers_for(ratings: np.ndarray) -> np.ndarray:
+    """League tier name for each rating"""
+    return np.asarray(LEAGUE_TIERS, dtype=object)[np.searchsorted(TIER_THRESHOLDS, ratings, side="right")]
+
+
+def tier_case(rating_column):
+    """SQL CASE mapping a rating column to its league tier"""
+    whens = [
+        (rating_column >= threshold, tier)
+        for threshold, tier in reversed(list(zip(TIER_THRESHOLDS, LEAGUE_TIERS[1:])))
+    ]
+    return case(*whens, else_=LEAGUE_TIERS[0])
+
+
+def compute_elo_updates(user1_ids, user2_ids, scores1, ratings_by_user: dict, k_factor: float) -> EloUpdate:
+    """
+    Vectorized ELO over a batch of battles. Every battle is rated against the
+    ratings at the start of the batch and each player's deltas are summed,
+    so the order of battles within a batch does not matter.
+    `scores1` is 1 for a user1 win, 0 for a loss and 0.5 for a draw.
+    """
+    ids = np.concatenate([np.asarray(user1_ids, dtype=object), np.asarray(user2_ids, dtype=object)])
+    user_ids, inverse = np.unique(ids.astype(str), return_inverse=True)
+    n = len(user1_ids)
+    index1, index2 = inverse[:n], inverse[n:]
+
+    by_str = {str(k): v for k, v in ratings_by_user.items()}
+    ratings = np.array([by_str[uid] for uid in user_ids], dtype=np.float64)
+    r1, r2 = ratings[index1], ratings[index2]
+    s1 = np.asarray(scores1, dtype=np.float64)
+
+    expected1 = 1.0 / (1.0 + 10.0 ** ((r2 - r1) / 400.0))
+    delta1 = np.rint(k_factor * (s1 - expected1))
+
+    deltas = np.zeros(len(user_ids))
+    np.add.at(deltas, index1, delta1)
+    np.add.at(deltas, index2, -delta1)
+
+    points = np.zeros(len(user_ids), dtype=np.int64)
+    np.add.at(points, index1, np.where(s1 == 1, POINTS_WIN, np.where(s1 == 0.5, POINTS_DRAW, 0)))
+    np.add.at(points, index2, np.where(s1 == 0, POINTS_WIN, np.where(s1 == 0.5, POINTS_DRAW, 0)))
+
+    return EloUpdate(
+        user_ids=user_ids,
+        new_ratings=(ratings + deltas).astype(np.int64),
+        points=points,
+        before1=r1.astype(np.int64),
+        before2=r2.astype(np.int64),
+        after1=(r1 + delta1).astype(np.int64),
+        after2=(r2 - delta1).astype(np.int64),
+    )
+
+
+async def settle_battles(db: AsyncSession, batch_size: int = 5000) -> int:
+    """
+    Settle one batch of completed, unrated battles: compute all rating
+    changes with NumPy and write users and battles back with bulk UPDATEs.
+    Returns the number of battles settled; call until it returns 0.
+    """
+    battles = (await db.execute(
+        select(Battle.id, Battle.user1_id, Battle.user2_id, Battle.winner_id)
+        .where(Battle.status == 'completed', Battle.user1_elo_after.is_(None))
+        .order_by(Battle.completed_at)
+        .limit(batch_size)
+        .with_for_update(skip_locked=True)
+    )).all()
+    if not battles:
+        return 0
+
+    scores1: List[float] = []
+    for battle in battles:
+        if battle.winner_id == battle.user1_id:
+            scores1.append(1.0)
+        elif battle.winner_id == battle.user2_id:
+            scores1.append(0.0)
+        else:
+            scores1.append(0.5)
+
+    participant_ids = {b.user1_id for b in battles} | {b.user2_id for b in battles}
+    users = (await db.execute(
+        select(User.id, User.elo_rating, User.league_points)
+        .where(User.id.in_(participant_ids))
+        .order_by(User.id)
+        .with_for_update()
+    )).all()
+    ratings_by_user = {u.id: u.elo_rating or 1200 for u in users}
+    points_by_user = {str(u.id): u.league_points or 0 for u in users}
+    uuid_by_str = {str(u.id): u.id for u in users}
+
+    result = compute_elo_updates(
+        [b.user1_id for b in battles],
+        [b.user2_id for b in battles],
+        scores1,
+        ratings_by_user,
+        settings.ELO_K_FACTOR
+    )
+    tiers = tiers_for(result.new_ratings)
+
+    await db.execute(update(User), [
+        {
+            "id": uuid_by_str[uid],
+            "elo_rating": int(rating),
+            "league_tier": tier,
+            "league_points": points_by_user[uid] + int(points),
+        }
+        for uid, rating, tier, points in zip(result.user_ids, result.new_ratings, tiers, result.points)
+    ])
+    await db.execute(update(Battle), [
+        {
+            "id": battle.id,
+            "user1_elo_before": int(result.before1[i]),
+            "user2_elo_before": int(result.before2[i]),
+            "user1_elo_after": int(result.after1[i]),
+            "user2_elo_after": int(result.after2[i]),
+        }
+        for i, battle in enumerate(battles)
+    ])
+    for user_id in uuid_by_str.values():
+        mark_user_changed(db, user_id)
+    await db.commit()
+
+    await publish_scores(db, {
+        uuid_by_str[uid]: ({"elo": int(rating), "league_points": points_by_user[uid] + int(points)}, tier)
+        for uid, rating, tier, points in zip(result.user_ids, result.new_ratings, tiers, result.points)
+    })
+
+    return len(battles)
+
+
+async def recompute_league_tiers(db: AsyncSession, reset_points: bool = True) -> int:
+    """
+    Season end: move every user to the tier their rating earns and optionally
+    start the new season's league points from zero, in a single UPDATE. The
+    users it changes are invalidated and republished to the leaderboards;
+    returns how many.
+    """
+    new_tier = tier_case(User.elo_rating)
+    values = {"league_tier": new_tier}
+    changed = User.league_tier.is_distinct_from(new_tier)
+    if reset_points:
+        values["league_points"] = 0
+        changed = or_(changed, User.league_points.is_distinct_from(0))
+
+    rows = (await db.execute(
+        update(User).where(changed).values(**values)
+        .returning(User.id, User.league_tier, User.league_points)
+        .execution_options(synchronize_session=False)
+    )).all()
+    for row in rows:
+        mark_user_changed(db, row.id)
+    await db.commit()
+
+    for start in range(0, len(rows), PUBLISH_BATCH_SIZE):
+        await publish_scores(db, {
+            row.id: ({"league_points": row.league_points}, row.league_tier)
+            for row in rows[start:start + PUBLISH_BATCH_SIZE]
+        })
+    return len(rows)
@@ -0,0 +1,105 @@
+import json
+import numpy as np
+from typing import Dict, Optional
+from app.services.route_engine import RouteEngine
+
+# Google encoded polyline precision (1e-5 degrees, ~1.1 m)
+PRECISION = 5
+
+# Simplified levels of detail stored beside the full route: level -> point budget
+ROUTE_LEVELS = {"preview": 1000, "thumbnail": 200}
+
+
+class RouteCodec:
+    """Vectorized Google encoded polyline codec for route storage"""
+
+    @staticmethod
+    def encode(route, precision: int = PRECISION, previous: Optional[tuple] = None) -> str:
+        """
+        Encode (lat, lng) pairs as a Google polyline string.
+        `previous` is the last point of an already encoded polyline, so the
+        result can be appended to it and still decode as one route.
+        """
+        coords = np.asarray(route, dtype=np.float64).reshape(-1, 2)
+        if len(coords) == 0:
+            return ""
+
+        factor = 10 ** precision
+        fixed = np.round(coords * factor).astype(np.int64)
+        origin = np.zeros((1, 2), dtype=np.int64)
+        if previous is not None:
+            origin = np.round(np.asarray(previous, dtype=np.float64) * factor).astype(np.int64).reshape(1, 2)
+
+        values = np.diff(fixed, axis=0, prepend=origin).ravel()
+        # Zigzag so small negative deltas stay short
+        values = (values << 1) ^ (values >> 63)
+
+        # Number of 5-bit chunks per value
+        counts = np.ones(len(values), dtype=np.int64)
+        for k in range(1, 13):
+            counts += values >= (1 << (5 * k))
+
+        owner = np.repeat(np.arange(len(values)), counts)
+        starts = np.cumsum(counts) - counts
+        shift = 5 * (np.arange(len(owner)) - starts[owner])
+
+        chunks = (values[owner] >> shift) & 0x1F
+        # Every chunk but the last of a value carries the continuation bit
+        chunks[shift < 5 * (counts[owner] - 1)] |= 0x20
+        return (chunks + 63).astype(np.uint8).tobytes().decode("ascii")
+
+    @staticmethod
+    def decode(polyline: str, precision: int = PRECISION) -> np.ndarray:
+        """Decode a Google polyline string straight into an (n, 2) float64 array"""
+        if not polyline:
+            return np.empty((0, 2), dtype=np.float64)
+
+        chunks = np.frombuffer(polyline.encode("ascii"), dtype=np.uint8).astype(np.int64) - 63
+        if chunks.min() < 0 or chunks.max() > 63:
+            raise ValueError("Invalid polyline character")
+
+        ends = (chunks & 0x20) == 0
+        if not ends[-1]:
+            raise ValueError("Truncated polyline")
+
+        starts = np.flatnonzero(np.concatenate(([True], ends[:-1])))
+        owner = np.cumsum(ends) - ends
+        shift = 5 * (np.arange(len(chunks)) - starts[owner])
+
+        values = np.bitwise_or.reduceat((chunks & 0x1F) << shift, starts)
+        if len(values) % 2:
+            raise ValueError("Polyline has an odd number of values")
+        values = (values >> 1) ^ -(values & 1)
+
+        return np.cumsum(values.reshape(-1, 2), axis=0) / 10 ** precision
+
+    @staticmethod
+    def encode_levels(route) -> Dict[str, Optional[str]]:
+        """
+        Encode each simplified level of detail of a route, keyed by level.
+        A level is None when the route already fits its budget, and readers
+        fall back to the next finer level.
+        """
+        coords = RouteEngine.to_array(route)
+        ranks = RouteEngine.simplification_ranks(coords)
+        levels = {}
+        for level, max_points in ROUTE_LEVELS.items():
+            if len(coords) <= max_points:
+                levels[level] = None
+                continue
+            levels[level] = RouteCodec.encode(coords[RouteEngine.simplify(coords, max_points=max_points, ranks=ranks)])
+        return levels
+
+    @staticmethod
+    def is_legacy_json(stored: Optional[str]) -> bool:
+        """True for routes stored by the old JSON format (`[{"lat": .., "lng": ..}, ...]`)"""
+        return bool(stored) and (stored.startswith('[{"') or stored == "[]")
+
+    @staticmethod
+    def decode_stored(stored: Optional[str]) -> np.ndarray:
+        """Decode a Run.route_polyline value in either the polyline or legacy JSON format"""
+        if RouteCodec.is_legacy_json(stored):
+            points = json.loads(stored)
+            coords = np.array([(p["lat"], p["lng"]) for p in points], dtype=np.float64)
+            return coords.reshape(-1, 2)
+        return RouteCodec.decode(stored or "")
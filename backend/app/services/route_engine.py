@@ -0,0 +1,220 @@
+import math
+import numpy as np
+from typing import List, NamedTuple, Optional, Sequence, Tuple
+
+
+class RouteMetrics(NamedTuple):
+    """Per-route arrays produced by RouteEngine"""
+    segment_km: np.ndarray       # (n - 1,) distance of each segment
+    cumulative_km: np.ndarray    # (n,) distance covered at each point
+    speed_kmh: np.ndarray        # (n - 1,) speed of each segment
+    pace_min_per_km: np.ndarray  # (n - 1,) pace of each segment
+
+    @property
+    def total_km(self) -> float:
+        return float(self.cumulative_km[-1]) if len(self.cumulative_km) else 0.0
+
+
+class RouteEngine:
+    """Vectorized GPS route calculations over whole routes or batches of routes"""
+
+    EARTH_RADIUS_KM = 6371
+
+    @staticmethod
+    def to_array(route) -> np.ndarray:
+        """Convert a route of (lat, lng) pairs to a contiguous (n, 2) float64 array"""
+        coords = np.ascontiguousarray(route, dtype=np.float64)
+        if coords.size == 0:
+            return np.empty((0, 2), dtype=np.float64)
+        if coords.ndim != 2 or coords.shape[1] != 2:
+            raise ValueError("route must have shape (n, 2)")
+        return coords
+
+    @staticmethod
+    def haversine(lat1, lon1, lat2, lon2) -> np.ndarray:
+        """Element-wise Haversine distance in kilometers between coordinate arrays"""
+        lat1, lon1, lat2, lon2 = (np.radians(a) for a in (lat1, lon1, lat2, lon2))
+
+        a = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+        return 2 * RouteEngine.EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.minimum(a, 1.0)))
+
+    @staticmethod
+    def segment_distances(coords: np.ndarray) -> np.ndarray:
+        """Distance in kilometers of every segment of an (n, 2) route"""
+        if len(coords) < 2:
+            return np.zeros(0, dtype=np.float64)
+        return RouteEngine.haversine(coords[:-1, 0], coords[:-1, 1], coords[1:, 0], coords[1:, 1])
+
+    @staticmethod
+    def total_distance(route) -> float:
+        """Total distance in kilometers of a route"""
+        return float(RouteEngine.segment_distances(RouteEngine.to_array(route)).sum())
+
+    @staticmethod
+    def simplification_ranks(route, min_tolerance_m: float = 0.5) -> np.ndarray:
+        """
+        Douglas-Peucker rank of every point: the tolerance in meters up to
+        which the point survives simplification (endpoints are inf, points
+        within `min_tolerance_m` of their chord are 0). Thresholding the ranks
+        by tolerance or point budget gives any level of detail from one pass.
+        All open segments are split together, one vectorized pass per depth.
+        """
+        coords = RouteEngine.to_array(route)
+        n = len(coords)
+        ranks = np.zeros(n, dtype=np.float64)
+        if n == 0:
+            return ranks
+        ranks[[0, -1]] = np.inf
+        if n < 3:
+            return ranks
+
+        # Local equirectangular projection to meters
+        meters_per_degree = RouteEngine.EARTH_RADIUS_KM * 1000 * math.pi / 180
+        xy = np.column_stack((
+            coords[:, 1] * meters_per_degree * math.cos(math.radians(coords[:, 0].mean())),
+            coords[:, 0] * meters_per_degree,
+        ))
+
+        starts = np.array([0])
+        ends = np.array([n - 1])
+        caps = np.array([np.inf])  # a split point never outranks the one that opened its segment
+        while len(starts):
+            lengths = ends - starts - 1
+            open_ = lengths > 0
+            starts, ends, caps, lengths = starts[open_], ends[open_], caps[open_], lengths[open_]
+            if not len(starts):
+                break
+
+            # Every interior point of every open segment, grouped by segment
+            offsets = np.cumsum(lengths) - lengths
+            segment = np.repeat(np.arange(len(starts)), lengths)
+            index = starts[segment] + 1 + np.arange(lengths.sum()) - offsets[segment]
+
+            # Distance from each point to its segment's chord
+            a = xy[starts[segment]]
+            ab = xy[ends[segment]] - a
+            ap = xy[index] - a
+            norm = np.einsum("ij,ij->i", ab, ab)
+            t = np.zeros_like(norm)
+            np.divide(np.einsum("ij,ij->i", ap, ab), norm, out=t, where=norm > 0)
+            offset = ap - np.clip(t, 0, 1)[:, None] * ab
+            distance = np.hypot(offset[:, 0], offset[:, 1])
+
+            # Farthest point of each segment
+            farthest = np.maximum.reduceat(distance, offsets)
+            hits = np.flatnonzero(distance == farthest[segment])
+            split = index[hits[np.unique(segment[hits], return_index=True)[1]]]
+
+            keep = farthest >= min_tolerance_m
+            split, farthest, starts, ends, caps = split[keep], farthest[keep], starts[keep], ends[keep], caps[keep]
+            rank = np.minimum(farthest, np.nextafter(caps, 0))
+            ranks[split] = rank
+
+            starts, ends = np.concatenate((starts, split)), np.concatenate((split, ends))
+            caps = np.concatenate((rank, rank))
+
+        return ranks
+
+    @staticmethod
+    def simplify(route, tolerance_m: Optional[float] = None, max_points: Optional[int] = None,
+                 ranks: Optional[np.ndarray] = None) -> np.ndarray:
+        """
+        Sorted indices of the points kept by Douglas-Peucker at `tolerance_m`,
+        reduced to the `max_points` most significant if given.
+        Pass precomputed `ranks` to take several levels from one route.
+        """
+        if ranks is None:
+            ranks = RouteEngine.simplification_ranks(route)
+
+        kept = np.flatnonzero(ranks > (tolerance_m or 0))
+        if max_points is not None and len(kept) > max_points:
+            top = np.argpartition(-ranks[kept], max_points - 1)[:max_points]
+            kept = np.sort(kept[top])
+        return kept
+
+    @staticmethod
+    def _segment_seconds(n: int, times: Optional[np.ndarray], duration_seconds: Optional[float]) -> np.ndarray:
+        """Elapsed seconds of each segment, from timestamps or spread evenly over the duration"""
+        if times is not None:
+            return np.diff(np.asarray(times, dtype=np.float64))
+        if duration_seconds is not None and n > 1:
+            return np.full(n - 1, duration_seconds / (n - 1), dtype=np.float64)
+        return np.zeros(max(n - 1, 0), dtype=np.float64)
+
+    @staticmethod
+    def _speed_and_pace(segment_km: np.ndarray, segment_seconds: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """Speed (km/h) and pace (min/km) per segment, 0 where undefined like GPSCalculator"""
+        speed = np.zeros_like(segment_km)
+        pace = np.zeros_like(segment_km)
+        np.divide(segment_km * 3600, segment_seconds, out=speed, where=segment_seconds > 0)
+        np.divide(segment_seconds / 60, segment_km, out=pace, where=segment_km > 0)
+        return speed, pace
+
+    @staticmethod
+    def compute(route, times=None, duration_seconds: Optional[float] = None) -> RouteMetrics:
+        """
+        Compute segment, cumulative, speed and pace arrays for one route.
+        `times` are per-point seconds; without them the points are assumed
+        evenly spaced over `duration_seconds`.
+        """
+        coords = RouteEngine.to_array(route)
+        segment_km = RouteEngine.segment_distances(coords)
+
+        cumulative_km = np.zeros(len(coords), dtype=np.float64)
+        np.cumsum(segment_km, out=cumulative_km[1:])
+
+        seconds = RouteEngine._segment_seconds(len(coords), times, duration_seconds)
+        speed, pace = RouteEngine._speed_and_pace(segment_km, seconds)
+        return RouteMetrics(segment_km, cumulative_km, speed, pace)
+
+    @staticmethod
+    def compute_batch(
+        routes: Sequence,
+        times: Optional[Sequence] = None,
+        durations: Optional[Sequence[float]] = None
+    ) -> List[RouteMetrics]:
+        """
+        Compute metrics for many routes in a single vectorized pass.
+        All routes are concatenated into one array; segments that would join
+        the end of one route to the start of the next are zeroed out.
+        """
+        arrays = [RouteEngine.to_array(route) for route in routes]
+        if not arrays:
+            return []
+
+        lengths = np.array([len(a) for a in arrays])
+        offsets = np.concatenate(([0], np.cumsum(lengths)))
+        coords = np.concatenate(arrays)
+
+        segment_km = RouteEngine.segment_distances(coords)
+        # Segment i joins point i and i + 1; it crosses a boundary when i + 1 starts a route
+        boundaries = offsets[1:-1] - 1
+        segment_km[boundaries[boundaries >= 0]] = 0.0
+
+        cumulative_km = np.zeros(len(coords), dtype=np.float64)
+        np.cumsum(segment_km, out=cumulative_km[1:])
+
+        if times is not None:
+            all_times = np.concatenate([np.asarray(t, dtype=np.float64) for t in times])
+            seconds = np.diff(all_times) if len(all_times) > 1 else np.zeros(0)
+        else:
+            # Spread each route's duration evenly over its own segments
+            per_segment = np.zeros(len(arrays), dtype=np.float64)
+            if durations is not None:
+                np.divide(np.asarray(durations, dtype=np.float64), lengths - 1,
+                          out=per_segment, where=lengths > 1)
+            seconds = np.repeat(per_segment, lengths)[:-1]
+        seconds[boundaries[boundaries >= 0]] = 0.0
+
+        speed, pace = RouteEngine._speed_and_pace(segment_km, seconds)
+
+        results = []
+        for start, end in zip(offsets[:-1], offsets[1:]):
+            seg_end = max(end - 1, start)
+            results.append(RouteMetrics(
+                segment_km[start:seg_end],
+                cumulative_km[start:end] - cumulative_km[start] if end > start else cumulative_km[start:end],
+                speed[start:seg_end],
+                pace[start:seg_end],
+            ))
+        return results
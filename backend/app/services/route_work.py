@@ -0,0 +1,192 @@
+import asyncio
+import multiprocessing
+import time
+from concurrent.futures import Executor, ProcessPoolExecutor
+from functools import partial
+from typing import Dict, List, NamedTuple, Optional, Sequence
+import numpy as np
+from app.config import settings
+from app.services.heatmap import TileKey, rasterize_route
+from app.services.personal_records import BestEffort, compute_best_efforts
+from app.services.route_codec import RouteCodec
+from app.services.route_engine import RouteEngine
+from app.services.run_validation import ValidationResult, constant_pace_times, validate_run, validate_runs
+
+
+class RouteWork(NamedTuple):
+    """Results of the per-run route work; `error` is set instead when the route cannot be processed"""
+    verdict: Optional[ValidationResult] = None
+    polyline: Optional[str] = None  # the full route, encoded
+    levels: Dict[str, Optional[str]] = {}
+    efforts: Dict[str, BestEffort] = {}
+    tiles: Dict[TileKey, np.ndarray] = {}  # heatmap bins, see heatmap.rasterize_route
+    error: Optional[str] = None
+
+    @property
+    def counted(self) -> bool:
+        return self.error is None and self.verdict.status != 'rejected'
+
+
+def _to_array(route) -> np.ndarray:
+    """Points of a stored polyline (or legacy JSON) or of a point sequence"""
+    if route is None or isinstance(route, str):
+        return RouteCodec.decode_stored(route)
+    return RouteEngine.to_array(route)
+
+
+def process_routes(
+    routes: Sequence,
+    durations: Sequence[float],
+    claimed_distances: Optional[Sequence[Optional[float]]] = None,
+    times: Optional[Sequence] = None,
+    even_pace: bool = False,
+    levels: bool = True,
+    encode: bool = False,
+    zooms: Sequence[int] = (),
+    reject: bool = False,
+) -> List[RouteWork]:
+    """
+    Validate a batch of runs, then encode (`encode`) and simplify (`levels`)
+    their routes, find their best efforts and rasterize them for the heatmap
+    (`zooms`). Routes are point arrays or stored polylines. With `even_pace`,
+    untimed routes are validated as if paced evenly by distance. With `reject`,
+    rejected runs skip the rest.
+    One bad route gets an error result instead of failing the batch.
+    Runs in a RoutePool process.
+    """
+    count = len(routes)
+    arrays: List[Optional[np.ndarray]] = []
+    errors: List[Optional[str]] = []
+    for route in routes:
+        try:
+            arrays.append(_to_array(route))
+            errors.append(None)
+        except (ValueError, TypeError) as exc:
+            arrays.append(None)
+            errors.append(f"invalid route: {exc}")
+
+    run_times = list(times) if times is not None else [None] * count
+    check_times = run_times
+    if even_pace:
+        check_times = [
+            constant_pace_times(route, duration) if route is not None and len(route) >= 2 else None
+            for route, duration in zip(arrays, durations)
+        ]
+    claimed = list(claimed_distances) if claimed_distances is not None else [None] * count
+
+    valid = [i for i in range(count) if errors[i] is None]
+    verdicts: Dict[int, ValidationResult] = {}
+    try:
+        batch = validate_runs(
+            [arrays[i] for i in valid], [durations[i] for i in valid],
+            [claimed[i] for i in valid], [check_times[i] for i in valid]
+        )
+        verdicts = dict(zip(valid, batch))
+    except Exception:
+        # Find the runs that break the batch
+        for i in valid:
+            try:
+                verdicts[i] = validate_run(arrays[i], durations[i], claimed[i], check_times[i])
+            except Exception as exc:
+                errors[i] = f"validation failed: {exc!r}"
+
+    results = []
+    for i in range(count):
+        if errors[i] is not None:
+            results.append(RouteWork(error=errors[i]))
+            continue
+        route, verdict = arrays[i], verdicts[i]
+        if reject and verdict.status == 'rejected':
+            results.append(RouteWork(verdict))
+            continue
+        try:
+            polyline = RouteCodec.encode(route) if encode else None
+            route_levels = RouteCodec.encode_levels(route) if levels else {}
+            efforts, tiles = {}, {}
+            if verdict.status != 'rejected':
+                efforts = compute_best_efforts(route, run_times[i], durations[i])
+                tiles = rasterize_route(route, zooms) if zooms else {}
+            results.append(RouteWork(verdict, polyline, route_levels, efforts, tiles))
+        except Exception as exc:
+            results.append(RouteWork(error=f"route processing failed: {exc!r}"))
+    return results
+
+
+def rasterize_routes(routes: Sequence, zooms: Sequence[int]) -> List[Dict[TileKey, np.ndarray]]:
+    """Heatmap bins of each route (point arrays or stored polylines); undecodable routes get none"""
+    tiles = []
+    for route in routes:
+        try:
+            tiles.append(rasterize_route(_to_array(route), zooms))
+        except ValueError:
+            tiles.append({})
+    return tiles
+
+
+class RoutePool:
+    """
+    Process pool for per-run route work (validation, simplification, best
+    efforts, heatmap rasterizing), so this CPU-bound NumPy work never runs
+    on the event loop. Processes are spawned on first use; with 0 workers
+    the work runs in the loop's default thread pool instead.
+    """
+
+    def __init__(self, workers: int):
+        self.workers = workers
+        self._executor: Optional[Executor] = None
+
+        # Only touched from the event loop thread
+        self.pending = 0
+        self.completed = 0
+        self.seconds_total = 0.0
+
+    def _pool(self) -> Optional[Executor]:
+        if self._executor is None and self.workers > 0:
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.workers, mp_context=multiprocessing.get_context("spawn")
+            )
+        return self._executor
+
+    async def run(self, fn, *args, **kwargs):
+        """Run fn(*args, **kwargs) in the pool; fn and its arguments must be picklable"""
+        self.pending += 1
+        started = time.perf_counter()
+        try:
+            return await asyncio.get_running_loop().run_in_executor(self._pool(), partial(fn, *args, **kwargs))
+        finally:
+            self.pending -= 1
+            self.completed += 1
+            self.seconds_total += time.perf_counter() - started
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    def stats(self) -> dict:
+        return {
+            "workers": self.workers,
+            "pending": self.pending,
+            "completed": self.completed,
+            "seconds_total": round(self.seconds_total, 6),
+        }
+
+
+route_pool = RoutePool(settings.ROUTE_WORKERS)
+
+
+async def process_routes_in_pool(routes: Sequence, durations: Sequence[float],
+                                 claimed_distances: Optional[Sequence] = None, times: Optional[Sequence] = None,
+                                 **options) -> List[RouteWork]:
+    """process_routes with the batch split evenly over the route pool's processes"""
+    size = max(-(-len(routes) // max(route_pool.workers, 1)), 1)
+    parts = await asyncio.gather(*(
+        route_pool.run(
+            process_routes, routes[i:i + size], durations[i:i + size],
+            None if claimed_distances is None else claimed_distances[i:i + size],
+            None if times is None else times[i:i + size],
+            **options
+        )
+        for i in range(0, len(routes), size)
+    ))
+    return [work for part in parts for work in part]
@@ -0,0 +1,177 @@
+import csv
+import io
+import zlib
+from abc import ABC, abstractmethod
+from typing import Dict, Iterable, List, Optional
+from xml.sax.saxutils import escape
+from pydantic import TypeAdapter
+from sqlalchemy import select
+from app.models.run import Run
+from app.schemas.run import RunRouteResponse
+from app.services.route_codec import RouteCodec
+
+# Runs fetched per round trip; routes can be ~100 KB each, so keep it modest
+EXPORT_BATCH_SIZE = 100
+
+EXPORT_FIELDS = list(RunRouteResponse.model_fields)
+
+run_route_adapter = TypeAdapter(RunRouteResponse)
+
+
+def export_query(user_id=None):
+    """
+    Runs in export order (oldest first), as plain rows rather than ORM
+    objects. Streams through a server-side cursor in EXPORT_BATCH_SIZE
+    partitions where the driver supports one.
+    """
+    query = select(*[getattr(Run, field) for field in EXPORT_FIELDS])
+    if user_id is not None:
+        query = query.where(Run.user_id == user_id).order_by(Run.completed_at, Run.id)
+    else:
+        query = query.order_by(Run.user_id, Run.completed_at, Run.id)
+    return query.execution_options(yield_per=EXPORT_BATCH_SIZE)
+
+
+def _polyline(stored: Optional[str]) -> str:
+    """Legacy JSON routes are exported as polylines too"""
+    if RouteCodec.is_legacy_json(stored):
+        return RouteCodec.encode(RouteCodec.decode_stored(stored))
+    return stored or ""
+
+
+class ExportFormat(ABC):
+    """Renders runs as text, one partition of rows at a time"""
+
+    media_type = "application/octet-stream"
+    extension = ""
+
+    def header(self) -> str:
+        return ""
+
+    @abstractmethod
+    def rows(self, rows: List[dict]) -> str:
+        """One partition of rows"""
+
+    def footer(self) -> str:
+        return ""
+
+
+class NdjsonFormat(ExportFormat):
+    """One RunRouteResponse JSON object per line"""
+
+    media_type = "application/x-ndjson"
+    extension = "ndjson"
+
+    def rows(self, rows: List[dict]) -> str:
+        return "".join(
+            run_route_adapter.dump_json(run_route_adapter.validate_python(
+                {**row, "route_polyline": _polyline(row["route_polyline"])}
+            )).decode() + "\n"
+            for row in rows
+        )
+
+
+class CsvFormat(ExportFormat):
+    """One row per run; the route stays an encoded polyline"""
+
+    media_type = "text/csv"
+    extension = "csv"
+
+    def header(self) -> str:
+        return self._write([EXPORT_FIELDS])
+
+    def rows(self, rows: List[dict]) -> str:
+        return self._write(
+            [_polyline(row[field]) if field == "route_polyline" else row[field] for field in EXPORT_FIELDS]
+            for row in rows
+        )
+
+    @staticmethod
+    def _write(records: Iterable[list]) -> str:
+        buffer = io.StringIO()
+        csv.writer(buffer).writerows(records)
+        return buffer.getvalue()
+
+
+class GpxFormat(ExportFormat):
+    """GPX 1.1 with one track per run; routes are decoded one run at a time"""
+
+    media_type = "application/gpx+xml"
+    extension = "gpx"
+
+    def header(self) -> str:
+        return (
+            '<?xml version="1.0" encoding="UTF-8"?>\n'
+            '<gpx version="1.1" creator="LeagueOfRun" xmlns="http://www.topografix.com/GPX/1/1">\n'
+        )
+
+    def rows(self, rows: List[dict]) -> str:
+        return "".join(self._track(row) for row in rows)
+
+    @staticmethod
+    def _track(row: dict) -> str:
+        coords = RouteCodec.decode_stored(row["route_polyline"])
+        points = "".join(f'<trkpt lat="{lat:.5f}" lon="{lng:.5f}"/>' for lat, lng in coords.tolist())
+        description = (
+            f"{row['distance_km']:.2f} km in {row['duration_seconds']} s, "
+            f"{row['started_at'].isoformat()} to {row['completed_at'].isoformat()}"
+        )
+        return (
+            f"<trk><name>{escape(str(row['id']))}</name><desc>{escape(description)}</desc>"
+            f"<src>{escape(row['source'] or '')}</src><type>running</type>"
+            f"<trkseg>{points}</trkseg></trk>\n"
+        )
+
+    def footer(self) -> str:
+        return "</gpx>\n"
+
+
+EXPORT_FORMATS: Dict[str, ExportFormat] = {
+    "ndjson": NdjsonFormat(),
+    "csv": CsvFormat(),
+    "gpx": GpxFormat(),
+}
+
+
+class ExportEncoder:
+    """
+    Turns partitions of run rows into bytes for a stream or file, gzipping
+    on the fly when `compress` is set. Only the current partition is ever
+    held, so memory stays flat however many runs are exported.
+    """
+
+    def __init__(self, export_format: ExportFormat, compress: bool = False):
+        self.format = export_format
+        # wbits=31 writes a gzip header and trailer
+        self._compressor = zlib.compressobj(6, zlib.DEFLATED, 31) if compress else None
+
+    def _encode(self, text: str) -> bytes:
+        data = text.encode()
+        return self._compressor.compress(data) if self._compressor else data
+
+    def begin(self) -> bytes:
+        return self._encode(self.format.header())
+
+    def partition(self, rows: List[dict]) -> bytes:
+        return self._encode(self.format.rows(rows))
+
+    def end(self) -> bytes:
+        data = self._encode(self.format.footer())
+        return data + self._compressor.flush() if self._compressor else data
+
+
+def export_filename(export_format: ExportFormat, compress: bool, stem: str = "runs") -> str:
+    return f"{stem}.{export_format.extension}" + (".gz" if compress else "")
+
+
+async def stream_runs_export(session_factory, user_id, export_format: ExportFormat, compress: bool = False):
+    """Async generator of export bytes for one user's runs"""
+    encoder = ExportEncoder(export_format, compress)
+    yield encoder.begin()
+    async with session_factory() as db:
+        result = await db.stream(export_query(user_id))
+        async for partition in result.mappings().partitions():
+            chunk = encoder.partition(partition)
+            if chunk:
+                yield chunk
+    yield encoder.end()
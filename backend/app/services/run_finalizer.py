@@ -0,0 +1,228 @@
+import asyncio
+import logging
+from collections import defaultdict
+from typing import Optional
+from sqlalchemy import update, select
+from sqlalchemy.exc import DataError, IntegrityError
+from app.config import settings
+from app.models.run import Run
+from app.services.gps_calculator import GPSCalculator
+from app.services.heatmap import heatmap
+from app.services.leaderboard import publish_scores
+from app.services.personal_records import (
+    fastest_per_effort,
+    personal_record_rows,
+    upsert_personal_records_statement,
+)
+from app.services.route_work import process_routes_in_pool
+from app.services.spatial_index import run_start_index
+from app.services.training_rollups import add_runs_to_rollups
+from app.services.user_stats import add_run_to_user_stats
+
+logger = logging.getLogger(__name__)
+
+
+# Batches failing with these are retried one run at a time; anything else (e.g. a lost connection) is retried whole
+PERMANENT_ERRORS = (IntegrityError, DataError)
+
+
+def _pending_runs(batch_size: int, run_id=None):
+    query = select(
+        Run.id, Run.user_id, Run.route_polyline, Run.distance_km, Run.duration_seconds,
+        Run.started_at, Run.completed_at, Run.created_at, Run.start_lat, Run.start_lng
+    ).where(Run.validation_status == 'pending').order_by(Run.created_at).limit(batch_size)
+    if run_id is not None:
+        query = query.where(Run.id == run_id)
+    return query.with_for_update(skip_locked=True)
+
+
+async def finalize_pending_runs(db, batch_size: int, run_id=None) -> int:
+    """
+    Finish the oldest runs saved as 'pending' by session finalize (or just
+    `run_id`). The route work runs in the route pool; back on the loop the
+    verdicts, levels of detail and best efforts are written and counted runs
+    are folded into stats and rollups, all in one transaction. A run whose
+    route cannot be processed is rejected with the 'invalid_route' flag.
+    Rows are claimed with SKIP LOCKED so several workers can share the work.
+    Returns the number of runs finished.
+    """
+    rows = (await db.execute(_pending_runs(batch_size, run_id))).all()
+    if not rows:
+        return 0
+
+    results = await process_routes_in_pool(
+        [row.route_polyline for row in rows],
+        [row.duration_seconds for row in rows],
+        zooms=heatmap.zooms if settings.HEATMAP_ENABLED else (),
+    )
+
+    updates = []
+    counted = []
+    for row, work in zip(rows, results):
+        if work.error is not None:
+            logger.warning("Run %s cannot be finalized: %s", row.id, work.error)
+            updates.append({"id": row.id, "validation_status": 'rejected', "validation_flags": 'invalid_route'})
+            continue
+        verdict = work.verdict
+        # The running total still includes any teleport segments
+        distance_km = row.distance_km if 'no_route' in verdict.flags else verdict.distance_km
+        values = {
+            "id": row.id,
+            "distance_km": distance_km,
+            "avg_pace": GPSCalculator.calculate_pace(distance_km, row.duration_seconds),
+            "avg_speed": GPSCalculator.calculate_speed(distance_km, row.duration_seconds),
+            "route_polyline_preview": work.levels["preview"],
+            "route_polyline_thumbnail": work.levels["thumbnail"],
+            "validation_status": verdict.status,
+            "validation_flags": verdict.flags_text,
+        }
+        updates.append(values)
+        if work.counted:
+            counted.append((row, work, values))
+    await db.execute(update(Run), updates)
+
+    records = []
+    for row, work, _ in counted:
+        records += personal_record_rows(row.user_id, row.id, work.efforts, row.completed_at)
+    if records:
+        await db.execute(upsert_personal_records_statement(db, fastest_per_effort(records)))
+
+    deltas = defaultdict(lambda: [0.0, 0, 0])
+    for row, _, values in counted:
+        delta = deltas[row.user_id]
+        delta[0] += values["distance_km"]
+        delta[1] += row.duration_seconds
+        delta[2] += 1
+
+    # Same user order in every batch so concurrent workers cannot deadlock
+    scores = {}
+    for user_id in sorted(deltas):
+        distance_km, duration_seconds, count = deltas[user_id]
+        totals = await add_run_to_user_stats(db, user_id, distance_km, duration_seconds, runs=count)
+        scores[user_id] = ({"distance": totals.total_distance_km}, totals.league_tier)
+    await add_runs_to_rollups(db, [
+        {"user_id": row.user_id, "started_at": row.started_at, "duration_seconds": row.duration_seconds,
+         "distance_km": values["distance_km"], "avg_pace": values["avg_pace"]}
+        for row, _, values in counted
+    ])
+    await db.commit()
+
+    # The runs are committed; the boards, index and heatmap can always be rebuilt
+    try:
+        if scores:
+            await publish_scores(db, scores)
+        for row, work, _ in counted:
+            run_start_index.add(row.id, row.start_lat, row.start_lng)
+            if settings.HEATMAP_ENABLED:
+                heatmap.add_tiles(work.tiles, row.created_at)
+    except Exception:
+        logger.exception("Post-finalize updates failed")
+    return len(rows)
+
+
+async def reject_run(db, run_id, error: str):
+    """Give up on a pending run that cannot be finalized"""
+    await db.execute(
+        update(Run).where(Run.id == run_id, Run.validation_status == 'pending')
+        .values(validation_status='rejected', validation_flags='finalize_failed')
+    )
+    await db.commit()
+    logger.error("Run %s rejected, finalize failed: %s", run_id, error)
+
+
+class RunFinalizer:
+    """
+    Background worker finishing live-run sessions: finalize saves the run
+    from its running totals as 'pending' and wakes this worker, which does
+    the whole-route work (see finalize_pending_runs) in batches. Pending
+    runs live in the runs table, so a restart picks up where it left off.
+    """
+
+    def __init__(self, batch_size: int, poll_seconds: float):
+        self.batch_size = batch_size
+        self.poll_seconds = poll_seconds
+        self._wake = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+
+        self.finalized = 0
+        self.batches = 0
+        self.failures = 0
+        self.rejected = 0  # runs given up on after failing on their own
+
+    def wake(self):
+        self._wake.set()
+
+    def start(self, session_factory):
+        self._wake = asyncio.Event()
+        self._task = asyncio.create_task(self._run(session_factory))
+
+    async def drain(self, session_factory) -> int:
+        """Finish every pending run; returns how many"""
+        done = 0
+        while True:
+            async with session_factory() as db:
+                try:
+                    finished = await finalize_pending_runs(db, self.batch_size)
+                except PERMANENT_ERRORS:
+                    await db.rollback()
+                    logger.exception("Run finalize batch failed; retrying one run at a time")
+                    finished = await self._finalize_one_by_one(session_factory)
+            if not finished:
+                return done
+            done += finished
+            self.finalized += finished
+            self.batches += 1
+
+    async def _finalize_one_by_one(self, session_factory) -> int:
+        """Finish the next batch run by run, rejecting the runs that still fail"""
+        async with session_factory() as db:
+            run_ids = (await db.scalars(
+                select(Run.id).where(Run.validation_status == 'pending')
+                .order_by(Run.created_at).limit(self.batch_size)
+            )).all()
+        for run_id in run_ids:
+            async with session_factory() as db:
+                try:
+                    await finalize_pending_runs(db, 1, run_id)
+                except PERMANENT_ERRORS as exc:
+                    await db.rollback()
+                    await reject_run(db, run_id, repr(getattr(exc, "orig", exc)))
+                    self.rejected += 1
+        return len(run_ids)
+
+    async def _run(self, session_factory):
+        while True:
+            try:
+                await asyncio.wait_for(self._wake.wait(), timeout=self.poll_seconds)
+            except asyncio.TimeoutError:
+                pass
+            self._wake.clear()
+            try:
+                await self.drain(session_factory)
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                # The runs stay pending and are retried on the next tick
+                self.failures += 1
+                logger.exception("Run finalize failed")
+
+    async def stop(self):
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+    def stats(self) -> dict:
+        return {
+            "finalized": self.finalized,
+            "batches": self.batches,
+            "failures": self.failures,
+            "rejected": self.rejected,
+        }
+
+
+run_finalizer = RunFinalizer(settings.RUN_FINALIZE_BATCH_SIZE, settings.RUN_FINALIZE_POLL_SECONDS)
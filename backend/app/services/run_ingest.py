@@ -0,0 +1,448 @@
+import asyncio
+import json
+import logging
+import sqlite3
+import time
+import uuid
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import List, Optional, Tuple
+from sqlalchemy import DateTime
+from sqlalchemy.dialects.postgresql import UUID
+from sqlalchemy.exc import DataError, IntegrityError
+from app.config import settings
+from app.database import dialect_insert
+from app.models.personal_record import PersonalRecord
+from app.models.run import Run
+from app.services.heatmap import heatmap
+from app.services.leaderboard import publish_scores
+from app.services.metrics import Histogram, LATENCY_BUCKETS, metrics
+from app.services.personal_records import fastest_per_effort, upsert_personal_records_statement
+from app.services.route_work import rasterize_routes, route_pool
+from app.services.spatial_index import run_start_index
+from app.services.training_rollups import add_runs_to_rollups
+from app.services.user_stats import add_run_to_user_stats
+
+logger = logging.getLogger(__name__)
+
+DRAIN_LATENCY_BUCKETS = LATENCY_BUCKETS + (30.0, 60.0, 300.0)
+
+# Write failures that retrying cannot fix: constraint violations (e.g. the
+# user was deleted after the run was queued) and bad values. Anything else
+# (the database being unreachable) leaves the batch spooled.
+PERMANENT_ERRORS = (IntegrityError, DataError)
+
+# A spooled payload that cannot be read back; it is dead-lettered before the batch is written
+PAYLOAD_ERRORS = (ValueError, KeyError, TypeError)
+
+
+def _json_default(value):
+    if isinstance(value, uuid.UUID):
+        return str(value)
+    if isinstance(value, datetime):
+        return value.isoformat()
+    raise TypeError(f"Cannot spool {type(value).__name__}")
+
+
+def _decode_row(table, row: dict) -> dict:
+    """Restore UUID and datetime values of a spooled row from its table's column types"""
+    decoded = {}
+    for key, value in row.items():
+        column_type = table.c[key].type
+        if value is not None and isinstance(column_type, UUID):
+            value = uuid.UUID(value)
+        elif value is not None and isinstance(column_type, DateTime):
+            value = datetime.fromisoformat(value)
+        decoded[key] = value
+    return decoded
+
+
+def _decode_payload(payload: str) -> dict:
+    """A spooled run and its personal record rows, ready to insert; raises one of PAYLOAD_ERRORS if unreadable"""
+    data = json.loads(payload)
+    return {
+        "run": _decode_row(Run.__table__, data["run"]),
+        "records": [_decode_row(PersonalRecord.__table__, record) for record in data["records"]],
+    }
+
+
+class RunSpool:
+    """
+    Durable local queue of runs waiting to be written: a SQLite file in WAL
+    mode with synchronous=FULL, so an accepted run survives a crash. All
+    file access happens on one thread; appends arriving together are
+    committed as one transaction, so a burst costs one fsync, not one each.
+
+    Every worker process on a host shares the file. A drainer claims its
+    batch in one IMMEDIATE transaction, so no two drainers take the same run.
+    A claim older than `claim_seconds` (its drainer died mid-batch) is taken
+    over; the runs it may have written already are skipped as replays.
+
+    Runs that can never be written are moved to the dead_runs table of the
+    same file, with the error, for inspection; requeue one with
+    INSERT INTO spooled_runs (payload, enqueued_at) SELECT payload, enqueued_at FROM dead_runs WHERE seq = ?
+    """
+
+    def __init__(self, path: str, claim_seconds: float):
+        self.path = path
+        self.claim_seconds = claim_seconds
+        self.drainer_id = uuid.uuid4().hex
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="run-spool")
+        self._conn: Optional[sqlite3.Connection] = None
+        self._appends: List[Tuple[str, float, asyncio.Future]] = []
+        self._append_scheduled = False
+
+    async def _call(self, fn, *args):
+        return await asyncio.get_running_loop().run_in_executor(self._executor, fn, *args)
+
+    def _open(self):
+        # Other workers hold the write lock while they append or claim
+        self._conn = sqlite3.connect(self.path, timeout=30.0, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=FULL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS spooled_runs ("
+            "seq INTEGER PRIMARY KEY AUTOINCREMENT, payload TEXT NOT NULL, enqueued_at REAL NOT NULL, "
+            "claimed_by TEXT, claimed_at REAL)"
+        )
+        # Spools written before claims existed
+        columns = {row[1] for row in self._conn.execute("PRAGMA table_info(spooled_runs)")}
+        for column, column_type in (("claimed_by", "TEXT"), ("claimed_at", "REAL")):
+            if column not in columns:
+                self._conn.execute(f"ALTER TABLE spooled_runs ADD COLUMN {column} {column_type}")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS dead_runs ("
+            "seq INTEGER PRIMARY KEY, payload TEXT NOT NULL, enqueued_at REAL NOT NULL, "
+            "failed_at REAL NOT NULL, error TEXT NOT NULL)"
+        )
+        return self._count()
+
+    def _count(self) -> int:
+        return self._conn.execute("SELECT COUNT(*) FROM spooled_runs").fetchone()[0]
+
+    async def open(self) -> int:
+        """Open the spool; returns the number of runs already waiting in it"""
+        return await self._call(self._open)
+
+    async def count(self) -> int:
+        """Runs waiting in the spool, across every worker sharing it"""
+        return await self._call(self._count)
+
+    async def append(self, payload: str):
+        """Return once the payload is committed to the spool"""
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._appends.append((payload, time.time(), future))
+        if not self._append_scheduled:
+            self._append_scheduled = True
+            loop.create_task(self._write_appends())
+        await future
+
+    async def _write_appends(self):
+        # Everything appended while the previous group was being written goes in the next transaction
+        while self._appends:
+            group, self._appends = self._appends, []
+            try:
+                await self._call(self._insert, [(payload, enqueued_at) for payload, enqueued_at, _ in group])
+                error = None
+            except Exception as exc:
+                error = exc
+            for _, _, future in group:
+                if future.done():
+                    continue
+                if error is None:
+                    future.set_result(None)
+                else:
+                    future.set_exception(error)
+        self._append_scheduled = False
+
+    def _insert(self, rows):
+        with self._conn:
+            self._conn.execute("BEGIN")
+            self._conn.executemany("INSERT INTO spooled_runs (payload, enqueued_at) VALUES (?, ?)", rows)
+
+    def _claim(self, limit: int):
+        now = time.time()
+        with self._conn:
+            self._conn.execute("BEGIN IMMEDIATE")
+            rows = self._conn.execute(
+                "SELECT seq, payload, enqueued_at FROM spooled_runs "
+                "WHERE claimed_by IS NULL OR claimed_at < ? ORDER BY seq LIMIT ?",
+                (now - self.claim_seconds, limit)
+            ).fetchall()
+            self._conn.executemany(
+                "UPDATE spooled_runs SET claimed_by = ?, claimed_at = ? WHERE seq = ?",
+                [(self.drainer_id, now, seq) for seq, _, _ in rows]
+            )
+        return rows
+
+    async def claim(self, limit: int) -> List[Tuple[int, str, float]]:
+        """Claim the oldest unclaimed runs for this drainer, as (seq, payload, enqueued_at)"""
+        return await self._call(self._claim, limit)
+
+    def _release(self, seqs: List[int]):
+        with self._conn:
+            self._conn.execute("BEGIN")
+            self._conn.executemany(
+                "UPDATE spooled_runs SET claimed_by = NULL, claimed_at = NULL WHERE seq = ? AND claimed_by = ?",
+                [(seq, self.drainer_id) for seq in seqs]
+            )
+
+    async def release(self, seqs: List[int]):
+        """Give up this drainer's claim on runs it could not write"""
+        await self._call(self._release, seqs)
+
+    def _delete(self, seqs: List[int]):
+        with self._conn:
+            self._conn.execute("BEGIN")
+            self._conn.executemany("DELETE FROM spooled_runs WHERE seq = ?", [(seq,) for seq in seqs])
+
+    async def delete(self, seqs: List[int]):
+        """Drop claimed runs once they are in the database"""
+        await self._call(self._delete, seqs)
+
+    def _dead_letter(self, seq: int, error: str):
+        with self._conn:
+            self._conn.execute("BEGIN")
+            self._conn.execute(
+                "INSERT OR REPLACE INTO dead_runs (seq, payload, enqueued_at, failed_at, error) "
+                "SELECT seq, payload, enqueued_at, ?, ? FROM spooled_runs WHERE seq = ?",
+                (time.time(), error, seq)
+            )
+            self._conn.execute("DELETE FROM spooled_runs WHERE seq = ?", (seq,))
+
+    async def dead_letter(self, seq: int, error: str):
+        """Move a run that cannot be written out of the queue, keeping it in dead_runs"""
+        await self._call(self._dead_letter, seq, error)
+
+    async def close(self):
+        if self._conn is not None:
+            await self._call(self._conn.close)
+            self._conn = None
+        self._executor.shutdown(wait=False)
+
+
+async def write_run_batch(db, payloads: List[dict]) -> List[uuid.UUID]:
+    """
+    Write a batch of spooled runs with one multi-row INSERT, upsert their
+    personal records, and apply one stats delta per user. Runs already in
+    the database (a batch replayed after a crash) are skipped, so replays
+    never count twice. `payloads` are decoded with _decode_payload.
+    Returns the ids inserted.
+    """
+    runs = [payload["run"] for payload in payloads]
+    inserted = set((await db.execute(
+        dialect_insert(db, Run).values(runs)
+        .on_conflict_do_nothing(index_elements=[Run.id])
+        .returning(Run.id)
+    )).scalars())
+
+    counted = [
+        (run, payload) for run, payload in zip(runs, payloads)
+        if run["id"] in inserted and run["validation_status"] != 'rejected'
+    ]
+    records = [record for _, payload in counted for record in payload["records"]]
+    if records:
+        await db.execute(upsert_personal_records_statement(db, fastest_per_effort(records)))
+
+    deltas = defaultdict(lambda: [0.0, 0, 0])
+    for run, _ in counted:
+        delta = deltas[run["user_id"]]
+        delta[0] += run["distance_km"]
+        delta[1] += run["duration_seconds"]
+        delta[2] += 1
+
+    # Same user order in every batch so concurrent drainers cannot deadlock
+    scores = {}
+    for user_id in sorted(deltas):
+        distance_km, duration_seconds, count = deltas[user_id]
+        totals = await add_run_to_user_stats(db, user_id, distance_km, duration_seconds, runs=count)
+        scores[user_id] = ({"distance": totals.total_distance_km}, totals.league_tier)
+    await add_runs_to_rollups(db, [run for run, _ in counted])
+    await db.commit()
+
+    # The runs are committed, so a failure here must not retry or dead-letter
+    # them; the boards, index and heatmap can always be rebuilt
+    try:
+        if scores:
+            await publish_scores(db, scores)
+        for run, _ in counted:
+            run_start_index.add(run["id"], run["start_lat"], run["start_lng"])
+        if settings.HEATMAP_ENABLED and counted:
+            tiles = await route_pool.run(rasterize_routes, [run["route_polyline"] for run, _ in counted], heatmap.zooms)
+            for (run, _), run_tiles in zip(counted, tiles):
+                heatmap.add_tiles(run_tiles, run["created_at"])
+    except Exception:
+        logger.exception("Post-write updates failed")
+    return list(inserted)
+
+
+class RunIngestQueue:
+    """
+    Write-behind ingestion for POST /runs: accepted runs are appended to a
+    RunSpool and a background worker drains it in batches, when a batch
+    fills up or every `flush_seconds`. A run leaves the spool only after
+    its batch is committed. Payloads that cannot be read back are
+    dead-lettered up front; a batch failing with one of PERMANENT_ERRORS is
+    retried one run at a time and the runs that still fail are dead-lettered,
+    so one bad run cannot hold up the queue.
+    """
+
+    def __init__(self, path: str, batch_size: int, flush_seconds: float, claim_seconds: float):
+        self.spool = RunSpool(path, claim_seconds)
+        self.batch_size = batch_size
+        self.flush_seconds = flush_seconds
+        self._wake = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+
+        self.depth = 0  # runs waiting in the shared spool, as of the last drain
+        self.enqueued = 0
+        self.written = 0
+        self.replayed = 0  # spooled runs found already written
+        self.batches = 0
+        self.failures = 0
+        self.dead_lettered = 0
+        self.drain_latency = Histogram(
+            "run_ingest_drain_latency_seconds", "Time from accepting a queued run to committing it",
+            DRAIN_LATENCY_BUCKETS
+        )
+        self.batch_duration = Histogram(
+            "run_ingest_batch_seconds", "Time to write one drained batch", LATENCY_BUCKETS
+        )
+        metrics.register_histogram(self.drain_latency)
+        metrics.register_histogram(self.batch_duration)
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    async def start(self, session_factory):
+        self.depth = await self.spool.open()
+        self._task = asyncio.create_task(self._run(session_factory))
+        if self.depth:
+            logger.info("Run ingest spool has %d runs waiting", self.depth)
+            self._wake.set()
+
+    async def enqueue(self, run: Run, record_rows: List[dict]):
+        """Durably queue a run (and its personal record rows) for writing"""
+        row = {column.key: getattr(run, column.key) for column in Run.__table__.columns}
+        await self.spool.append(json.dumps({"run": row, "records": record_rows}, default=_json_default))
+        self.depth += 1
+        self.enqueued += 1
+        if self.depth >= self.batch_size:
+            self._wake.set()
+
+    async def drain_once(self, session_factory) -> int:
+        """Claim and write the oldest batch; returns how many spooled runs it covered"""
+        batch = await self.spool.claim(self.batch_size)
+        if not batch:
+            self.depth = await self.spool.count()
+            return 0
+
+        start = time.perf_counter()
+        dead_lettered = self.dead_lettered
+        decoded = []
+        for seq, payload, _ in batch:
+            try:
+                decoded.append((seq, _decode_payload(payload)))
+            except PAYLOAD_ERRORS as exc:
+                await self._dead_letter(seq, "cannot be read", repr(exc))
+
+        inserted = []
+        try:
+            if decoded:
+                try:
+                    async with session_factory() as db:
+                        inserted = await write_run_batch(db, [payload for _, payload in decoded])
+                except PERMANENT_ERRORS as exc:
+                    logger.warning("Run ingest batch failed, retrying its %d runs one at a time: %r",
+                                   len(decoded), getattr(exc, "orig", exc))
+                    inserted = await self._write_one_by_one(session_factory, decoded)
+        except BaseException:
+            # Hand the batch back for the next drain instead of waiting out the claim
+            await asyncio.shield(self.spool.release([seq for seq, _ in decoded]))
+            raise
+        await self.spool.delete([seq for seq, _ in decoded])
+
+        now = time.time()
+        self.batch_duration.observe(time.perf_counter() - start)
+        for _, _, enqueued_at in batch:
+            self.drain_latency.observe(max(now - enqueued_at, 0.0))
+        self.depth = await self.spool.count()
+        self.written += len(inserted)
+        self.replayed += len(batch) - len(inserted) - (self.dead_lettered - dead_lettered)
+        self.batches += 1
+        return len(batch)
+
+    async def _write_one_by_one(self, session_factory, decoded) -> List[uuid.UUID]:
+        inserted = []
+        for seq, payload in decoded:
+            try:
+                async with session_factory() as db:
+                    inserted += await write_run_batch(db, [payload])
+            except PERMANENT_ERRORS as exc:
+                # The DBAPI error, without the statement and its parameters
+                await self._dead_letter(seq, "cannot be written", repr(getattr(exc, "orig", exc)))
+        return inserted
+
+    async def _dead_letter(self, seq: int, reason: str, error: str):
+        logger.error("Spooled run %d %s, moved to dead_runs: %s", seq, reason, error)
+        await self.spool.dead_letter(seq, error)
+        self.dead_lettered += 1
+
+    async def _run(self, session_factory):
+        while True:
+            try:
+                await asyncio.wait_for(self._wake.wait(), timeout=self.flush_seconds)
+            except asyncio.TimeoutError:
+                pass
+            self._wake.clear()
+            try:
+                while await self.drain_once(session_factory) == self.batch_size:
+                    pass
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                # The batch stays spooled and is retried on the next tick
+                self.failures += 1
+                logger.exception("Run ingest drain failed")
+
+    async def stop(self, session_factory, timeout: float = 10.0):
+        """Stop the worker, write what is left within `timeout`, and close the spool"""
+        if self._task is None:
+            return
+        # Let the worker unwind first so its drain cannot overlap the final one
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        try:
+            async def drain_all():
+                while await self.drain_once(session_factory):
+                    pass
+            await asyncio.wait_for(drain_all(), timeout)
+        except Exception:
+            logger.exception("Run ingest spool not fully drained at shutdown; %d runs remain", self.depth)
+        await self.spool.close()
+        self._task = None
+
+    def stats(self) -> dict:
+        return {
+            "depth": self.depth,
+            "enqueued": self.enqueued,
+            "written": self.written,
+            "replayed": self.replayed,
+            "batches": self.batches,
+            "failures": self.failures,
+            "dead_lettered": self.dead_lettered,
+        }
+
+
+run_ingest_queue = RunIngestQueue(
+    settings.RUN_INGEST_SPOOL_PATH,
+    settings.RUN_INGEST_BATCH_SIZE,
+    settings.RUN_INGEST_FLUSH_SECONDS,
+    settings.RUN_INGEST_CLAIM_SECONDS
+)
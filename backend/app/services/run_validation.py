@@ -0,0 +1,209 @@
+import numpy as np
+from typing import List, NamedTuple, Optional, Sequence
+from sqlalchemy import and_
+from app.services.route_engine import RouteEngine
+
+# Faster than any human sprint: a segment above this is a GPS error or a vehicle
+MAX_RUNNING_SPEED_KMH = 45.0
+# Sustained speed over VEHICLE_WINDOW_SECONDS above this looks like a bike or car
+VEHICLE_SPEED_KMH = 25.0
+VEHICLE_WINDOW_SECONDS = 60.0
+# A single impossible segment at least this long is a teleport rather than jitter
+TELEPORT_MIN_KM = 0.2
+
+# Verdict thresholds
+MAX_SPIKE_FRACTION = 0.05  # share of impossible-speed segments tolerated as GPS jitter
+MAX_VEHICLE_FRACTION = 0.1  # share of the distance allowed to look vehicle-like
+MIN_VEHICLE_KM = 0.5  # vehicle-like distance always tolerated, e.g. GPS drift at a crossing
+MAX_DISTANCE_MISMATCH = 0.15  # claimed vs route distance, flagged above
+MAX_DISTANCE_OVERCLAIM = 0.5  # claimed vs route distance, rejected above
+
+# Larger batches are split so the working arrays stay cache-sized
+BATCH_POINTS = 1 << 17
+
+
+class ValidationResult(NamedTuple):
+    """Verdict for one run, with metrics recomputed from its route"""
+    status: str  # 'ok', 'flagged', 'rejected'
+    flags: tuple
+    distance_km: float  # route distance without teleport segments
+    avg_pace: float
+    avg_speed: float
+    max_speed_kmh: float  # fastest segment that is not a teleport
+    vehicle_km: float
+    teleports: int
+
+    @property
+    def flags_text(self) -> Optional[str]:
+        return ",".join(self.flags) or None
+
+
+# Rejected runs, and runs still waiting for the run finalizer, count towards nothing
+UNCOUNTED_STATUSES = ('rejected', 'pending')
+
+
+def counted_runs(status_column):
+    """Filter for runs that count towards totals, see UNCOUNTED_STATUSES"""
+    return and_(*(status_column.is_distinct_from(status) for status in UNCOUNTED_STATUSES))
+
+
+def constant_pace_times(route, duration_seconds: float) -> np.ndarray:
+    """
+    Point times for a route known only by its total duration, at a constant
+    pace along it. For simplified routes such as Strava summary polylines,
+    where even spacing would make long straight segments look like teleports;
+    only the average-speed and distance checks then apply.
+    """
+    cumulative_km = RouteEngine.compute(route).cumulative_km
+    if not len(cumulative_km) or cumulative_km[-1] <= 0:
+        return np.linspace(0, duration_seconds or 0, len(cumulative_km))
+    return cumulative_km / cumulative_km[-1] * (duration_seconds or 0)
+
+
+def _segment_seconds(lengths: np.ndarray, times: Optional[Sequence], durations: Sequence[float]) -> np.ndarray:
+    """Per-segment seconds of every run, from its point times when given or spread over its duration"""
+    parts = []
+    for i, n in enumerate(lengths):
+        if n < 2:
+            continue
+        run_times = times[i] if times is not None else None
+        if run_times is not None:
+            parts.append(np.diff(np.asarray(run_times, dtype=np.float64)))
+        else:
+            parts.append(np.full(n - 1, (durations[i] or 0) / (n - 1), dtype=np.float64))
+    return np.concatenate(parts) if parts else np.zeros(0, dtype=np.float64)
+
+
+def validate_runs(
+    routes: Sequence,
+    durations: Sequence[float],
+    claimed_distances: Optional[Sequence[Optional[float]]] = None,
+    times: Optional[Sequence] = None
+) -> List[ValidationResult]:
+    """
+    Validate a batch of runs in one vectorized pass.
+    All routes are concatenated; per-run totals are bincounts over the
+    segment owners, and the rolling vehicle-speed window is one sorted
+    search over a shared clock on which runs are spaced far enough apart
+    that no window spans two of them. `times` holds per-point seconds for
+    each run (or None for a run without them); a missing duration is
+    taken from the point times.
+    """
+    arrays = [RouteEngine.to_array(route) for route in routes]
+    if not arrays:
+        return []
+    count = len(arrays)
+
+    lengths = np.array([len(a) for a in arrays])
+    if count > 1 and lengths.sum() > BATCH_POINTS:
+        # Greedy groups of whole runs up to BATCH_POINTS each
+        cuts, points = [0], 0
+        for i, n in enumerate(lengths.tolist()):
+            if points and points + n > BATCH_POINTS:
+                cuts.append(i)
+                points = 0
+            points += n
+        cuts.append(count)
+        results = []
+        for lo, hi in zip(cuts[:-1], cuts[1:]):
+            results += validate_runs(
+                arrays[lo:hi], durations[lo:hi],
+                None if claimed_distances is None else claimed_distances[lo:hi],
+                None if times is None else times[lo:hi]
+            )
+        return results
+
+    segment_counts = np.maximum(lengths - 1, 0)
+    owner = np.repeat(np.arange(count), segment_counts)
+
+    # Segment distances without the ones joining consecutive routes
+    coords = np.concatenate(arrays)
+    segment_km = RouteEngine.segment_distances(coords)
+    starts = np.cumsum(lengths) - lengths
+    boundaries = starts[1:] - 1
+    inside = np.ones(len(segment_km), dtype=bool)
+    inside[boundaries[(boundaries >= 0) & (boundaries < len(inside))]] = False
+    segment_km = segment_km[inside]
+
+    seconds = _segment_seconds(lengths, times, durations)
+    speed = np.zeros_like(segment_km)
+    np.divide(segment_km * 3600, seconds, out=speed, where=seconds > 0)
+
+    # Distance covered in no time at all is as impossible as too fast
+    impossible = (speed > MAX_RUNNING_SPEED_KMH) | ((seconds <= 0) & (segment_km > 0))
+    teleport = impossible & (segment_km >= TELEPORT_MIN_KM)
+    counted_km = np.where(teleport, 0.0, segment_km)
+
+    # Speed over the window of segments ending at each segment
+    seconds = np.maximum(seconds, 0.0)
+    clock = np.cumsum(seconds) + owner * (VEHICLE_WINDOW_SECONDS * 2)
+    distance = np.cumsum(counted_km)
+    first = np.searchsorted(clock, clock - VEHICLE_WINDOW_SECONDS, side="left")
+    window_seconds = clock - clock[first] + seconds[first]
+    window_km = distance - distance[first] + counted_km[first]
+    window_speed = np.zeros_like(window_km)
+    np.divide(window_km * 3600, window_seconds, out=window_speed, where=window_seconds > 0)
+    vehicle = (window_speed > VEHICLE_SPEED_KMH) & (window_seconds >= VEHICLE_WINDOW_SECONDS / 2)
+
+    def per_run(values) -> np.ndarray:
+        return np.bincount(owner, weights=values, minlength=count)
+
+    route_km = per_run(counted_km)
+    teleports = per_run(teleport)
+    spikes = per_run(impossible & ~teleport)
+    vehicle_km = per_run(np.where(vehicle, counted_km, 0.0))
+    elapsed = per_run(seconds)
+    max_speed = np.zeros(count, dtype=np.float64)
+    has_segments = segment_counts > 0
+    if has_segments.any():
+        segment_starts = np.cumsum(segment_counts) - segment_counts
+        max_speed[has_segments] = np.maximum.reduceat(
+            np.where(impossible, 0.0, speed), segment_starts[has_segments]
+        )
+
+    results = []
+    for i in range(count):
+        duration = float(durations[i] or elapsed[i])
+        km = float(route_km[i])
+        claimed = claimed_distances[i] if claimed_distances is not None else None
+        flags = []
+        rejected = False
+
+        if segment_counts[i] == 0:
+            flags.append("no_route")
+        else:
+            if teleports[i]:
+                flags.append("teleport")
+            if spikes[i] > MAX_SPIKE_FRACTION * segment_counts[i]:
+                flags.append("speed_spikes")
+            if vehicle_km[i] > max(MAX_VEHICLE_FRACTION * km, MIN_VEHICLE_KM):
+                flags.append("vehicle")
+                rejected = True
+            if duration > 0 and km * 3600 / duration > VEHICLE_SPEED_KMH:
+                flags.append("average_speed")
+                rejected = True
+            if claimed is not None and km > 0:
+                mismatch = (claimed - km) / km
+                if mismatch > MAX_DISTANCE_OVERCLAIM:
+                    flags.append("distance_overclaim")
+                    rejected = True
+                elif abs(mismatch) > MAX_DISTANCE_MISMATCH:
+                    flags.append("distance_mismatch")
+
+        results.append(ValidationResult(
+            status="rejected" if rejected else ("flagged" if flags else "ok"),
+            flags=tuple(flags),
+            distance_km=round(km, 3),
+            avg_pace=round(duration / 60 / km, 2) if km > 0 else 0.0,
+            avg_speed=round(km * 3600 / duration, 2) if duration > 0 else 0.0,
+            max_speed_kmh=round(float(max_speed[i]), 1),
+            vehicle_km=round(float(vehicle_km[i]), 3),
+            teleports=int(teleports[i]),
+        ))
+    return results
+
+
+def validate_run(route, duration_seconds: float, claimed_distance_km: Optional[float] = None,
+                 times=None) -> ValidationResult:
+    """Validate a single run; see validate_runs"""
+    return validate_runs([route], [duration_seconds], [claimed_distance_km], [times])[0]
@@ -0,0 +1,283 @@
+import logging
+import math
+import numpy as np
+from typing import List, NamedTuple, Optional, Set, Tuple
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.config import settings
+from app.models.run import Run
+from app.services.run_validation import counted_runs
+from app.services.gps_calculator import GPSCalculator
+
+# Bits per axis of a cell id; 52-bit ids are ~0.6 m cells
+CELL_BITS = 26
+GEOHASH_ALPHABET = np.array(list("0123456789bcdefghjkmnpqrstuvwxyz"))
+KM_PER_DEGREE = GPSCalculator.EARTH_RADIUS_KM * math.pi / 180
+
+# Newly added points are scanned directly until this many are waiting, then merged
+MERGE_PENDING = 2048
+
+logger = logging.getLogger(__name__)
+
+
+def _spread_bits(values: np.ndarray) -> np.ndarray:
+    """Move bit i of each value to bit 2i"""
+    v = values.astype(np.uint64) & np.uint64(0xFFFFFFFF)
+    for shift, mask in ((16, 0x0000FFFF0000FFFF), (8, 0x00FF00FF00FF00FF), (4, 0x0F0F0F0F0F0F0F0F),
+                        (2, 0x3333333333333333), (1, 0x5555555555555555)):
+        v = (v | (v << np.uint64(shift))) & np.uint64(mask)
+    return v
+
+
+def _interleave(x: np.ndarray, y: np.ndarray) -> np.ndarray:
+    """Z-order key with the x (longitude) bit first, like geohash"""
+    return ((_spread_bits(x) << np.uint64(1)) | _spread_bits(y)).astype(np.int64)
+
+
+def cell_ids(lats, lngs) -> np.ndarray:
+    """
+    Cell ids for arrays of coordinates: longitude and latitude bits interleaved
+    as in geohash, so the first 5p bits are a precision-p geohash and every
+    coarser cell is one contiguous id range.
+    """
+    scale = 1 << CELL_BITS
+    lat_bits = np.clip(((np.asarray(lats, dtype=np.float64) + 90) / 180 * scale).astype(np.int64), 0, scale - 1)
+    lng_bits = np.clip(((np.asarray(lngs, dtype=np.float64) + 180) / 360 * scale).astype(np.int64), 0, scale - 1)
+    return _interleave(lng_bits, lat_bits)
+
+
+def cell_id(lat: Optional[float], lng: Optional[float]) -> Optional[int]:
+    """Cell id of a single point, or None without coordinates"""
+    if lat is None or lng is None:
+        return None
+    return int(cell_ids([lat], [lng])[0])
+
+
+def cell_to_geohash(cells, precision: int) -> List[str]:
+    """Geohash strings (precision up to 10) of cell ids"""
+    cells = np.asarray(cells, dtype=np.int64)
+    shifts = 2 * CELL_BITS - 5 * (np.arange(precision) + 1)
+    digits = (cells[:, None] >> shifts) & 0x1F
+    return ["".join(chars) for chars in GEOHASH_ALPHABET[digits]]
+
+
+def cover_ranges(lat: float, lng: float, radius_km: float, max_cells: int = 16) -> List[Tuple[int, int]]:
+    """
+    Inclusive cell id ranges covering a circle: the bounding box is split
+    into at most `max_cells` cells at the finest level that allows it, and
+    neighbouring cells with consecutive ids are merged.
+    """
+    dlat = radius_km / KM_PER_DEGREE
+    lat_min, lat_max = max(lat - dlat, -90.0), min(lat + dlat, 90.0)
+    cos_lat = math.cos(math.radians(min(abs(lat) + dlat, 90.0)))
+    dlng = radius_km / (KM_PER_DEGREE * cos_lat) if cos_lat > 1e-9 else 360.0
+    if dlng >= 180:
+        lng_min, lng_max = -180.0, 180.0
+    else:
+        lng_min, lng_max = lng - dlng, lng + dlng
+
+    for level in range(CELL_BITS, -1, -1):
+        n = 1 << level
+        y0, y1 = (min(int((v + 90) / 180 * n), n - 1) for v in (lat_min, lat_max))
+        x0, x1 = (math.floor((v + 180) / 360 * n) for v in (lng_min, lng_max))
+        columns = min(x1 - x0 + 1, n)
+        if level == 0 or (y1 - y0 + 1) * columns <= max_cells:
+            break
+
+    xs = np.arange(x0, x0 + columns) % n
+    ys = np.arange(y0, y1 + 1)
+    grid_x, grid_y = np.meshgrid(xs, ys)
+    span = 1 << (2 * (CELL_BITS - level))
+    starts = np.sort(_interleave(grid_x.ravel(), grid_y.ravel()) * span)
+
+    ranges = []
+    for start in starts.tolist():
+        if ranges and ranges[-1][1] + 1 == start:
+            ranges[-1] = (ranges[-1][0], start + span - 1)
+        else:
+            ranges.append((start, start + span - 1))
+    return ranges
+
+
+class SpatialHits(NamedTuple):
+    """Points within a radius, nearest first"""
+    ids: np.ndarray
+    cells: np.ndarray
+    lats: np.ndarray
+    lngs: np.ndarray
+    distances_km: np.ndarray
+
+
+def refine(ids, cells, lats, lngs, lat: float, lng: float, radius_km: float) -> SpatialHits:
+    """Exact distance filter of cell candidates, sorted by distance"""
+    distances = GPSCalculator.distances_from(lat, lng, lats, lngs)
+    inside = np.flatnonzero(distances <= radius_km)
+    order = inside[np.argsort(distances[inside], kind="stable")]
+    return SpatialHits(
+        np.asarray(ids, dtype=object)[order],
+        np.asarray(cells)[order],
+        np.asarray(lats)[order],
+        np.asarray(lngs)[order],
+        distances[order]
+    )
+
+
+class SpatialIndex:
+    """
+    In-memory point index for hot radius queries: parallel arrays sorted by
+    cell id, so each covering range is found by binary search. New points
+    are buffered and scanned directly by queries; once MERGE_PENDING are
+    waiting they are merged in by binary-search insertion, without
+    re-sorting the whole index. Removed points are left out of queries
+    until the next merge drops them.
+    """
+
+    def __init__(self):
+        self._cells = np.empty(0, dtype=np.int64)
+        self._lats = np.empty(0, dtype=np.float64)
+        self._lngs = np.empty(0, dtype=np.float64)
+        self._ids = np.empty(0, dtype=object)
+        self._pending: List[tuple] = []
+        self._removed: Set = set()
+        self.loaded = False
+
+    def __len__(self) -> int:
+        return len(self._cells) + len(self._pending)
+
+    def stats(self) -> dict:
+        return {"points": len(self), "pending": len(self._pending), "removed": len(self._removed), "loaded": self.loaded}
+
+    def add(self, point_id, lat: Optional[float], lng: Optional[float]):
+        if lat is not None and lng is not None:
+            self._pending.append((point_id, lat, lng))
+
+    def remove(self, point_id):
+        """Drop an indexed point, e.g. a run rejected after it was added"""
+        self._pending = [p for p in self._pending if p[0] != point_id]
+        self._removed.add(point_id)
+
+    def bulk_load(self, ids, lats, lngs):
+        """Replace the index contents with the given points"""
+        lats = np.asarray(lats, dtype=np.float64)
+        lngs = np.asarray(lngs, dtype=np.float64)
+        cells = cell_ids(lats, lngs)
+        order = np.argsort(cells, kind="stable")
+        self._cells, self._lats, self._lngs = cells[order], lats[order], lngs[order]
+        self._ids = np.asarray(ids, dtype=object)[order]
+        self._pending = []
+        self._removed = set()
+
+    def _drop_removed(self):
+        keep = np.fromiter((point_id not in self._removed for point_id in self._ids), dtype=bool, count=len(self._ids))
+        self._cells, self._lats, self._lngs, self._ids = (
+            self._cells[keep], self._lats[keep], self._lngs[keep], self._ids[keep]
+        )
+        self._removed = set()
+
+    def _merge_pending(self):
+        if self._removed:
+            self._drop_removed()
+        if not self._pending:
+            return
+        ids, lats, lngs = zip(*self._pending)
+        lats = np.asarray(lats, dtype=np.float64)
+        lngs = np.asarray(lngs, dtype=np.float64)
+        cells = cell_ids(lats, lngs)
+        order = np.argsort(cells, kind="stable")
+        cells = cells[order]
+        positions = np.searchsorted(self._cells, cells, side="right")
+        self._cells = np.insert(self._cells, positions, cells)
+        self._lats = np.insert(self._lats, positions, lats[order])
+        self._lngs = np.insert(self._lngs, positions, lngs[order])
+        self._ids = np.insert(self._ids, positions, np.asarray(ids, dtype=object)[order])
+        self._pending = []
+
+    def candidates(self, lat: float, lng: float, radius_km: float) -> np.ndarray:
+        """Positions of the indexed points in the cells covering the circle"""
+        ranges = cover_ranges(lat, lng, radius_km)
+        lows = np.searchsorted(self._cells, [lo for lo, _ in ranges], side="left")
+        highs = np.searchsorted(self._cells, [hi for _, hi in ranges], side="right")
+        if not len(lows):
+            return np.empty(0, dtype=np.int64)
+        return np.concatenate([np.arange(lo, hi) for lo, hi in zip(lows, highs)])
+
+    def query(self, lat: float, lng: float, radius_km: float) -> SpatialHits:
+        """Points within radius_km, nearest first"""
+        if len(self._pending) >= MERGE_PENDING:
+            self._merge_pending()
+        positions = self.candidates(lat, lng, radius_km)
+        if self._removed:
+            positions = positions[[self._ids[i] not in self._removed for i in positions]]
+        ids, cells = self._ids[positions], self._cells[positions]
+        lats, lngs = self._lats[positions], self._lngs[positions]
+        if self._pending:
+            pending_ids, pending_lats, pending_lngs = zip(*self._pending)
+            pending_lats = np.asarray(pending_lats, dtype=np.float64)
+            pending_lngs = np.asarray(pending_lngs, dtype=np.float64)
+            ids = np.concatenate((ids, np.asarray(pending_ids, dtype=object)))
+            cells = np.concatenate((cells, cell_ids(pending_lats, pending_lngs)))
+            lats = np.concatenate((lats, pending_lats))
+            lngs = np.concatenate((lngs, pending_lngs))
+        return refine(ids, cells, lats, lngs, lat, lng, radius_km)
+
+    async def load(self, db: AsyncSession, batch_size: int = 50000) -> int:
+        """Load the start point of every counted run, as ingest adds them"""
+        ids, lats, lngs = [], [], []
+        result = await db.stream(
+            select(Run.id, Run.start_lat, Run.start_lng)
+            .where(
+                Run.start_lat.is_not(None), Run.start_lng.is_not(None),
+                counted_runs(Run.validation_status)
+            )
+            .execution_options(yield_per=batch_size)
+        )
+        async for partition in result.partitions():
+            for row in partition:
+                ids.append(row.id)
+                lats.append(row.start_lat)
+                lngs.append(row.start_lng)
+
+        pending, self._pending = self._pending, []
+        self.bulk_load(ids, lats, lngs)
+        # Keep runs saved while loading
+        loaded = set(ids)
+        self._pending = [p for p in pending if p[0] not in loaded]
+        self.loaded = True
+        return len(ids)
+
+
+run_start_index = SpatialIndex()
+
+
+async def load_run_start_index(session_factory):
+    """Background load of the in-memory start point index"""
+    try:
+        async with session_factory() as db:
+            runs = await run_start_index.load(db)
+        logger.info("Loaded %d run start points into the spatial index", runs)
+    except Exception:
+        logger.exception("Spatial index load failed")
+
+
+async def runs_starting_near(db: AsyncSession, lat: float, lng: float, radius_km: float) -> SpatialHits:
+    """
+    Counted runs' start points within radius_km, nearest first. Served from
+    the in-memory index once loaded, otherwise from the indexed start_cell
+    column; both refine cell candidates by exact distance.
+    """
+    if settings.SPATIAL_INDEX_IN_MEMORY and run_start_index.loaded:
+        return run_start_index.query(lat, lng, radius_km)
+
+    rows = []
+    for lo, hi in cover_ranges(lat, lng, radius_km):
+        rows += (await db.execute(
+            select(Run.id, Run.start_cell, Run.start_lat, Run.start_lng)
+            .where(Run.start_cell.between(lo, hi), counted_runs(Run.validation_status))
+        )).all()
+    if not rows:
+        empty = np.empty(0)
+        return SpatialHits(empty.astype(object), empty.astype(np.int64), empty, empty, empty)
+
+    ids, cells, lats, lngs = zip(*rows)
+    return refine(ids, np.asarray(cells, dtype=np.int64), np.asarray(lats, dtype=np.float64),
+                  np.asarray(lngs, dtype=np.float64), lat, lng, radius_km)
@@ -0,0 +1,415 @@
+import asyncio
+import logging
+import random
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional
+import httpx
+from sqlalchemy import select, update
+from app.config import settings
+from app.database import dialect_insert
+from app.models.run import Run
+from app.models.user import User
+from app.services.gps_calculator import GPSCalculator
+from app.services.heatmap import heatmap
+from app.services.leaderboard import publish_scores
+from app.services.personal_records import (
+    fastest_per_effort,
+    personal_record_rows,
+    upsert_personal_records_statement,
+)
+from app.services.principal_cache import mark_user_changed
+from app.services.route_codec import RouteCodec
+from app.services.route_work import RouteWork, process_routes_in_pool
+from app.services.spatial_index import cell_id, run_start_index
+from app.services.training_rollups import add_runs_to_rollups
+from app.services.user_stats import add_run_to_user_stats
+
+# Strava activity types imported as runs
+RUN_TYPES = {"Run", "TrailRun", "VirtualRun"}
+
+logger = logging.getLogger(__name__)
+
+
+class StravaError(Exception):
+    """Strava request failed after retries"""
+
+
+class StravaUnauthorized(StravaError):
+    """Access token rejected"""
+
+
+class StravaClient:
+    """
+    Pooled async Strava API client. At most `concurrency` requests are in
+    flight; a 429 pauses every request until the rate limit window resets,
+    and server errors are retried with exponential back-off.
+    """
+
+    def __init__(self, base_url: str, oauth_url: str, concurrency: int, rate_limit_window: float = 900,
+                 max_retries: int = 5, transport: Optional[httpx.AsyncBaseTransport] = None):
+        self.base_url = base_url
+        self.oauth_url = oauth_url
+        self.rate_limit_window = rate_limit_window  # limits reset on multiples of this, in wall-clock seconds
+        self.max_retries = max_retries
+        self._semaphore = asyncio.Semaphore(concurrency)
+        self._limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+        self._transport = transport
+        self._client: Optional[httpx.AsyncClient] = None
+        self._resume_at = 0.0  # monotonic time when rate limiting ends
+
+        self.requests = 0
+        self.rate_limited = 0
+        self.retries = 0
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        if self._client is None:
+            self._client = httpx.AsyncClient(limits=self._limits, timeout=30.0, transport=self._transport)
+        return self._client
+
+    def stats(self) -> dict:
+        return {
+            "requests": self.requests,
+            "rate_limited": self.rate_limited,
+            "retries": self.retries,
+            "paused_seconds": max(self._resume_at - time.monotonic(), 0.0),
+        }
+
+    async def aclose(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    def _rate_limit_wait(self, response: httpx.Response) -> float:
+        """Seconds until requests may resume after a 429"""
+        retry_after = response.headers.get("Retry-After")
+        if retry_after:
+            try:
+                return max(float(retry_after), 0.0)
+            except ValueError:
+                pass
+        return self.rate_limit_window - time.time() % self.rate_limit_window
+
+    @staticmethod
+    def _near_limit(response: httpx.Response) -> bool:
+        """True when the short-term usage has reached its limit ("100,1000" / "100,250")"""
+        try:
+            limit = int(response.headers["X-RateLimit-Limit"].split(",")[0])
+            usage = int(response.headers["X-RateLimit-Usage"].split(",")[0])
+        except (KeyError, ValueError, IndexError):
+            return False
+        return usage >= limit
+
+    async def request(self, method: str, url: str, **kwargs) -> httpx.Response:
+        error = None
+        for attempt in range(self.max_retries + 1):
+            pause = self._resume_at - time.monotonic()
+            if pause > 0:
+                await asyncio.sleep(pause)
+
+            async with self._semaphore:
+                self.requests += 1
+                try:
+                    response = await self.client.request(method, url, **kwargs)
+                except httpx.TransportError as exc:
+                    response = None
+                    error = exc
+
+            if response is not None:
+                if response.status_code == 401:
+                    raise StravaUnauthorized("Strava rejected the access token")
+                if response.status_code == 429:
+                    self.rate_limited += 1
+                    error = StravaError("Strava rate limit exceeded")
+                    self._resume_at = max(self._resume_at, time.monotonic() + self._rate_limit_wait(response))
+                    continue
+                if response.status_code < 500:
+                    response.raise_for_status()
+                    if self._near_limit(response):
+                        self._resume_at = max(self._resume_at, time.monotonic() + self._rate_limit_wait(response))
+                    return response
+                error = StravaError(f"Strava returned {response.status_code}")
+
+            if attempt < self.max_retries:
+                self.retries += 1
+                await asyncio.sleep(min(2 ** attempt, 60) * (0.5 + random.random() / 2))
+
+        raise StravaError(f"Strava request failed: {error}")
+
+    async def activities(self, access_token: str, page: int, per_page: int, after: Optional[int] = None) -> List[dict]:
+        """One page of the athlete's activities, oldest first when `after` is given"""
+        params = {"page": page, "per_page": per_page}
+        if after is not None:
+            params["after"] = after
+        response = await self.request(
+            "GET", f"{self.base_url}/athlete/activities",
+            params=params, headers={"Authorization": f"Bearer {access_token}"}
+        )
+        return response.json()
+
+    async def refresh_token(self, refresh_token: str) -> dict:
+        """Exchange a refresh token for a new access token"""
+        response = await self.request("POST", self.oauth_url, data={
+            "client_id": settings.STRAVA_CLIENT_ID,
+            "client_secret": settings.STRAVA_CLIENT_SECRET,
+            "grant_type": "refresh_token",
+            "refresh_token": refresh_token,
+        })
+        return response.json()
+
+
+strava_client = StravaClient(
+    settings.STRAVA_API_URL,
+    settings.STRAVA_OAUTH_URL,
+    settings.STRAVA_IMPORT_CONCURRENCY,
+    settings.STRAVA_RATE_LIMIT_WINDOW_SECONDS
+)
+
+
+def _parse_start(value: str) -> datetime:
+    """Strava ISO 8601 UTC timestamp as a naive UTC datetime"""
+    parsed = datetime.fromisoformat(value.replace("Z", "+00:00"))
+    if parsed.tzinfo is not None:
+        parsed = parsed.astimezone(timezone.utc).replace(tzinfo=None)
+    return parsed
+
+
+def activity_to_run(activity: dict, user_id, weight_kg: float) -> Optional[dict]:
+    """Run row for a Strava summary activity, or None if it is not an importable run"""
+    if (activity.get("sport_type") or activity.get("type")) not in RUN_TYPES:
+        return None
+    distance_km = (activity.get("distance") or 0) / 1000
+    duration_seconds = int(activity.get("moving_time") or activity.get("elapsed_time") or 0)
+    if distance_km <= 0 or duration_seconds <= 0 or not activity.get("start_date"):
+        return None
+
+    route_polyline = (activity.get("map") or {}).get("summary_polyline") or ""
+    try:
+        coords = RouteCodec.decode(route_polyline)
+    except ValueError:
+        route_polyline, coords = "", RouteCodec.decode("")
+
+    start = tuple(map(float, coords[0])) if len(coords) else tuple(activity.get("start_latlng") or (None, None))
+    end = tuple(map(float, coords[-1])) if len(coords) else tuple(activity.get("end_latlng") or (None, None))
+    if len(start) != 2:
+        start = (None, None)
+    if len(end) != 2:
+        end = (None, None)
+
+    started_at = _parse_start(activity["start_date"])
+    return {
+        "id": uuid.uuid4(),
+        "user_id": user_id,
+        "distance_km": distance_km,
+        "duration_seconds": duration_seconds,
+        "avg_pace": GPSCalculator.calculate_pace(distance_km, duration_seconds),
+        "avg_speed": GPSCalculator.calculate_speed(distance_km, duration_seconds),
+        "calories_burned": activity.get("calories") or GPSCalculator.calculate_calories(distance_km, weight_kg or 70),
+        "route_polyline": route_polyline,
+        "route_polyline_preview": None,  # set with the verdicts, see _process_rows
+        "route_polyline_thumbnail": None,
+        "start_lat": start[0],
+        "start_lng": start[1],
+        "end_lat": end[0],
+        "end_lng": end[1],
+        "start_cell": cell_id(*start),
+        "end_cell": cell_id(*end),
+        "started_at": started_at,
+        "completed_at": started_at + timedelta(seconds=int(activity.get("elapsed_time") or duration_seconds)),
+        "created_at": datetime.utcnow(),
+        "source": "strava",
+        "external_id": str(activity["id"]),
+    }
+
+
+class ImportJob:
+    """Progress of one user's Strava history import"""
+
+    def __init__(self, user_id):
+        self.user_id = user_id
+        self.status = "running"  # 'running', 'completed', 'failed'
+        self.pages = 0
+        self.activities = 0
+        self.imported = 0
+        self.skipped = 0  # not runs, or already imported
+        self.rejected = 0  # imported, but failed validation
+        self.error: Optional[str] = None
+        self.started_at = datetime.utcnow()
+        self.finished_at: Optional[datetime] = None
+
+
+async def _process_rows(rows: List[dict]) -> Dict[uuid.UUID, RouteWork]:
+    """
+    Validate and simplify a batch of run rows in the route pool, setting
+    their verdicts and levels of detail; returns the route work by run id.
+    Summary polylines are simplified and untimed, so the points are paced
+    evenly along the route.
+    """
+    results = await process_routes_in_pool(
+        [row["route_polyline"] for row in rows],
+        [row["duration_seconds"] for row in rows],
+        even_pace=True,
+        zooms=heatmap.zooms if settings.HEATMAP_ENABLED else (),
+    )
+    for row, work in zip(rows, results):
+        if work.error is not None:
+            # activity_to_run only keeps polylines that decode, so this is a processing failure
+            logger.warning("Strava activity %s cannot be validated: %s", row["external_id"], work.error)
+            row["validation_status"], row["validation_flags"] = "rejected", "invalid_route"
+            continue
+        row["validation_status"] = work.verdict.status
+        row["validation_flags"] = work.verdict.flags_text
+        row["route_polyline_preview"] = work.levels["preview"]
+        row["route_polyline_thumbnail"] = work.levels["thumbnail"]
+    return {row["id"]: work for row, work in zip(rows, results)}
+
+
+async def _insert_runs(db, job: ImportJob, rows: List[dict]):
+    """
+    Insert a batch of runs, skipping ones already imported, and fold them
+    into stats and records; runs rejected by validation are stored but not counted.
+    """
+    work = await _process_rows(rows)
+    inserted = set((await db.execute(
+        dialect_insert(db, Run).values(rows)
+        .on_conflict_do_nothing(index_elements=[Run.user_id, Run.source, Run.external_id])
+        .returning(Run.id)
+    )).scalars())
+    new_rows = [row for row in rows if row["id"] in inserted]
+    job.imported += len(new_rows)
+    job.skipped += len(rows) - len(new_rows)
+    new_rows = [row for row in new_rows if row["validation_status"] != "rejected"]
+    job.rejected += len(inserted) - len(new_rows)
+    if not new_rows:
+        await db.commit()
+        return
+
+    records = []
+    for row in new_rows:
+        records += personal_record_rows(row["user_id"], row["id"], work[row["id"]].efforts, row["completed_at"])
+    if records:
+        await db.execute(upsert_personal_records_statement(db, fastest_per_effort(records)))
+
+    totals = await add_run_to_user_stats(
+        db, job.user_id,
+        sum(row["distance_km"] for row in new_rows),
+        sum(row["duration_seconds"] for row in new_rows),
+        runs=len(new_rows)
+    )
+    await add_runs_to_rollups(db, new_rows)
+    await db.commit()
+
+    await publish_scores(db, {job.user_id: ({"distance": totals.total_distance_km}, totals.league_tier)})
+    for row in new_rows:
+        run_start_index.add(row["id"], row["start_lat"], row["start_lng"])
+        if settings.HEATMAP_ENABLED:
+            heatmap.add_tiles(work[row["id"]].tiles, row["created_at"])
+
+
+async def _refresh_access_token(session_factory, client: StravaClient, user: User) -> str:
+    """Refresh and store the user's tokens; uses its own session as pages are fetched during inserts"""
+    tokens = await client.refresh_token(user.strava_refresh_token)
+    async with session_factory() as db:
+        await db.execute(update(User).where(User.id == user.id).values(
+            strava_access_token=tokens["access_token"],
+            strava_refresh_token=tokens.get("refresh_token", user.strava_refresh_token)
+        ))
+        mark_user_changed(db, user.id)
+        await db.commit()
+    return tokens["access_token"]
+
+
+async def import_strava_history(session_factory, user_id, job: Optional[ImportJob] = None,
+                                client: StravaClient = strava_client, after: Optional[int] = None) -> ImportJob:
+    """
+    Import every Strava run of a user. Pages are fetched `concurrency` at a
+    time and the next wave is fetched while the current one is inserted in
+    batches of STRAVA_IMPORT_BATCH_SIZE, one commit per batch. Activities
+    already imported are skipped by the (user_id, source, external_id)
+    unique constraint, so an interrupted import can simply be rerun.
+    """
+    job = job or ImportJob(user_id)
+    per_page = settings.STRAVA_IMPORT_PAGE_SIZE
+    wave_size = settings.STRAVA_IMPORT_CONCURRENCY
+
+    try:
+        async with session_factory() as db:
+            user = await db.scalar(select(User).where(User.id == user_id))
+            if user is None or not user.strava_access_token:
+                raise StravaError("Strava is not connected")
+            access_token = user.strava_access_token
+
+            async def fetch_page(page: int) -> List[dict]:
+                nonlocal access_token
+                try:
+                    return await client.activities(access_token, page, per_page, after)
+                except StravaUnauthorized:
+                    if not user.strava_refresh_token:
+                        raise
+                    token = access_token
+                    async with refresh_lock:
+                        # Another page may have refreshed it already
+                        if access_token == token:
+                            access_token = await _refresh_access_token(session_factory, client, user)
+                    return await client.activities(access_token, page, per_page, after)
+
+            def fetch_wave(first_page: int):
+                return asyncio.gather(*(fetch_page(first_page + i) for i in range(wave_size)))
+
+            refresh_lock = asyncio.Lock()
+            first_page = 1
+            wave = asyncio.ensure_future(fetch_wave(first_page))
+            pending: List[dict] = []
+            try:
+                while wave is not None:
+                    pages = await wave
+                    first_page += wave_size
+                    done = any(len(page) < per_page for page in pages)
+                    # Fetch ahead while this wave is written
+                    wave = None if done else asyncio.ensure_future(fetch_wave(first_page))
+
+                    for page in pages:
+                        if page:
+                            job.pages += 1
+                        for activity in page:
+                            job.activities += 1
+                            row = activity_to_run(activity, user_id, user.weight_kg)
+                            if row is None:
+                                job.skipped += 1
+                                continue
+                            pending.append(row)
+                            if len(pending) >= settings.STRAVA_IMPORT_BATCH_SIZE:
+                                await _insert_runs(db, job, pending)
+                                pending = []
+                if pending:
+                    await _insert_runs(db, job, pending)
+            finally:
+                if wave is not None:
+                    wave.cancel()
+
+        job.status = "completed"
+    except Exception as exc:
+        logger.exception("Strava import failed for user %s", user_id)
+        job.status = "failed"
+        job.error = str(exc)
+    finally:
+        job.finished_at = datetime.utcnow()
+    return job
+
+
+# Imports started by this process: user_id -> (job, task)
+import_jobs: Dict[uuid.UUID, tuple] = {}
+
+
+def start_import(session_factory, user_id) -> ImportJob:
+    """Start a background import unless one is already running for the user"""
+    current = import_jobs.get(user_id)
+    if current is not None and current[0].status == "running":
+        return current[0]
+
+    job = ImportJob(user_id)
+    task = asyncio.create_task(import_strava_history(session_factory, user_id, job))
+    import_jobs[user_id] = (job, task)
+    return job
@@ -0,0 +1,227 @@
+import bisect
+from datetime import date, datetime, timedelta, timezone
+from typing import Dict, Iterable, List, Optional, Tuple
+from sqlalchemy import and_, case, or_, select
+from app.database import dialect_insert
+from app.models.training_rollup import TrainingRollup
+
+PERIODS = ("day", "week", "month")
+
+# Upper edges of the pace buckets in min/km; the last bucket is everything slower
+PACE_BUCKET_EDGES = (4.0, 4.5, 5.0, 5.5, 6.0, 6.5, 7.0, 8.0)
+PACE_BUCKET_COLUMNS = [f"pace_bucket_{i}" for i in range(len(PACE_BUCKET_EDGES) + 1)]
+
+# Shorter runs do not set a period's best pace
+BEST_PACE_MIN_KM = 1.0
+
+SUM_COLUMNS = ["distance_km", "duration_seconds", "run_count"] + PACE_BUCKET_COLUMNS
+
+
+def period_start(period: str, day: date) -> date:
+    """First day of the day, week (Monday) or month containing `day`"""
+    if period == "day":
+        return day
+    if period == "week":
+        return day - timedelta(days=day.weekday())
+    if period == "month":
+        return day.replace(day=1)
+    raise ValueError(f"Unknown period {period!r}")
+
+
+def next_period_start(period: str, start: date) -> date:
+    if period == "day":
+        return start + timedelta(days=1)
+    if period == "week":
+        return start + timedelta(days=7)
+    return (start.replace(day=28) + timedelta(days=4)).replace(day=1)
+
+
+def pace_bucket(pace: float) -> int:
+    return bisect.bisect_right(PACE_BUCKET_EDGES, pace)
+
+
+def _field(run, name: str):
+    return run[name] if isinstance(run, dict) else getattr(run, name)
+
+
+def run_day(started_at) -> date:
+    """UTC day of a run start; naive datetimes are already UTC, aware ones are converted"""
+    if not isinstance(started_at, datetime):
+        return started_at
+    if started_at.tzinfo is not None:
+        started_at = started_at.astimezone(timezone.utc).replace(tzinfo=None)
+    return started_at.date()
+
+
+def rollup_rows(runs: Iterable) -> List[dict]:
+    """
+    Rollup deltas of a batch of counted runs (Run objects or row dicts),
+    one row per user, period and period start, ready for
+    upsert_rollups_statement.
+    """
+    rows: Dict[tuple, dict] = {}
+    for run in runs:
+        day = run_day(_field(run, "started_at"))
+        distance_km = _field(run, "distance_km")
+        pace = _field(run, "avg_pace")
+        # Runs without a pace (no distance) count everywhere but the pace buckets
+        bucket = PACE_BUCKET_COLUMNS[pace_bucket(pace)] if pace > 0 else None
+        best = pace if distance_km >= BEST_PACE_MIN_KM and pace > 0 else None
+
+        for period in PERIODS:
+            key = (_field(run, "user_id"), period, period_start(period, day))
+            row = rows.get(key)
+            if row is None:
+                row = rows[key] = {
+                    "user_id": key[0], "period": period, "period_start": key[2],
+                    **{column: 0 for column in SUM_COLUMNS}, "best_pace": None,
+                }
+            row["distance_km"] += distance_km
+            row["duration_seconds"] += _field(run, "duration_seconds")
+            row["run_count"] += 1
+            if bucket is not None:
+                row[bucket] += 1
+            if best is not None and (row["best_pace"] is None or best < row["best_pace"]):
+                row["best_pace"] = best
+    # A fixed order keeps concurrent upserts from deadlocking
+    return [rows[key] for key in sorted(rows, key=lambda k: (str(k[0]), k[1], k[2]))]
+
+
+def upsert_rollups_statement(db, rows: List[dict]):
+    """INSERT adding the given deltas onto existing rollups in one statement"""
+    statement = dialect_insert(db, TrainingRollup).values(
+        [{**row, "updated_at": datetime.utcnow()} for row in rows]
+    )
+    excluded = statement.excluded
+    return statement.on_conflict_do_update(
+        index_elements=[TrainingRollup.user_id, TrainingRollup.period, TrainingRollup.period_start],
+        set_={
+            **{column: getattr(TrainingRollup, column) + getattr(excluded, column) for column in SUM_COLUMNS},
+            "best_pace": case(
+                (excluded.best_pace.is_(None), TrainingRollup.best_pace),
+                (TrainingRollup.best_pace.is_(None), excluded.best_pace),
+                (excluded.best_pace < TrainingRollup.best_pace, excluded.best_pace),
+                else_=TrainingRollup.best_pace
+            ),
+            "updated_at": excluded.updated_at,
+        }
+    )
+
+
+async def add_runs_to_rollups(db, runs: Iterable):
+    """Fold counted runs into their users' daily, weekly and monthly rollups, in the caller's transaction"""
+    rows = rollup_rows(runs)
+    if rows:
+        await db.execute(upsert_rollups_statement(db, rows))
+
+
+def range_pieces(start: date, end: date) -> List[Tuple[str, date, date]]:
+    """
+    Cover the days start..end (inclusive) with as few rollups as possible:
+    whole months, plus the days before the first and after the last of them.
+    Returns (period, first day, last day) pieces; the rollups of a piece
+    are those whose period_start falls between the two.
+    """
+    first_month = period_start("month", start)
+    if first_month < start:
+        first_month = next_period_start("month", first_month)
+    end_month = period_start("month", end + timedelta(days=1))  # first month not wholly inside
+
+    if first_month >= end_month:
+        return [("day", start, end)]
+    pieces = []
+    if start < first_month:
+        pieces.append(("day", start, first_month - timedelta(days=1)))
+    pieces.append(("month", first_month, end_month - timedelta(days=1)))
+    if end_month <= end:
+        pieces.append(("day", end_month, end))
+    return pieces
+
+
+def combine(rows: Iterable) -> dict:
+    """Totals of several rollup rows"""
+    totals = {column: 0 for column in SUM_COLUMNS}
+    totals["distance_km"] = 0.0
+    best_pace: Optional[float] = None
+    for row in rows:
+        for column in SUM_COLUMNS:
+            totals[column] += row[column]
+        if row["best_pace"] is not None and (best_pace is None or row["best_pace"] < best_pace):
+            best_pace = row["best_pace"]
+    totals["best_pace"] = best_pace
+    return totals
+
+
+def summary_values(totals: dict) -> dict:
+    """Rollup totals in the API's shape"""
+    distance_km = totals["distance_km"]
+    return {
+        "distance_km": round(distance_km, 3),
+        "duration_seconds": totals["duration_seconds"],
+        "run_count": totals["run_count"],
+        "avg_pace": (totals["duration_seconds"] / 60.0) / distance_km if distance_km > 0 else None,
+        "best_pace": totals["best_pace"],
+        "pace_distribution": [totals[column] for column in PACE_BUCKET_COLUMNS],
+    }
+
+
+ROLLUP_COLUMNS = [TrainingRollup.period, TrainingRollup.period_start, TrainingRollup.best_pace] + [
+    getattr(TrainingRollup, column) for column in SUM_COLUMNS
+]
+
+
+async def training_summary(db, user_id, period: str, start: date, end: date) -> dict:
+    """
+    A user's training between start and end (inclusive): exact totals from
+    whole-month and daily rollups, and one bucket per `period` overlapping
+    the range, empty periods included. Reads O(buckets) rows, never runs.
+    """
+    first = period_start(period, start)
+    series = {
+        row["period_start"]: row
+        for row in (await db.execute(
+            select(*ROLLUP_COLUMNS).where(
+                TrainingRollup.user_id == user_id,
+                TrainingRollup.period == period,
+                TrainingRollup.period_start.between(first, end)
+            )
+        )).mappings()
+    }
+
+    pieces = range_pieces(start, end)
+    total_rows = (await db.execute(
+        select(*ROLLUP_COLUMNS).where(
+            TrainingRollup.user_id == user_id,
+            or_(*[
+                and_(TrainingRollup.period == piece, TrainingRollup.period_start.between(low, high))
+                for piece, low, high in pieces
+            ])
+        )
+    )).mappings().all()
+
+    empty = combine([])
+    buckets = []
+    bucket_start = first
+    while bucket_start <= end:
+        row = series.get(bucket_start)
+        buckets.append({"period_start": bucket_start, **summary_values(combine([row]) if row else empty)})
+        bucket_start = next_period_start(period, bucket_start)
+
+    return {
+        "period": period,
+        "start": start,
+        "end": end,
+        "pace_bucket_edges": list(PACE_BUCKET_EDGES),
+        "totals": summary_values(combine(total_rows)),
+        "buckets": buckets,
+    }
+
+
+def bucket_count(period: str, start: date, end: date) -> int:
+    """Number of `period` buckets overlapping start..end"""
+    first = period_start(period, start)
+    if period == "day":
+        return (end - first).days + 1
+    if period == "week":
+        return (end - first).days // 7 + 1
+    return (end.year - first.year) * 12 + end.month - first.month + 1
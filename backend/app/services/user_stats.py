@@ -0,0 +1,62 @@
+from sqlalchemy import case, func, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.models.run import Run
+from app.services.run_validation import counted_runs
+from app.models.user import User
+from app.services.principal_cache import mark_user_changed
+
+
+async def add_run_to_user_stats(db: AsyncSession, user_id, distance_km: float, duration_seconds: int, runs: int = 1):
+    """
+    Fold run totals into the user's lifetime stats with one atomic UPDATE,
+    so concurrent uploads for the same user cannot lose increments.
+    Call it last before commit to keep the row lock short.
+    Returns the user's new total_distance_km and league_tier.
+    """
+    new_distance = User.total_distance_km + distance_km
+    new_duration = User.total_duration_seconds + duration_seconds
+
+    totals = (await db.execute(
+        update(User).where(User.id == user_id).values(
+            total_distance_km=new_distance,
+            total_duration_seconds=new_duration,
+            total_runs=User.total_runs + runs,
+            avg_pace=case(
+                (new_distance > 0, (new_duration / 60.0) / new_distance),
+                else_=User.avg_pace
+            )
+        ).returning(
+            User.total_distance_km, User.league_tier
+        ).execution_options(synchronize_session=False)
+    )).first()
+    mark_user_changed(db, user_id)
+    return totals
+
+
+def reconcile_user_stats_statement(user_ids=None):
+    """
+    UPDATE recomputing lifetime totals from the runs table, for all users
+    or the given ids. Runs rejected by validation are not counted.
+    """
+    counted = (Run.user_id == User.id, counted_runs(Run.validation_status))
+
+    def total(column, default):
+        return select(func.coalesce(func.sum(column), default)).where(*counted).scalar_subquery()
+
+    total_distance = total(Run.distance_km, 0.0)
+    total_duration = total(Run.duration_seconds, 0)
+    total_runs = select(func.count(Run.id)).where(*counted).scalar_subquery()
+
+    statement = update(User).values(
+        total_distance_km=total_distance,
+        total_duration_seconds=total_duration,
+        total_runs=total_runs,
+        avg_pace=case(
+            (total_distance > 0, (total_duration / 60.0) / total_distance),
+            else_=0.0
+        )
+    ).execution_options(synchronize_session=False)
+
+    if user_ids is not None:
+        statement = statement.where(User.id.in_(user_ids))
+    return statement
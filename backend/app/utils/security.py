@@ -1,3 +1,6 @@
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
 from typing import Optional
 from jose import JWTError, jwt
@@ -6,6 +9,76 @@ from app.config import settings
 
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 
+
+class PasswordHashPoolBusy(Exception):
+    """Raised when too many hash/verify calls are already queued"""
+
+
+class PasswordHashPool:
+    """
+    Bounded thread pool for bcrypt so hashing never blocks the event loop.
+    bcrypt releases the GIL, so threads hash in parallel.
+    """
+
+    def __init__(self, workers: int, max_pending: int):
+        self.workers = workers
+        self.max_pending = max_pending
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="bcrypt")
+
+        # Only touched from the event loop thread
+        self.pending = 0
+        self.completed = 0
+        self.rejected = 0
+        self.wait_seconds_total = 0.0
+        self.hash_seconds_total = 0.0
+        self.max_wait_seconds = 0.0
+
+    async def run(self, fn, *args):
+        """Run fn(*args) in the pool, or raise PasswordHashPoolBusy when saturated"""
+        if self.pending >= self.max_pending:
+            self.rejected += 1
+            raise PasswordHashPoolBusy()
+
+        self.pending += 1
+        submitted = time.perf_counter()
+
+        def timed():
+            started = time.perf_counter()
+            result = fn(*args)
+            return result, started - submitted, time.perf_counter() - started
+
+        try:
+            result, wait_seconds, hash_seconds = await asyncio.get_running_loop().run_in_executor(
+                self._executor, timed
+            )
+        finally:
+            self.pending -= 1
+
+        self.completed += 1
+        self.wait_seconds_total += wait_seconds
+        self.hash_seconds_total += hash_seconds
+        self.max_wait_seconds = max(self.max_wait_seconds, wait_seconds)
+        return result
+
+    def stats(self) -> dict:
+        """Pool counters, wait time (queued) versus hash time (on a worker)"""
+        return {
+            "workers": self.workers,
+            "max_pending": self.max_pending,
+            "pending": self.pending,
+            "completed": self.completed,
+            "rejected": self.rejected,
+            "wait_seconds_total": self.wait_seconds_total,
+            "hash_seconds_total": self.hash_seconds_total,
+            "max_wait_seconds": self.max_wait_seconds,
+        }
+
+
+password_hash_pool = PasswordHashPool(
+    settings.PASSWORD_HASH_WORKERS,
+    settings.PASSWORD_HASH_MAX_PENDING
+)
+
 def verify_password(plain_password: str, hashed_password: str) -> bool:
     """Verify a password against a hash"""
     return pwd_context.verify(plain_password, hashed_password)
@@ -14,6 +87,14 @@ def get_password_hash(password: str) -> str:
     """Hash a password"""
     return pwd_context.hash(password)
 
+async def verify_password_async(plain_password: str, hashed_password: str) -> bool:
+    """Verify a password on the hashing pool"""
+    return await password_hash_pool.run(verify_password, plain_password, hashed_password)
+
+async def get_password_hash_async(password: str) -> str:
+    """Hash a password on the hashing pool"""
+    return await password_hash_pool.run(get_password_hash, password)
+
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -> str:
     """Create JWT access token"""
     to_encode = data.copy()
@@ -0,0 +1,100 @@
+"""
+Micro-benchmarks for the GPS, route codec, validation, heatmap and
+response serialization paths. Every case is timed per call and reported as
+p50/p95/p99 latency and calls per second, and saved as JSON.
+
+Run from the backend directory:
+    python -m benchmarks.bench_micro [--min-time 0.5] [--filter gps] [--output FILE]
+"""
+import argparse
+import time
+import uuid
+from datetime import datetime
+from typing import Callable, Dict, List
+from pydantic import TypeAdapter
+from app.schemas.run import RunResponse, RunRouteResponse
+from app.services.gps_calculator import GPSCalculator
+from app.services.heatmap import rasterize_route
+from app.services.personal_records import compute_best_efforts
+from app.services.route_codec import RouteCodec
+from app.services.run_validation import validate_run, validate_runs
+from benchmarks.results import print_table, save, summarize
+from benchmarks.synthetic import make_route
+
+PAGE_SIZE = 20
+MIN_CALLS = 20
+MAX_CALLS = 100_000
+
+
+def measure(fn: Callable, min_time: float) -> dict:
+    """Time calls to `fn` one by one for at least `min_time` seconds"""
+    for _ in range(3):
+        fn()
+    samples = []
+    started = time.perf_counter()
+    while len(samples) < MAX_CALLS:
+        start = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - start)
+        if len(samples) >= MIN_CALLS and time.perf_counter() - started >= min_time:
+            break
+    return summarize(samples)
+
+
+def run_rows(points: int) -> List[dict]:
+    """One page of run rows as the history endpoint selects them"""
+    now = datetime(2026, 1, 1, 7, 0)
+    polyline = RouteCodec.encode(make_route(points)[0])
+    return [{
+        "id": uuid.uuid4(), "user_id": uuid.uuid4(), "distance_km": 5.0, "duration_seconds": 1800,
+        "avg_pace": 6.0, "avg_speed": 10.0, "calories_burned": 350.0, "started_at": now,
+        "completed_at": now, "source": "app", "validation_status": "ok", "route_polyline": polyline,
+    } for _ in range(PAGE_SIZE)]
+
+
+def cases() -> Dict[str, Callable]:
+    route_1k, _ = make_route(1_000)
+    route_20k, times_20k = make_route(20_000)
+    polyline_20k = RouteCodec.encode(route_20k)
+    route_points = [tuple(p) for p in route_1k.tolist()]
+    batch = [make_route(2_000, seed)[0] for seed in range(50)]
+
+    run_list = TypeAdapter(List[RunResponse])
+    run_route_list = TypeAdapter(List[RunRouteResponse])
+    page = run_rows(0)
+    page_preview = run_rows(1_000)
+
+    return {
+        "gps.haversine_distance": lambda: GPSCalculator.haversine_distance(37.5, 127.0, 37.501, 127.001),
+        "gps.total_distance.list_1k": lambda: GPSCalculator.calculate_total_distance(route_points),
+        "gps.total_distance.20k": lambda: GPSCalculator.calculate_total_distance(route_20k),
+        "gps.route_metrics.20k": lambda: GPSCalculator.calculate_route_metrics(route_20k, times_20k),
+        "codec.encode.20k": lambda: RouteCodec.encode(route_20k),
+        "codec.decode.20k": lambda: RouteCodec.decode(polyline_20k),
+        "codec.encode_levels.20k": lambda: RouteCodec.encode_levels(route_20k),
+        "validation.run.20k": lambda: validate_run(route_20k, 20_000, times=times_20k),
+        "validation.batch_50x2k": lambda: validate_runs(batch, [2_000] * len(batch)),
+        "records.best_efforts.20k": lambda: compute_best_efforts(route_20k, times_20k),
+        "heatmap.rasterize.20k": lambda: rasterize_route(route_20k, range(10, 17)),
+        "serialize.run_page": lambda: run_list.dump_json(run_list.validate_python(page)),
+        "serialize.run_page_preview": lambda: run_route_list.dump_json(run_route_list.validate_python(page_preview)),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--min-time", type=float, default=0.5, help="seconds spent timing each case")
+    parser.add_argument("--filter", default="", help="only cases whose name contains this")
+    parser.add_argument("--output", help="JSON results path (default benchmarks/results/micro-<commit>.json)")
+    args = parser.parse_args()
+
+    results = {}
+    for name, fn in cases().items():
+        if args.filter in name:
+            results[name] = measure(fn, args.min_time)
+    print_table(results)
+    print(f"saved {save('micro', results, {'min_time': args.min_time, 'page_size': PAGE_SIZE}, args.output)}")
+
+
+if __name__ == "__main__":
+    main()
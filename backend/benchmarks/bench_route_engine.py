@@ -0,0 +1,62 @@
+"""
+Benchmark the vectorized RouteEngine against the per-segment Python loop.
+
+Run from the backend directory:
+    python -m benchmarks.bench_route_engine
+"""
+import time
+import numpy as np
+from app.services.gps_calculator import GPSCalculator
+from app.services.route_engine import RouteEngine
+
+SIZES = [1_000, 10_000, 100_000]
+REPEATS = 5
+
+
+def synthetic_route(n: int, seed: int = 0) -> np.ndarray:
+    """Random-walk route around Seoul sampled at roughly 1 Hz running speed"""
+    rng = np.random.default_rng(seed)
+    steps = rng.normal(0, 2e-5, size=(n, 2))
+    return np.array([37.5665, 126.9780]) + np.cumsum(steps, axis=0)
+
+
+def loop_total_distance(route) -> float:
+    """The original pure-Python implementation of calculate_total_distance"""
+    total_distance = 0.0
+    for i in range(len(route) - 1):
+        lat1, lon1 = route[i]
+        lat2, lon2 = route[i + 1]
+        total_distance += GPSCalculator.haversine_distance(lat1, lon1, lat2, lon2)
+    return total_distance
+
+
+def best_of(fn, *args) -> float:
+    """Best wall-clock time in seconds over REPEATS runs"""
+    best = float("inf")
+    for _ in range(REPEATS):
+        start = time.perf_counter()
+        fn(*args)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    print(f"{'points':>10} {'loop ms':>10} {'engine ms':>10} {'batch ms':>10} {'speedup':>8}")
+    for n in SIZES:
+        coords = synthetic_route(n)
+        route = [tuple(p) for p in coords.tolist()]
+
+        assert abs(loop_total_distance(route) - RouteEngine.total_distance(coords)) < 1e-6
+
+        loop_s = best_of(loop_total_distance, route)
+        engine_s = best_of(RouteEngine.compute, coords, None, n - 1)
+        # Ten routes of n / 10 points each in one pass
+        batch = np.array_split(coords, 10)
+        batch_s = best_of(RouteEngine.compute_batch, batch, None, [len(r) - 1 for r in batch])
+
+        print(f"{n:>10} {loop_s * 1e3:>10.2f} {engine_s * 1e3:>10.2f} "
+              f"{batch_s * 1e3:>10.2f} {loop_s / engine_s:>7.0f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,51 @@
+"""
+Simplify a 10k-point route into the stored levels of detail and compare
+payload size and client decode time against the full route.
+
+Run from the backend directory:
+    python -m benchmarks.bench_route_simplify
+"""
+import time
+import numpy as np
+from app.services.route_codec import RouteCodec, ROUTE_LEVELS
+
+POINTS = 10_000
+REPEATS = 50
+
+
+def make_route(n: int) -> np.ndarray:
+    """A winding ~20 km run sampled every ~2 m with GPS jitter"""
+    rng = np.random.default_rng(0)
+    heading = np.cumsum(rng.normal(0, 0.05, n))
+    step = 2.0 / 111_320  # ~2 m in degrees
+    lat = 37.5 + np.cumsum(np.sin(heading) * step) + rng.normal(0, 1e-5, n)
+    lng = 127.0 + np.cumsum(np.cos(heading) * step) + rng.normal(0, 1e-5, n)
+    return np.column_stack((lat, lng))
+
+
+def timed(fn, repeats: int = REPEATS) -> float:
+    start = time.perf_counter()
+    for _ in range(repeats):
+        fn()
+    return (time.perf_counter() - start) / repeats
+
+
+def main():
+    route = make_route(POINTS)
+    full = RouteCodec.encode(route)
+
+    ingest_s = timed(lambda: RouteCodec.encode_levels(route))
+    levels = RouteCodec.encode_levels(route)
+    print(f"simplified {POINTS} points into {len(ROUTE_LEVELS)} levels in {ingest_s * 1e3:.1f}ms")
+
+    full_decode_s = timed(lambda: RouteCodec.decode(full))
+    print(f"{'full':<10} {POINTS:>6} points {len(full):>7} bytes  decode {full_decode_s * 1e6:8.1f}us")
+    for level, polyline in levels.items():
+        decode_s = timed(lambda: RouteCodec.decode(polyline))
+        points = len(RouteCodec.decode(polyline))
+        print(f"{level:<10} {points:>6} points {len(polyline):>7} bytes  decode {decode_s * 1e6:8.1f}us  "
+              f"({len(full) / len(polyline):.0f}x smaller)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,56 @@
+"""
+Validate 20k-point runs one at a time and as one batch, and check that a
+route with a driven section is caught.
+
+Run from the backend directory:
+    python -m benchmarks.bench_run_validation
+"""
+import time
+import numpy as np
+from app.services.run_validation import validate_run, validate_runs
+
+POINTS = 20_000
+BATCH = 100
+REPEATS = 20
+
+
+def make_route(n: int, seed: int = 0, driven: slice = None) -> tuple:
+    """A winding run sampled every second at ~11 km/h with GPS jitter; returns (route, times)"""
+    rng = np.random.default_rng(seed)
+    heading = np.cumsum(rng.normal(0, 0.05, n))
+    step = np.full(n, 3.0)  # meters per second
+    if driven is not None:
+        step[driven] = 12.0  # ~43 km/h
+    step = step / 111_320
+    lat = 37.5 + np.cumsum(np.sin(heading) * step) + rng.normal(0, 5e-6, n)
+    lng = 127.0 + np.cumsum(np.cos(heading) * step) + rng.normal(0, 5e-6, n)
+    return np.column_stack((lat, lng)), np.arange(n, dtype=np.float64)
+
+
+def timed(fn, repeats: int = REPEATS) -> float:
+    start = time.perf_counter()
+    for _ in range(repeats):
+        fn()
+    return (time.perf_counter() - start) / repeats
+
+
+def main():
+    route, times = make_route(POINTS)
+    verdict = validate_run(route, POINTS - 1, times=times)
+    print(f"clean run: {verdict.status} {verdict.flags}, {verdict.distance_km} km, max {verdict.max_speed_kmh} km/h")
+
+    driven, driven_times = make_route(POINTS, driven=slice(5000, 7000))
+    verdict = validate_run(driven, POINTS - 1, times=driven_times)
+    print(f"driven run: {verdict.status} {verdict.flags}, {verdict.vehicle_km} km vehicle-like")
+
+    single_s = timed(lambda: validate_run(route, POINTS - 1, times=times))
+    print(f"single {POINTS}-point run: {single_s * 1e3:.2f}ms")
+
+    routes = [make_route(POINTS, seed)[0] for seed in range(BATCH)]
+    durations = [POINTS - 1] * BATCH
+    batch_s = timed(lambda: validate_runs(routes, durations), repeats=3)
+    print(f"batch of {BATCH} x {POINTS}-point runs: {batch_s * 1e3:.0f}ms, {batch_s / BATCH * 1e3:.2f}ms per run")
+
+
+if __name__ == "__main__":
+    main()
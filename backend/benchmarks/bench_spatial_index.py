@@ -0,0 +1,68 @@
+"""
+Radius queries over a few million synthetic run start points: cell-range
+filtering plus exact refinement against a full-scan haversine baseline.
+
+Run from the backend directory:
+    python -m benchmarks.bench_spatial_index [--runs 3000000]
+"""
+import argparse
+import time
+import numpy as np
+from app.services.gps_calculator import GPSCalculator
+from app.services.spatial_index import SpatialIndex, cover_ranges
+
+QUERIES = 200
+RADII_KM = [0.5, 2.0, 10.0]
+# Start points cluster around a few cities: (lat, lng, spread in degrees)
+CITIES = [(37.55, 126.98, 0.15), (35.18, 129.07, 0.10), (40.71, -74.00, 0.20), (51.51, -0.13, 0.15), (-33.87, 151.21, 0.12)]
+
+
+def synthetic_starts(n: int, rng) -> tuple:
+    city = rng.integers(len(CITIES), size=n)
+    centers = np.array(CITIES)[city]
+    lats = centers[:, 0] + rng.normal(0, 1, n) * centers[:, 2]
+    lngs = centers[:, 1] + rng.normal(0, 1, n) * centers[:, 2]
+    return lats, lngs
+
+
+def percentiles(samples) -> str:
+    p50, p95, p99 = np.percentile(np.asarray(samples) * 1e3, [50, 95, 99])
+    return f"p50 {p50:7.2f}ms  p95 {p95:7.2f}ms  p99 {p99:7.2f}ms"
+
+
+def main(runs: int):
+    rng = np.random.default_rng(0)
+    lats, lngs = synthetic_starts(runs, rng)
+
+    index = SpatialIndex()
+    start = time.perf_counter()
+    index.bulk_load(np.arange(runs), lats, lngs)
+    print(f"indexed {runs} start points in {time.perf_counter() - start:.2f}s")
+
+    query_lats, query_lngs = synthetic_starts(QUERIES, rng)
+    for radius in RADII_KM:
+        indexed, scanned, candidates, found = [], [], 0, 0
+        for lat, lng in zip(query_lats, query_lngs):
+            start = time.perf_counter()
+            hits = index.query(lat, lng, radius)
+            indexed.append(time.perf_counter() - start)
+            found += len(hits.ids)
+            candidates += len(index.candidates(lat, lng, radius))
+
+            if len(scanned) < 20:
+                start = time.perf_counter()
+                distances = GPSCalculator.distances_from(lat, lng, lats, lngs)
+                np.flatnonzero(distances <= radius)
+                scanned.append(time.perf_counter() - start)
+
+        ranges = np.mean([len(cover_ranges(lat, lng, radius)) for lat, lng in zip(query_lats, query_lngs)])
+        print(f"radius {radius:5.1f}km: {found / QUERIES:9.0f} hits from {candidates / QUERIES:9.0f} candidates "
+              f"in {ranges:.1f} cell ranges")
+        print(f"    cell index  {percentiles(indexed)}")
+        print(f"    full scan   {percentiles(scanned)}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--runs", type=int, default=3_000_000)
+    main(parser.parse_args().runs)
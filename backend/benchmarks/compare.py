@@ -0,0 +1,61 @@
+"""
+Compare two benchmark result files from benchmarks/results (micro or
+load) and flag cases whose latency regressed. Exits with status 1 when
+any case's chosen percentile got slower by more than --threshold.
+
+Run from the backend directory:
+    python -m benchmarks.compare BASE.json NEW.json [--metric p95_ms] [--threshold 0.1]
+"""
+import argparse
+import json
+import sys
+
+METRICS = ["p50_ms", "p95_ms", "p99_ms", "mean_ms"]
+
+
+def load(path: str) -> dict:
+    with open(path) as f:
+        return json.load(f)
+
+
+def compare(base: dict, new: dict, metric: str, threshold: float) -> list:
+    """(case, base value, new value, relative change, regressed) for cases in both files"""
+    rows = []
+    for case, stats in new["results"].items():
+        before = base["results"].get(case, {}).get(metric)
+        after = stats.get(metric)
+        if before is None or after is None:
+            continue
+        change = (after - before) / before if before > 0 else 0.0
+        rows.append((case, before, after, change, change > threshold))
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("base")
+    parser.add_argument("new")
+    parser.add_argument("--metric", choices=METRICS, default="p95_ms")
+    parser.add_argument("--threshold", type=float, default=0.1, help="relative slowdown counted as a regression")
+    args = parser.parse_args()
+
+    base, new = load(args.base), load(args.new)
+    if base.get("suite") != new.get("suite"):
+        sys.exit(f"cannot compare a {base.get('suite')} run with a {new.get('suite')} run")
+
+    print(f"{base['suite']}: {base['environment'].get('commit')} -> {new['environment'].get('commit')} ({args.metric})")
+    rows = compare(base, new, args.metric, args.threshold)
+    for case, before, after, change, regressed in rows:
+        marker = "REGRESSED" if regressed else ""
+        print(f"{case:<36} {before:>10.3f} {after:>10.3f} {change:>+8.1%}  {marker}")
+
+    missing = sorted(set(base["results"]) - set(new["results"]))
+    if missing:
+        print(f"not in new run: {', '.join(missing)}")
+    regressions = sum(row[4] for row in rows)
+    print(f"{regressions} of {len(rows)} cases regressed by more than {args.threshold:.0%}")
+    sys.exit(1 if regressions else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,202 @@
+"""
+Load harness for the API. Drives the FastAPI app in-process over ASGI
+with synthetic users and routes, one endpoint at a time, and reports
+p50/p95/p99 latency and throughput per endpoint, saved as JSON.
+
+Runs against a fresh SQLite file by default; pass --database-url to use a
+local Postgres (the harness writes synthetic users and runs to it).
+
+Run from the backend directory:
+    python -m benchmarks.load_api [--users 20] [--requests 200] [--concurrency 16]
+        [--points 1000] [--scenarios login,runs_create] [--database-url URL] [--output FILE]
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import tempfile
+import time
+import uuid
+from typing import Callable, Dict, List, Optional
+
+SCENARIOS = [
+    "login", "runs_create", "runs_list", "runs_list_route", "run_detail",
+    "leaderboard", "leaderboard_me", "records", "nearby",
+]
+
+
+def configure(database_url: Optional[str]) -> str:
+    """Point the app at the benchmark database before it is imported"""
+    if database_url is None:
+        path = os.path.join(tempfile.mkdtemp(prefix="leagueofrun-bench-"), "bench.db")
+        database_url = f"sqlite:///{path}"
+    os.environ["DATABASE_URL"] = database_url
+    os.environ.setdefault("REDIS_URL", "")
+    os.environ.setdefault("SECRET_KEY", "benchmark-secret")
+    return database_url
+
+
+class LoadRunner:
+    """Sends requests to the in-process app and records per-endpoint latency"""
+
+    def __init__(self, client, concurrency: int):
+        self.client = client
+        self.concurrency = concurrency
+        self.results: Dict[str, dict] = {}
+
+    async def phase(self, name: str, total: int, request: Callable[[int], tuple],
+                    on_response: Callable = None) -> List:
+        """
+        Send `total` requests built by `request(i)` -> (method, url, kwargs)
+        from `concurrency` workers; returns the successful responses.
+        """
+        from benchmarks.results import summarize
+
+        samples, responses = [], []
+        errors = 0
+        next_index = iter(range(total))
+
+        async def worker():
+            nonlocal errors
+            for i in next_index:
+                method, url, kwargs = request(i)
+                start = time.perf_counter()
+                response = await self.client.request(method, url, **kwargs)
+                elapsed = time.perf_counter() - start
+                if response.status_code >= 400:
+                    errors += 1
+                    continue
+                samples.append(elapsed)
+                responses.append(response)
+                if on_response is not None:
+                    on_response(i, response)
+
+        started = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(self.concurrency)))
+        self.results[name] = summarize(samples, time.perf_counter() - started, errors)
+        print(f"{name}: {len(samples)} ok, {errors} errors")
+        return responses
+
+
+async def run_load(args) -> Dict[str, dict]:
+    import httpx
+    from app.main import app
+    from benchmarks.synthetic import ORIGIN, run_payload, user_payload
+
+    tag = uuid.uuid4().hex[:8]
+    rng = random.Random(0)
+    scenarios = args.scenarios.split(",") if args.scenarios else SCENARIOS
+
+    async with app.router.lifespan_context(app):
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=120) as client:
+            runner = LoadRunner(client, args.concurrency)
+
+            # Synthetic users; registration is measured too
+            users = [user_payload(i, tag) for i in range(args.users)]
+            tokens = {}
+            await runner.phase(
+                "POST /auth/register", args.users,
+                lambda i: ("POST", "/api/v1/auth/register", {"json": users[i]}),
+                lambda i, response: tokens.__setitem__(i, response.json()["access_token"])
+            )
+            if not tokens:
+                raise SystemExit("no users could be registered")
+            user_ids = sorted(tokens)
+
+            def auth(i: int) -> dict:
+                return {"Authorization": f"Bearer {tokens[user_ids[i % len(user_ids)]]}"}
+
+            # Pre-serialized run bodies so client-side JSON work is not timed
+            bodies = [
+                json.dumps(run_payload(args.points, seed, origin=ORIGIN)).encode()
+                for seed in range(min(args.requests, 50))
+            ]
+            run_ids = []
+
+            def create_run(i: int) -> tuple:
+                return ("POST", "/api/v1/runs", {
+                    "content": bodies[i % len(bodies)],
+                    "headers": {**auth(i), "Content-Type": "application/json"},
+                })
+
+            # Runs are needed by the read scenarios even when creation is not measured
+            if "runs_create" in scenarios:
+                await runner.phase("POST /runs", args.requests, create_run,
+                                   lambda i, response: run_ids.append((i, response.json()["id"])))
+            else:
+                await LoadRunner(client, args.concurrency).phase(
+                    "setup runs", len(user_ids) * 2, create_run,
+                    lambda i, response: run_ids.append((i, response.json()["id"]))
+                )
+
+            requests = {
+                "login": ("POST /auth/login", lambda i: ("POST", "/api/v1/auth/login", {"json": {
+                    "email": users[user_ids[i % len(user_ids)]]["email"],
+                    "password": users[user_ids[i % len(user_ids)]]["password"],
+                }})),
+                "runs_list": ("GET /runs", lambda i: ("GET", "/api/v1/runs?limit=20", {"headers": auth(i)})),
+                "runs_list_route": ("GET /runs?include=route", lambda i: (
+                    "GET", "/api/v1/runs?limit=20&include=route&resolution=preview", {"headers": auth(i)}
+                )),
+                "run_detail": ("GET /runs/{id}", lambda i: (lambda owner, run_id: (
+                    "GET", f"/api/v1/runs/{run_id}?include=route", {"headers": auth(owner)}
+                ))(*run_ids[i % len(run_ids)])),
+                "leaderboard": ("GET /leaderboards/{metric}", lambda i: (
+                    "GET", "/api/v1/leaderboards/distance?limit=50", {"headers": auth(i)}
+                )),
+                "leaderboard_me": ("GET /leaderboards/{metric}/me", lambda i: (
+                    "GET", "/api/v1/leaderboards/distance/me", {"headers": auth(i)}
+                )),
+                "records": ("GET /records", lambda i: ("GET", "/api/v1/records", {"headers": auth(i)})),
+                "nearby": ("GET /explore/runs/nearby", lambda i: (
+                    "GET",
+                    f"/api/v1/explore/runs/nearby?lat={ORIGIN[0] + rng.uniform(-0.02, 0.02):.5f}"
+                    f"&lng={ORIGIN[1] + rng.uniform(-0.02, 0.02):.5f}&radius_km=2",
+                    {"headers": auth(i)}
+                )),
+            }
+            for scenario in scenarios:
+                if scenario == "runs_create":
+                    continue
+                if scenario not in requests:
+                    raise SystemExit(f"unknown scenario {scenario}, expected one of: {', '.join(SCENARIOS)}")
+                if scenario == "run_detail" and not run_ids:
+                    continue
+                name, request = requests[scenario]
+                # Password checks are far slower than the rest; keep their phase short
+                total = min(args.requests, args.users * 5) if scenario == "login" else args.requests
+                await runner.phase(name, total, request)
+
+    return runner.results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=20)
+    parser.add_argument("--requests", type=int, default=200, help="requests per scenario")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--points", type=int, default=1000, help="route points per synthetic run")
+    parser.add_argument("--scenarios", default="", help=f"comma-separated subset of: {', '.join(SCENARIOS)}")
+    parser.add_argument("--database-url", help="sync database URL (default: a fresh SQLite file)")
+    parser.add_argument("--output", help="JSON results path (default benchmarks/results/load-<commit>.json)")
+    args = parser.parse_args()
+
+    database_url = configure(args.database_url)
+    results = asyncio.run(run_load(args))
+
+    from benchmarks.results import print_table, save
+    print_table(results)
+    config = {
+        "database": database_url.split(":", 1)[0],
+        "users": args.users,
+        "requests": args.requests,
+        "concurrency": args.concurrency,
+        "points": args.points,
+    }
+    print(f"saved {save('load', results, config, args.output)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+"""
+Latency summaries and machine-readable result files shared by the
+benchmark suites, so runs on different commits can be compared with
+python -m benchmarks.compare.
+"""
+import json
+import os
+import platform
+import subprocess
+import sys
+from datetime import datetime, timezone
+from typing import Dict, Optional, Sequence
+import numpy as np
+
+RESULTS_DIR = os.path.join(os.path.dirname(__file__), "results")
+
+
+def summarize(samples_s: Sequence[float], wall_s: Optional[float] = None, errors: int = 0) -> dict:
+    """Latency percentiles in milliseconds and throughput for one case"""
+    samples = np.asarray(samples_s, dtype=np.float64) * 1e3
+    if not len(samples):
+        return {"count": 0, "errors": errors}
+    p50, p95, p99 = np.percentile(samples, [50, 95, 99])
+    wall_s = wall_s if wall_s is not None else samples.sum() / 1e3
+    return {
+        "count": int(len(samples)),
+        "errors": errors,
+        "mean_ms": round(float(samples.mean()), 4),
+        "p50_ms": round(float(p50), 4),
+        "p95_ms": round(float(p95), 4),
+        "p99_ms": round(float(p99), 4),
+        "max_ms": round(float(samples.max()), 4),
+        "throughput_per_s": round(len(samples) / wall_s, 2) if wall_s > 0 else None,
+    }
+
+
+def _git(*args) -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", *args], capture_output=True, text=True, check=True,
+            cwd=os.path.dirname(__file__)
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def environment() -> dict:
+    """Commit and machine the results were taken on"""
+    return {
+        "commit": _git("rev-parse", "--short", "HEAD"),
+        "dirty": bool(_git("status", "--porcelain", "--untracked-files=no")),
+        "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "python": sys.version.split()[0],
+        "numpy": np.__version__,
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+    }
+
+
+def print_table(results: Dict[str, dict]):
+    print(f"{'case':<36} {'count':>7} {'p50 ms':>10} {'p95 ms':>10} {'p99 ms':>10} {'per s':>10} {'errors':>7}")
+    for name, stats in results.items():
+        if not stats.get("count"):
+            print(f"{name:<36} {0:>7} {'-':>10} {'-':>10} {'-':>10} {'-':>10} {stats.get('errors', 0):>7}")
+            continue
+        print(f"{name:<36} {stats['count']:>7} {stats['p50_ms']:>10.3f} {stats['p95_ms']:>10.3f} "
+              f"{stats['p99_ms']:>10.3f} {stats['throughput_per_s'] or 0:>10.1f} {stats['errors']:>7}")
+
+
+def save(suite: str, results: Dict[str, dict], config: dict, output: Optional[str] = None) -> str:
+    """Write one suite's results as JSON; defaults to benchmarks/results/<suite>-<commit>.json"""
+    env = environment()
+    if output is None:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        output = os.path.join(RESULTS_DIR, f"{suite}-{env['commit'] or 'unknown'}.json")
+    with open(output, "w") as f:
+        json.dump({"suite": suite, "environment": env, "config": config, "results": results}, f, indent=2)
+    return output
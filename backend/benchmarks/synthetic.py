@@ -0,0 +1,49 @@
+"""Synthetic routes, runs and users for the benchmark suites"""
+import math
+from datetime import datetime, timedelta
+import numpy as np
+
+ORIGIN = (37.5665, 126.9780)  # Seoul
+METERS_PER_DEGREE = 111_320
+
+
+def make_route(n: int, seed: int = 0, speed_mps: float = 3.0, origin=ORIGIN) -> tuple:
+    """
+    A winding run sampled every second at `speed_mps` with ~1 m of GPS
+    jitter; returns an (n, 2) route and its per-point seconds.
+    """
+    rng = np.random.default_rng(seed)
+    heading = rng.uniform(0, 2 * math.pi) + np.cumsum(rng.normal(0, 0.05, n))
+    step = speed_mps / METERS_PER_DEGREE
+    lat = origin[0] + np.cumsum(np.sin(heading) * step) + rng.normal(0, 1e-5, n)
+    lng = origin[1] + np.cumsum(np.cos(heading) * step) / math.cos(math.radians(origin[0])) + rng.normal(0, 1e-5, n)
+    return np.column_stack((lat, lng)), np.arange(n, dtype=np.float64)
+
+
+def run_payload(points: int, seed: int = 0, start: datetime = None, origin=ORIGIN) -> dict:
+    """POST /runs body for a synthetic run that passes validation"""
+    from app.services.gps_calculator import GPSCalculator
+
+    route, times = make_route(points, seed, origin=origin)
+    distance_km = GPSCalculator.calculate_total_distance(route)
+    duration_seconds = int(times[-1]) if points > 1 else 1
+    start = start or datetime(2026, 1, 1, 7, 0) + timedelta(hours=seed)
+    return {
+        "distance_km": round(distance_km, 3),
+        "duration_seconds": duration_seconds,
+        "avg_pace": GPSCalculator.calculate_pace(distance_km, duration_seconds),
+        "avg_speed": GPSCalculator.calculate_speed(distance_km, duration_seconds),
+        "route": [{"lat": lat, "lng": lng, "t": t} for (lat, lng), t in zip(route.tolist(), times.tolist())],
+        "start_time": start.isoformat(),
+        "end_time": (start + timedelta(seconds=duration_seconds)).isoformat(),
+    }
+
+
+def user_payload(i: int, tag: str) -> dict:
+    """POST /auth/register body for synthetic user `i`"""
+    return {
+        "email": f"bench-{tag}-{i}@example.com",
+        "username": f"bench_{tag}_{i}",
+        "password": f"bench-password-{i}",
+        "full_name": f"Bench User {i}",
+    }
@@ -0,0 +1,81 @@
+"""
+Compute best efforts for every stored run and fold them into
+personal_records. Runs are read in keyset batches and their routes are
+decoded and scanned in a pool of worker processes, one per core by default.
+
+Run from the backend directory:
+    python -m scripts.backfill_personal_records [--batch-size 500] [--workers N]
+"""
+import argparse
+import os
+from concurrent.futures import ProcessPoolExecutor
+from sqlalchemy import select
+from app.database import SessionLocal
+from app.models.run import Run
+from app.services.run_validation import counted_runs
+from app.services.personal_records import (
+    compute_best_efforts,
+    fastest_per_effort,
+    personal_record_rows,
+    upsert_personal_records_statement,
+)
+from app.services.route_codec import RouteCodec
+
+
+def efforts_for_runs(runs: list) -> list:
+    """Worker: personal record rows for a batch of (id, user_id, route, duration, completed_at)"""
+    rows = []
+    for run_id, user_id, route_polyline, duration_seconds, completed_at in runs:
+        efforts = compute_best_efforts(RouteCodec.decode_stored(route_polyline), duration_seconds=duration_seconds)
+        rows += personal_record_rows(user_id, run_id, efforts, completed_at)
+    return rows
+
+
+def backfill(batch_size: int = 500, workers: int = None) -> int:
+    """Returns the number of runs processed"""
+    processed = 0
+    last_id = None
+    in_flight = []
+
+    with SessionLocal() as db, ProcessPoolExecutor(max_workers=workers) as pool:
+        max_in_flight = 2 * (workers or os.cpu_count() or 1)
+
+        def apply(future):
+            rows = fastest_per_effort(future.result())
+            if rows:
+                db.execute(upsert_personal_records_statement(db, rows))
+                db.commit()
+
+        while True:
+            query = select(
+                Run.id, Run.user_id, Run.route_polyline, Run.duration_seconds, Run.completed_at
+            ).where(
+                counted_runs(Run.validation_status)
+            ).order_by(Run.id).limit(batch_size)
+            if last_id is not None:
+                query = query.where(Run.id > last_id)
+
+            runs = [tuple(row) for row in db.execute(query).all()]
+            if not runs:
+                break
+            last_id = runs[-1][0]
+
+            in_flight.append(pool.submit(efforts_for_runs, runs))
+            if len(in_flight) >= max_in_flight:
+                apply(in_flight.pop(0))
+
+            processed += len(runs)
+            print(f"processed {processed} runs")
+
+        for future in in_flight:
+            apply(future)
+
+    return processed
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--batch-size", type=int, default=500)
+    parser.add_argument("--workers", type=int, default=None)
+    args = parser.parse_args()
+    backfill(args.batch_size, args.workers)
@@ -0,0 +1,138 @@
+"""
+Rebuild the heatmap tiles from every counted run into a new tile
+generation, swapped in atomically when complete; the live heatmap keeps
+being served and updated meanwhile. Runs are read in keyset batches and
+rasterized in a process pool; the partial tile counts are merged every
+--flush-tiles tiles.
+
+The new generation gets a fence --fence-seconds ahead, long enough for every
+API worker to notice the build (they re-read generations each
+HEATMAP_FLUSH_SECONDS). Runs created up to the fence are counted here, and
+later ones by the API workers, so none is missed or counted twice. Run one
+build at a time; an interrupted build is discarded by the next one.
+
+Run from the backend directory:
+    python -m scripts.build_heatmap [--batch-size 500] [--workers 4] [--flush-tiles 5000] [--fence-seconds 30]
+"""
+import argparse
+import os
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from datetime import datetime, timedelta
+from sqlalchemy import delete, func, select, update
+from app.config import settings
+from app.database import SessionLocal
+from app.models.heatmap_tile import HeatmapGeneration, HeatmapTile
+from app.models.run import Run
+from app.services.heatmap import TileDeltas, generation_state, merge_tiles, rasterize_polylines
+
+# Slack for runs created just before the fence but committed after it
+COMMIT_GRACE = timedelta(seconds=10)
+
+
+def rasterize_runs(db, pool, workers: int, generation: int, batch_size: int, flush_tiles: int,
+                   created_after, created_until) -> tuple:
+    """Count runs created in (created_after, created_until] into a generation; returns (runs, tiles written)"""
+    zooms = list(range(settings.HEATMAP_MIN_ZOOM, settings.HEATMAP_MAX_ZOOM + 1))
+    deltas = TileDeltas()
+    runs = 0
+    tiles = 0
+    last_id = None
+
+    def collect(done):
+        nonlocal tiles
+        for future in done:
+            deltas.add_sparse(future.result())
+        if len(deltas) >= flush_tiles:
+            tiles += merge_tiles(db, deltas.grids, generation)
+            deltas.grids.clear()
+
+    pending = set()
+    while True:
+        # Pending runs are included: the run finalizer only adds them to a
+        # generation whose fence they were created after
+        query = select(Run.id, Run.route_polyline).where(
+            Run.validation_status.is_distinct_from('rejected'),
+            Run.created_at <= created_until
+        ).order_by(Run.id).limit(batch_size)
+        if created_after is not None:
+            query = query.where(Run.created_at > created_after)
+        if last_id is not None:
+            query = query.where(Run.id > last_id)
+
+        rows = db.execute(query).all()
+        if not rows:
+            break
+        last_id = rows[-1].id
+
+        pending.add(pool.submit(rasterize_polylines, [row.route_polyline for row in rows], zooms))
+        runs += len(rows)
+        # Keep every worker busy without reading the whole table ahead
+        if len(pending) >= 2 * workers:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            collect(done)
+            print(f"rasterized {runs} runs, {tiles} tiles written")
+
+    collect(pending)
+    if deltas:
+        tiles += merge_tiles(db, deltas.grids, generation)
+    return runs, tiles
+
+
+def build(batch_size: int = 500, workers: int = None, flush_tiles: int = 5000, fence_seconds: float = None) -> int:
+    """Returns the number of runs rasterized"""
+    workers = workers or os.cpu_count() or 1
+    fence_seconds = fence_seconds or max(3 * settings.HEATMAP_FLUSH_SECONDS, 30)
+
+    with SessionLocal() as db, ProcessPoolExecutor(max_workers=workers) as pool:
+        # Leftovers of an interrupted build
+        abandoned = db.scalars(select(HeatmapGeneration.generation).where(HeatmapGeneration.status == 'building')).all()
+        if abandoned:
+            db.execute(delete(HeatmapTile).where(HeatmapTile.generation.in_(abandoned)))
+            db.execute(delete(HeatmapGeneration).where(HeatmapGeneration.generation.in_(abandoned)))
+
+        live, _ = generation_state(db)
+        generation = max(live, db.scalar(select(func.max(HeatmapTile.generation))) or 0) + 1
+        started = datetime.utcnow()
+        fence = started + timedelta(seconds=fence_seconds)
+        db.add(HeatmapGeneration(generation=generation, status='building', fence_at=fence))
+        db.commit()
+        print(f"building heatmap generation {generation}, fence at {fence.isoformat()}")
+
+        try:
+            runs, tiles = rasterize_runs(db, pool, workers, generation, batch_size, flush_tiles, None, started)
+            # Runs created between the start and the fence, once they are all committed
+            time.sleep(max((fence + COMMIT_GRACE - datetime.utcnow()).total_seconds(), 0))
+            late_runs, late_tiles = rasterize_runs(db, pool, workers, generation, batch_size, flush_tiles, started, fence)
+            runs += late_runs
+            tiles += late_tiles
+
+            db.execute(delete(HeatmapGeneration).where(HeatmapGeneration.status == 'live'))
+            db.execute(update(HeatmapGeneration).where(HeatmapGeneration.generation == generation).values(status='live'))
+            db.commit()
+        except BaseException:
+            db.rollback()
+            db.execute(delete(HeatmapTile).where(HeatmapTile.generation == generation))
+            db.execute(delete(HeatmapGeneration).where(HeatmapGeneration.generation == generation))
+            db.commit()
+            raise
+
+        # Old tiles are dropped once every API worker has switched to the new generation
+        print(f"generation {generation} is live; dropping the old tiles in {fence_seconds:.0f}s")
+        time.sleep(fence_seconds)
+        db.execute(delete(HeatmapTile).where(HeatmapTile.generation < generation))
+        db.commit()
+
+    print(f"rasterized {runs} runs into {tiles} tile writes")
+    return runs
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--batch-size", type=int, default=500, help="runs per rasterizing task")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help="rasterizing processes")
+    parser.add_argument("--flush-tiles", type=int, default=5000, help="tiles held in memory before merging")
+    parser.add_argument("--fence-seconds", type=float, default=None,
+                        help="time for API workers to notice the build (default 3 x HEATMAP_FLUSH_SECONDS, at least 30)")
+    args = parser.parse_args()
+    build(args.batch_size, args.workers, args.flush_tiles, args.fence_seconds)
@@ -0,0 +1,59 @@
+"""
+Store the simplified levels of detail (preview, thumbnail) for runs saved
+before they were computed at ingest, in batches.
+
+Run from the backend directory:
+    python -m scripts.build_route_levels [--batch-size 1000] [--dry-run]
+"""
+import argparse
+from sqlalchemy import select, update
+from app.database import SessionLocal
+from app.models.run import Run
+from app.services.route_codec import RouteCodec, ROUTE_LEVELS
+
+
+def build(batch_size: int = 1000, dry_run: bool = False) -> int:
+    """Simplify runs without stored levels; returns the number of runs updated"""
+    updated = 0
+    last_id = None
+    # The smallest budget; shorter routes have no levels to store
+    min_points = min(ROUTE_LEVELS.values())
+
+    with SessionLocal() as db:
+        while True:
+            query = select(Run.id, Run.route_polyline).where(
+                Run.route_polyline_preview.is_(None),
+                Run.route_polyline_thumbnail.is_(None)
+            ).order_by(Run.id).limit(batch_size)
+            if last_id is not None:
+                query = query.where(Run.id > last_id)
+
+            rows = db.execute(query).all()
+            if not rows:
+                break
+            last_id = rows[-1].id
+
+            updates = []
+            for row in rows:
+                coords = RouteCodec.decode_stored(row.route_polyline)
+                if len(coords) <= min_points:
+                    continue
+                levels = RouteCodec.encode_levels(coords)
+                updates.append({"id": row.id, **{f"route_polyline_{level}": value for level, value in levels.items()}})
+
+            if updates and not dry_run:
+                db.execute(update(Run), updates)
+                db.commit()
+
+            updated += len(updates)
+            print(f"simplified {updated} runs")
+
+    return updated
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--batch-size", type=int, default=1000)
+    parser.add_argument("--dry-run", action="store_true")
+    args = parser.parse_args()
+    build(args.batch_size, args.dry_run)
@@ -0,0 +1,65 @@
+"""
+Fill in start_cell / end_cell for runs saved before they were computed at
+ingest, in batches.
+
+Run from the backend directory:
+    python -m scripts.build_spatial_cells [--batch-size 5000]
+"""
+import argparse
+import numpy as np
+from sqlalchemy import or_, select, update
+from app.database import SessionLocal
+from app.models.run import Run
+from app.services.spatial_index import cell_ids
+
+
+def _cells(lats, lngs) -> list:
+    """Cell ids, None where a coordinate is missing"""
+    lats = np.array(lats, dtype=np.float64)
+    lngs = np.array(lngs, dtype=np.float64)
+    cells = cell_ids(np.nan_to_num(lats), np.nan_to_num(lngs)).tolist()
+    missing = np.isnan(lats) | np.isnan(lngs)
+    return [None if m else c for c, m in zip(cells, missing.tolist())]
+
+
+def build(batch_size: int = 5000) -> int:
+    """Compute missing cell ids; returns the number of runs updated"""
+    updated = 0
+    last_id = None
+
+    with SessionLocal() as db:
+        while True:
+            query = select(Run.id, Run.start_lat, Run.start_lng, Run.end_lat, Run.end_lng).where(
+                or_(Run.start_cell.is_(None), Run.end_cell.is_(None)),
+                Run.start_lat.is_not(None)
+            ).order_by(Run.id).limit(batch_size)
+            if last_id is not None:
+                query = query.where(Run.id > last_id)
+
+            rows = db.execute(query).all()
+            if not rows:
+                break
+            last_id = rows[-1].id
+
+            ids, start_lats, start_lngs, end_lats, end_lngs = zip(*rows)
+            db.execute(update(Run), [
+                {"id": run_id, "start_cell": start, "end_cell": end}
+                for run_id, start, end in zip(
+                    ids,
+                    _cells(start_lats, start_lngs),
+                    _cells(end_lats, end_lngs)
+                )
+            ])
+            db.commit()
+
+            updated += len(rows)
+            print(f"indexed {updated} runs")
+
+    return updated
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--batch-size", type=int, default=5000)
+    args = parser.parse_args()
+    build(args.batch_size)
@@ -0,0 +1,51 @@
+"""
+Export runs as ndjson, csv or gpx, for one user or everyone, streamed in
+batches from a server-side cursor so memory stays flat on any history size.
+
+Run from the backend directory:
+    python -m scripts.export_runs [--user EMAIL] [--format ndjson] [--gzip] [--output FILE]
+"""
+import argparse
+import sys
+from sqlalchemy import select
+from app.database import SessionLocal
+from app.models.user import User
+from app.services.run_export import EXPORT_FORMATS, ExportEncoder, export_filename, export_query
+
+
+def export(output, export_format: str = "ndjson", email: str = None, compress: bool = False) -> int:
+    """Write the export to a binary file object; returns the number of runs written"""
+    encoder = ExportEncoder(EXPORT_FORMATS[export_format], compress)
+    written = 0
+
+    with SessionLocal() as db:
+        user_id = None
+        if email is not None:
+            user_id = db.scalar(select(User.id).where(User.email == email))
+            if user_id is None:
+                raise SystemExit(f"no user with email {email}")
+
+        output.write(encoder.begin())
+        for partition in db.execute(export_query(user_id)).mappings().partitions():
+            output.write(encoder.partition(partition))
+            written += len(partition)
+        output.write(encoder.end())
+
+    return written
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--user", help="email of the user to export (default: every user)")
+    parser.add_argument("--format", choices=list(EXPORT_FORMATS), default="ndjson")
+    parser.add_argument("--gzip", action="store_true", help="gzip the output")
+    parser.add_argument("--output", help="output file, '-' for stdout (default: runs.<format>[.gz])")
+    args = parser.parse_args()
+
+    path = args.output or export_filename(EXPORT_FORMATS[args.format], args.gzip)
+    if path == "-":
+        count = export(sys.stdout.buffer, args.format, args.user, args.gzip)
+    else:
+        with open(path, "wb") as f:
+            count = export(f, args.format, args.user, args.gzip)
+    print(f"exported {count} runs to {path}", file=sys.stderr)
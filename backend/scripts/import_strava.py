@@ -0,0 +1,30 @@
+"""
+Import a user's Strava run history from the command line.
+
+Run from the backend directory:
+    python -m scripts.import_strava <user_id> [--after UNIX_TIME]
+"""
+import argparse
+import asyncio
+from uuid import UUID
+from app.database import AsyncSessionLocal
+from app.services.strava_import import import_strava_history, strava_client
+
+
+async def main(user_id: UUID, after: int = None):
+    job = await import_strava_history(AsyncSessionLocal, user_id, after=after)
+    await strava_client.aclose()
+    print(f"{job.status}: {job.imported} runs imported, {job.skipped} skipped, {job.rejected} rejected "
+          f"from {job.activities} activities on {job.pages} pages "
+          f"({strava_client.requests} requests, {strava_client.rate_limited} rate limited, "
+          f"{strava_client.retries} retries)")
+    if job.error:
+        print(f"error: {job.error}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("user_id", type=UUID)
+    parser.add_argument("--after", type=int, default=None, help="only activities started after this unix time")
+    args = parser.parse_args()
+    asyncio.run(main(args.user_id, args.after))
@@ -0,0 +1,53 @@
+"""
+Convert runs whose route_polyline is still stored as a JSON list of points
+into Google encoded polylines, in batches.
+
+Run from the backend directory:
+    python -m scripts.migrate_route_polylines [--batch-size 1000] [--dry-run]
+"""
+import argparse
+from sqlalchemy import select, update
+from app.database import SessionLocal
+from app.models.run import Run
+from app.services.route_codec import RouteCodec
+
+
+def migrate(batch_size: int = 1000, dry_run: bool = False) -> int:
+    """Re-encode legacy JSON routes; returns the number of runs converted"""
+    converted = 0
+    last_id = None
+
+    with SessionLocal() as db:
+        while True:
+            query = select(Run.id, Run.route_polyline).where(
+                Run.route_polyline.like('[%')
+            ).order_by(Run.id).limit(batch_size)
+            if last_id is not None:
+                query = query.where(Run.id > last_id)
+
+            rows = db.execute(query).all()
+            if not rows:
+                break
+            last_id = rows[-1].id
+
+            updates = [
+                {"id": row.id, "route_polyline": RouteCodec.encode(RouteCodec.decode_stored(row.route_polyline))}
+                for row in rows
+                if RouteCodec.is_legacy_json(row.route_polyline)
+            ]
+            if updates and not dry_run:
+                db.execute(update(Run), updates)
+                db.commit()
+
+            converted += len(updates)
+            print(f"converted {converted} runs")
+
+    return converted
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--batch-size", type=int, default=1000)
+    parser.add_argument("--dry-run", action="store_true")
+    args = parser.parse_args()
+    migrate(args.batch_size, args.dry_run)
@@ -0,0 +1,116 @@
+"""
+Bring an existing database up to the current models. Base.metadata.create_all
+(run at app startup) creates missing tables but never alters existing ones,
+so this adds the missing columns, indexes and unique constraints of existing
+tables. It also recreates the derived heatmap_tiles table when its primary
+key has changed. Safe to run repeatedly.
+
+New columns are added as NULL. Fill them in afterwards with:
+    python -m scripts.build_route_levels      # runs.route_polyline_preview / _thumbnail
+    python -m scripts.build_spatial_cells     # runs.start_cell / end_cell
+    python -m scripts.revalidate_runs         # runs.validation_status / _flags
+    python -m scripts.backfill_personal_records
+    python -m scripts.rebuild_training_rollups
+    python -m scripts.build_heatmap
+
+Run from the backend directory:
+    python -m scripts.migrate_schema [--dry-run]
+"""
+import argparse
+from sqlalchemy import UniqueConstraint, func, inspect, select
+from sqlalchemy.schema import CreateIndex, CreateTable, DropTable
+from app.database import Base, engine
+import app.models  # noqa: F401  (registers every table)
+from app.models.run import Run
+
+# Rebuildable from other tables, so a primary key change recreates them empty
+DERIVED_TABLES = {"heatmap_tiles"}
+
+
+def _add_column_sql(table, column) -> str:
+    column_type = column.type.compile(dialect=engine.dialect)
+    return f'ALTER TABLE {table.name} ADD COLUMN {column.name} {column_type}'
+
+
+def _unique_index_sql(table, constraint) -> str:
+    # A unique index rather than ALTER TABLE ADD CONSTRAINT, which SQLite lacks;
+    # ON CONFLICT (...) upserts work against either
+    columns = ", ".join(column.name for column in constraint.columns)
+    return f'CREATE UNIQUE INDEX {constraint.name} ON {table.name} ({columns})'
+
+
+def _duplicate_imports(conn) -> int:
+    """Imported activities stored more than once, which block uq_runs_user_source_external_id"""
+    duplicates = select(Run.user_id).where(Run.external_id.is_not(None)).group_by(
+        Run.user_id, Run.source, Run.external_id
+    ).having(func.count() > 1).subquery()
+    return conn.scalar(select(func.count()).select_from(duplicates))
+
+
+def plan(conn) -> list:
+    """DDL statements that bring the existing tables up to the models"""
+    inspector = inspect(conn)
+    existing = set(inspector.get_table_names())
+    statements = []
+
+    for table in Base.metadata.sorted_tables:
+        if table.name not in existing:
+            continue  # created by create_all
+
+        primary_key = inspector.get_pk_constraint(table.name)["constrained_columns"]
+        if primary_key != [column.name for column in table.primary_key.columns]:
+            if table.name not in DERIVED_TABLES:
+                raise SystemExit(f"{table.name}: primary key changed from {primary_key}; migrate it by hand")
+            statements.append(str(DropTable(table).compile(dialect=engine.dialect)))
+            statements.append(str(CreateTable(table).compile(dialect=engine.dialect)))
+            statements += [str(CreateIndex(index).compile(dialect=engine.dialect)) for index in table.indexes]
+            continue
+
+        columns = {column["name"] for column in inspector.get_columns(table.name)}
+        for column in table.columns:
+            if column.name in columns:
+                continue
+            if not column.nullable:
+                raise SystemExit(f"{table.name}.{column.name}: NOT NULL column needs a hand-written migration")
+            statements.append(_add_column_sql(table, column))
+
+        indexes = {index["name"] for index in inspector.get_indexes(table.name)}
+        indexes |= {constraint["name"] for constraint in inspector.get_unique_constraints(table.name)}
+        for index in table.indexes:
+            if index.name not in indexes:
+                statements.append(str(CreateIndex(index).compile(dialect=engine.dialect)))
+        for constraint in table.constraints:
+            if not isinstance(constraint, UniqueConstraint) or constraint.name in indexes:
+                continue
+            if table is Run.__table__:
+                duplicates = _duplicate_imports(conn)
+                if duplicates:
+                    raise SystemExit(
+                        f"{duplicates} imported activities are stored more than once; "
+                        "delete the extra runs before adding uq_runs_user_source_external_id"
+                    )
+            statements.append(_unique_index_sql(table, constraint))
+
+    return statements
+
+
+def migrate(dry_run: bool = False) -> int:
+    """Returns the number of DDL statements run (or planned, with dry_run)"""
+    with engine.begin() as conn:
+        statements = plan(conn)
+        for statement in statements:
+            print(statement.strip())
+            if not dry_run:
+                conn.exec_driver_sql(statement)
+        if not dry_run:
+            Base.metadata.create_all(bind=conn)
+
+    print(f"{len(statements)} statements {'planned' if dry_run else 'applied'}")
+    return len(statements)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--dry-run", action="store_true", help="print the DDL without running it")
+    args = parser.parse_args()
+    migrate(args.dry_run)
@@ -0,0 +1,100 @@
+"""
+Local stand-in for the Strava API to exercise the importer: serves a
+synthetic activity history, enforces a request rate limit with 429s and
+can inject server errors. Point STRAVA_API_URL / STRAVA_OAUTH_URL at it and
+set STRAVA_RATE_LIMIT_WINDOW_SECONDS to --window-seconds.
+
+Run from the backend directory:
+    python -m scripts.mock_strava_server [--activities 2000] [--rate-limit 100] [--port 8081]
+"""
+import argparse
+import random
+import time
+from datetime import datetime, timedelta
+import uvicorn
+from fastapi import FastAPI, Header, HTTPException, Request
+from fastapi.responses import JSONResponse
+from app.services.route_codec import RouteCodec
+
+
+def make_activities(count: int, seed: int = 0) -> list:
+    """Synthetic history, oldest first; one in five is a ride"""
+    rng = random.Random(seed)
+    start = datetime(2020, 1, 1, 7, 0, 0)
+    activities = []
+    for i in range(count):
+        kind = "Ride" if i % 5 == 4 else "Run"
+        distance_m = rng.uniform(3000, 21000)
+        moving_time = int(distance_m / 1000 * rng.uniform(270, 420))
+        lat, lng = 37.5 + rng.uniform(-0.05, 0.05), 127.0 + rng.uniform(-0.05, 0.05)
+        points = [(lat + k * distance_m / 111_195 / 99, lng) for k in range(100)]
+        activities.append({
+            "id": 10_000_000 + i,
+            "type": kind,
+            "sport_type": kind,
+            "distance": distance_m,
+            "moving_time": moving_time,
+            "elapsed_time": moving_time + 60,
+            "start_date": (start + timedelta(days=i)).strftime("%Y-%m-%dT%H:%M:%SZ"),
+            "start_latlng": [lat, lng],
+            "end_latlng": list(points[-1]),
+            "map": {"summary_polyline": RouteCodec.encode(points)},
+        })
+    return activities
+
+
+def create_app(activities: list, rate_limit: int, window_seconds: float, error_rate: float) -> FastAPI:
+    app = FastAPI(title="Mock Strava")
+    app.state.window = None
+    app.state.usage = 0
+    app.state.tokens = {"mock-access-token"}
+
+    @app.middleware("http")
+    async def limit_rate(request: Request, call_next):
+        # Windows start on wall-clock multiples, like Strava's quarter hours
+        now = time.time()
+        window = int(now // window_seconds)
+        if window != app.state.window:
+            app.state.window, app.state.usage = window, 0
+        app.state.usage += 1
+        headers = {"X-RateLimit-Limit": f"{rate_limit},{rate_limit * 10}",
+                   "X-RateLimit-Usage": f"{app.state.usage},{app.state.usage}"}
+        if app.state.usage > rate_limit:
+            return JSONResponse({"message": "Rate Limit Exceeded"}, status_code=429, headers=headers)
+        if random.random() < error_rate:
+            return JSONResponse({"message": "Server Error"}, status_code=503)
+        response = await call_next(request)
+        response.headers.update(headers)
+        return response
+
+    @app.get("/api/v3/athlete/activities")
+    async def list_activities(page: int = 1, per_page: int = 30, after: int = None,
+                              authorization: str = Header("")):
+        if authorization.removeprefix("Bearer ") not in app.state.tokens:
+            raise HTTPException(status_code=401, detail="Authorization Error")
+        items = activities
+        if after is not None:
+            items = [a for a in items if datetime.strptime(a["start_date"], "%Y-%m-%dT%H:%M:%SZ").timestamp() > after]
+        return items[(page - 1) * per_page:page * per_page]
+
+    @app.post("/oauth/token")
+    async def refresh_token():
+        token = f"mock-access-token-{len(app.state.tokens)}"
+        app.state.tokens.add(token)
+        return {"access_token": token, "refresh_token": "mock-refresh-token", "expires_at": int(time.time()) + 21600}
+
+    return app
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--activities", type=int, default=2000)
+    parser.add_argument("--rate-limit", type=int, default=100, help="requests per window")
+    parser.add_argument("--window-seconds", type=float, default=15.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--port", type=int, default=8081)
+    args = parser.parse_args()
+    uvicorn.run(
+        create_app(make_activities(args.activities), args.rate_limit, args.window_seconds, args.error_rate),
+        host="127.0.0.1", port=args.port
+    )
@@ -0,0 +1,22 @@
+"""
+Rebuild every leaderboard from the users table.
+
+Needed after enabling LEADERBOARD_REDIS or if the Redis boards were lost;
+in-process boards are rebuilt automatically at startup.
+
+Run from the backend directory:
+    python -m scripts.rebuild_leaderboards
+"""
+import asyncio
+from app.database import AsyncSessionLocal
+from app.services.leaderboard import leaderboards
+
+
+async def main():
+    async with AsyncSessionLocal() as db:
+        users = await leaderboards.rebuild(db)
+    print(f"Rebuilt leaderboards for {users} users")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
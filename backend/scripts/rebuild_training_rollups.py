@@ -0,0 +1,78 @@
+"""
+Rebuild the daily, weekly and monthly training rollups from the stored
+counted runs, one user at a time: each user's rollups are deleted and
+rewritten in a single transaction, so the analytics API never sees a
+half-built user. Rollups of users without counted runs are removed.
+
+Rollups are kept up to date at ingest; run this after revalidating runs
+(python -m scripts.revalidate_runs) or when changing the pace buckets, ideally
+while ingestion is paused, since runs ingested mid-rebuild of their user
+can be missed.
+
+Run from the backend directory:
+    python -m scripts.rebuild_training_rollups [--user EMAIL] [--chunk-size 1000]
+"""
+import argparse
+from sqlalchemy import delete, select
+from app.database import SessionLocal
+from app.models.run import Run
+from app.services.run_validation import counted_runs
+from app.models.training_rollup import TrainingRollup
+from app.models.user import User
+from app.services.training_rollups import rollup_rows, upsert_rollups_statement
+
+
+def rebuild_user(db, user_id, chunk_size: int = 1000) -> int:
+    """Returns the number of rollup rows written for the user"""
+    runs = db.execute(
+        select(Run.user_id, Run.started_at, Run.distance_km, Run.duration_seconds, Run.avg_pace)
+        .where(Run.user_id == user_id, counted_runs(Run.validation_status))
+    ).mappings().all()
+    rows = rollup_rows(runs)
+
+    db.execute(delete(TrainingRollup).where(TrainingRollup.user_id == user_id))
+    for i in range(0, len(rows), chunk_size):
+        db.execute(upsert_rollups_statement(db, rows[i:i + chunk_size]))
+    db.commit()
+    return len(rows)
+
+
+def rebuild(email: str = None, chunk_size: int = 1000) -> int:
+    """Returns the number of users rebuilt"""
+    with SessionLocal() as db:
+        if email is not None:
+            user_id = db.scalar(select(User.id).where(User.email == email))
+            if user_id is None:
+                raise SystemExit(f"no user with email {email}")
+            rows = rebuild_user(db, user_id, chunk_size)
+            print(f"rebuilt {rows} rollups for {email}")
+            return 1
+
+        users = 0
+        rows = 0
+        last_id = None
+        while True:
+            query = select(User.id).order_by(User.id).limit(1000)
+            if last_id is not None:
+                query = query.where(User.id > last_id)
+            user_ids = db.scalars(query).all()
+            if not user_ids:
+                break
+            last_id = user_ids[-1]
+
+            for user_id in user_ids:
+                rows += rebuild_user(db, user_id, chunk_size)
+            users += len(user_ids)
+            print(f"rebuilt {users} users, {rows} rollups")
+
+        db.execute(delete(TrainingRollup).where(~TrainingRollup.user_id.in_(select(User.id))))
+        db.commit()
+    return users
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--user", dest="email", default=None, help="only rebuild this user's rollups")
+    parser.add_argument("--chunk-size", type=int, default=1000, help="rollup rows per insert")
+    args = parser.parse_args()
+    rebuild(args.email, args.chunk_size)
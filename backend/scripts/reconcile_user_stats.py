@@ -0,0 +1,44 @@
+"""
+Recompute every user's lifetime totals (distance, duration, run count,
+average pace) from the runs table, in batches of users.
+
+Run from the backend directory:
+    python -m scripts.reconcile_user_stats [--batch-size 5000]
+"""
+import argparse
+from sqlalchemy import select
+from app.database import SessionLocal
+from app.models.user import User
+from app.services.user_stats import reconcile_user_stats_statement
+
+
+def reconcile(batch_size: int = 5000) -> int:
+    """Reconcile all users; returns the number of users processed"""
+    processed = 0
+    last_id = None
+
+    with SessionLocal() as db:
+        while True:
+            query = select(User.id).order_by(User.id).limit(batch_size)
+            if last_id is not None:
+                query = query.where(User.id > last_id)
+
+            user_ids = db.scalars(query).all()
+            if not user_ids:
+                break
+            last_id = user_ids[-1]
+
+            db.execute(reconcile_user_stats_statement(user_ids))
+            db.commit()
+
+            processed += len(user_ids)
+            print(f"reconciled {processed} users")
+
+    return processed
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--batch-size", type=int, default=5000)
+    args = parser.parse_args()
+    reconcile(args.batch_size)
@@ -0,0 +1,86 @@
+"""
+Re-run route validation over stored runs, in keyset batches validated with
+one vectorized call each, and record each run's verdict. Users whose runs
+moved in or out of 'rejected' get their lifetime totals reconciled; rebuild
+the leaderboards and training rollups afterwards
+(python -m scripts.rebuild_leaderboards, python -m scripts.rebuild_training_rollups).
+
+Run from the backend directory:
+    python -m scripts.revalidate_runs [--batch-size 2000] [--dry-run]
+"""
+import argparse
+from collections import Counter
+from sqlalchemy import select, update
+from app.database import SessionLocal
+from app.models.run import Run
+from app.services.route_codec import RouteCodec
+from app.services.run_validation import constant_pace_times, validate_runs
+from app.services.user_stats import reconcile_user_stats_statement
+
+
+def validate_batch(rows) -> list:
+    """Verdicts for a batch of (id, user_id, route, duration, distance, source, status) rows"""
+    routes = [RouteCodec.decode_stored(row.route_polyline) for row in rows]
+    # Imported routes are simplified summaries without point times or a comparable distance
+    imported = [row.source != 'app' for row in rows]
+    return validate_runs(
+        routes,
+        [row.duration_seconds for row in rows],
+        [None if imported_ else row.distance_km for row, imported_ in zip(rows, imported)],
+        [constant_pace_times(route, row.duration_seconds) if imported_ else None
+         for route, row, imported_ in zip(routes, rows, imported)]
+    )
+
+
+def revalidate(batch_size: int = 2000, dry_run: bool = False) -> Counter:
+    """Returns how many runs ended up with each status"""
+    statuses = Counter()
+    changed_users = set()
+    last_id = None
+
+    with SessionLocal() as db:
+        while True:
+            query = select(
+                Run.id, Run.user_id, Run.route_polyline, Run.duration_seconds,
+                Run.distance_km, Run.source, Run.validation_status
+            ).where(
+                # Left to the run finalizer
+                Run.validation_status.is_distinct_from('pending')
+            ).order_by(Run.id).limit(batch_size)
+            if last_id is not None:
+                query = query.where(Run.id > last_id)
+
+            rows = db.execute(query).all()
+            if not rows:
+                break
+            last_id = rows[-1].id
+
+            verdicts = validate_batch(rows)
+            for row, verdict in zip(rows, verdicts):
+                statuses[verdict.status] += 1
+                if (row.validation_status == 'rejected') != (verdict.status == 'rejected'):
+                    changed_users.add(row.user_id)
+
+            if not dry_run:
+                db.execute(update(Run), [
+                    {"id": row.id, "validation_status": verdict.status, "validation_flags": verdict.flags_text}
+                    for row, verdict in zip(rows, verdicts)
+                ])
+                db.commit()
+
+            print(f"validated {sum(statuses.values())} runs: {dict(statuses)}")
+
+        if changed_users and not dry_run:
+            db.execute(reconcile_user_stats_statement(list(changed_users)))
+            db.commit()
+        print(f"{len(changed_users)} users with runs moved in or out of rejected")
+
+    return statuses
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--batch-size", type=int, default=2000)
+    parser.add_argument("--dry-run", action="store_true", help="report verdicts without saving them")
+    args = parser.parse_args()
+    revalidate(args.batch_size, args.dry_run)
@@ -0,0 +1,34 @@
+"""
+Settle ELO for completed battles in batches, and optionally run the
+season-end league tier recompute.
+
+Run from the backend directory:
+    python -m scripts.settle_battles [--batch-size 5000] [--season-end]
+"""
+import argparse
+import asyncio
+from app.database import AsyncSessionLocal
+from app.services.ranking import settle_battles, recompute_league_tiers
+
+
+async def main(batch_size: int, season_end: bool):
+    settled = 0
+    async with AsyncSessionLocal() as db:
+        while True:
+            count = await settle_battles(db, batch_size)
+            if not count:
+                break
+            settled += count
+            print(f"settled {settled} battles")
+
+        if season_end:
+            users = await recompute_league_tiers(db)
+            print(f"recomputed league tiers: {users} users changed")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--batch-size", type=int, default=5000)
+    parser.add_argument("--season-end", action="store_true")
+    args = parser.parse_args()
+    asyncio.run(main(args.batch_size, args.season_end))
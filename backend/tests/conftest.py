@@ -0,0 +1,34 @@
+import os
+import tempfile
+
+# Settings are read at import, so the test database is configured before any app module loads
+_db_dir = tempfile.mkdtemp(prefix="leagueofrun-tests-")
+os.environ.update(
+    DATABASE_URL=f"sqlite:///{os.path.join(_db_dir, 'test.db')}",
+    REDIS_URL="",
+    SECRET_KEY="test-secret",
+    RUN_INGEST_QUEUE="False",
+)
+
+import pytest
+from fastapi.testclient import TestClient
+
+
+@pytest.fixture(scope="session")
+def client():
+    from app.main import app
+    with TestClient(app) as test_client:
+        yield test_client
+
+
+@pytest.fixture
+def auth_user(client):
+    """A freshly registered user: (user id, Authorization headers)"""
+    import uuid
+    name = uuid.uuid4().hex[:12]
+    response = client.post("/api/v1/auth/register", json={
+        "email": f"{name}@example.com", "username": name, "password": "password1"
+    })
+    assert response.status_code == 201, response.text
+    headers = {"Authorization": f"Bearer {response.json()['access_token']}"}
+    return uuid.UUID(client.get("/api/v1/auth/me", headers=headers).json()["id"]), headers
@@ -0,0 +1,69 @@
+import json
+import numpy as np
+import pytest
+from app.services.route_codec import RouteCodec, ROUTE_LEVELS
+
+
+def random_walk(n, seed=0):
+    rng = np.random.default_rng(seed)
+    steps = rng.normal(scale=1e-4, size=(n, 2))
+    return np.array([37.5, 127.0]) + np.cumsum(steps, axis=0)
+
+
+def test_encode_matches_reference_polyline():
+    # Example from Google's encoded polyline documentation
+    route = [(38.5, -120.2), (40.7, -120.95), (43.252, -126.453)]
+    assert RouteCodec.encode(route) == "_p~iF~ps|U_ulLnnqC_mqNvxq`@"
+    np.testing.assert_allclose(RouteCodec.decode("_p~iF~ps|U_ulLnnqC_mqNvxq`@"), route)
+
+
+def test_round_trip_within_precision():
+    route = random_walk(5000)
+    decoded = RouteCodec.decode(RouteCodec.encode(route))
+    assert decoded.shape == route.shape
+    assert np.abs(decoded - route).max() <= 0.5e-5 + 1e-12
+
+
+def test_round_trip_large_jumps_and_negative_coordinates():
+    route = [(-89.99999, -179.99999), (89.99999, 179.99999), (0.0, 0.0), (-33.86882, 151.20929)]
+    np.testing.assert_allclose(RouteCodec.decode(RouteCodec.encode(route)), route, atol=1e-5)
+
+
+def test_appended_chunk_decodes_as_one_route():
+    route = random_walk(300, seed=1)
+    head = RouteCodec.encode(route[:120])
+    tail = RouteCodec.encode(route[120:], previous=tuple(route[119]))
+    np.testing.assert_allclose(RouteCodec.decode(head + tail), RouteCodec.decode(RouteCodec.encode(route)))
+
+
+def test_empty_route():
+    assert RouteCodec.encode([]) == ""
+    assert RouteCodec.decode("").shape == (0, 2)
+
+
+def test_invalid_polyline():
+    with pytest.raises(ValueError):
+        RouteCodec.decode("abc\x01")
+
+
+def test_decode_stored_reads_legacy_json():
+    route = [{"lat": 37.5, "lng": 127.0}, {"lat": 37.50012, "lng": 127.00034}]
+    stored = json.dumps(route)
+    assert RouteCodec.is_legacy_json(stored)
+    np.testing.assert_allclose(RouteCodec.decode_stored(stored), [[37.5, 127.0], [37.50012, 127.00034]])
+    np.testing.assert_allclose(RouteCodec.decode_stored(RouteCodec.encode([(37.5, 127.0)])), [[37.5, 127.0]])
+
+
+def test_encode_levels_respects_budgets():
+    route = random_walk(3000, seed=2)
+    levels = RouteCodec.encode_levels(route)
+    for level, max_points in ROUTE_LEVELS.items():
+        points = RouteCodec.decode(levels[level])
+        assert 2 <= len(points) <= max_points
+        # Endpoints always survive
+        np.testing.assert_allclose(points[[0, -1]], route[[0, -1]], atol=1e-5)
+
+
+def test_encode_levels_skips_small_routes():
+    levels = RouteCodec.encode_levels(random_walk(50))
+    assert levels == {level: None for level in ROUTE_LEVELS}
@@ -0,0 +1,77 @@
+import math
+import numpy as np
+from app.services.route_engine import RouteEngine
+
+
+def project(coords):
+    """The local equirectangular projection used by simplification_ranks"""
+    meters_per_degree = RouteEngine.EARTH_RADIUS_KM * 1000 * math.pi / 180
+    return np.column_stack((
+        coords[:, 1] * meters_per_degree * math.cos(math.radians(coords[:, 0].mean())),
+        coords[:, 0] * meters_per_degree,
+    ))
+
+
+def reference_douglas_peucker(xy, tolerance_m):
+    """Textbook recursive Douglas-Peucker; indices of the kept points"""
+    kept = {0, len(xy) - 1}
+
+    def split(lo, hi):
+        if hi - lo < 2:
+            return
+        a, b = xy[lo], xy[hi]
+        ab = b - a
+        best, best_distance = None, -1.0
+        for i in range(lo + 1, hi):
+            ap = xy[i] - a
+            norm = ab @ ab
+            t = min(max((ap @ ab) / norm, 0.0), 1.0) if norm > 0 else 0.0
+            distance = float(np.hypot(*(ap - t * ab)))
+            if distance > best_distance:
+                best, best_distance = i, distance
+        if best_distance > tolerance_m:
+            kept.add(best)
+            split(lo, best)
+            split(best, hi)
+
+    split(0, len(xy) - 1)
+    return sorted(kept)
+
+
+def test_straight_line_keeps_only_endpoints():
+    route = np.column_stack((np.linspace(37.5, 37.6, 200), np.full(200, 127.0)))
+    assert RouteEngine.simplify(route, tolerance_m=1).tolist() == [0, 199]
+
+
+def test_matches_reference_at_several_tolerances():
+    rng = np.random.default_rng(3)
+    route = np.array([37.5, 127.0]) + np.cumsum(rng.normal(scale=1e-4, size=(400, 2)), axis=0)
+    ranks = RouteEngine.simplification_ranks(route)
+    xy = project(route)
+    for tolerance_m in (1.0, 5.0, 20.0, 100.0):
+        kept = RouteEngine.simplify(route, tolerance_m=tolerance_m, ranks=ranks).tolist()
+        assert kept == reference_douglas_peucker(xy, tolerance_m)
+
+
+def test_detour_survives():
+    route = np.column_stack((np.linspace(37.5, 37.51, 101), np.full(101, 127.0)))
+    route[50, 1] += 0.001  # ~90 m sideways
+    assert 50 in RouteEngine.simplify(route, tolerance_m=10).tolist()
+
+
+def test_point_budget_keeps_most_significant_points():
+    rng = np.random.default_rng(4)
+    route = np.array([37.5, 127.0]) + np.cumsum(rng.normal(scale=1e-4, size=(2000, 2)), axis=0)
+    ranks = RouteEngine.simplification_ranks(route)
+    kept = RouteEngine.simplify(route, max_points=100, ranks=ranks)
+    assert len(kept) == 100
+    assert np.all(np.diff(kept) > 0)
+    assert kept[0] == 0 and kept[-1] == len(route) - 1
+    dropped = np.setdiff1d(np.arange(len(route)), kept)
+    assert ranks[kept].min() >= ranks[dropped].max()
+
+
+def test_tiny_routes():
+    assert RouteEngine.simplify(np.empty((0, 2))).tolist() == []
+    assert RouteEngine.simplify([(37.5, 127.0)]).tolist() == [0]
+    assert RouteEngine.simplify([(37.5, 127.0), (37.6, 127.0)]).tolist() == [0, 1]
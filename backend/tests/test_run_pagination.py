@@ -0,0 +1,66 @@
+from datetime import datetime, timedelta
+import pytest
+from app.database import SessionLocal
+from app.models.run import Run
+from app.utils.helpers import decode_cursor, encode_cursor
+
+
+def add_runs(user_id, completed_ats):
+    with SessionLocal() as db:
+        runs = [
+            Run(user_id=user_id, distance_km=5.0, duration_seconds=1800, avg_pace=6.0, avg_speed=10.0,
+                started_at=completed_at - timedelta(minutes=30), completed_at=completed_at)
+            for completed_at in completed_ats
+        ]
+        db.add_all(runs)
+        db.commit()
+        return {run.id: run.completed_at for run in runs}
+
+
+def all_pages(client, headers, limit):
+    ids, cursor, pages = [], None, 0
+    while True:
+        params = {"limit": limit}
+        if cursor:
+            params["cursor"] = cursor
+        response = client.get("/api/v1/runs", headers=headers, params=params)
+        assert response.status_code == 200
+        ids += [run["id"] for run in response.json()]
+        pages += 1
+        cursor = response.headers.get("X-Next-Cursor")
+        if cursor is None:
+            return ids, pages
+
+
+def test_cursor_round_trip():
+    completed_at = datetime(2026, 1, 2, 3, 4, 5)
+    assert decode_cursor(encode_cursor(completed_at, "abc")) == [completed_at.isoformat(), "abc"]
+    with pytest.raises(ValueError):
+        decode_cursor("not a cursor!")
+
+
+def test_pages_cover_every_run_once_newest_first(client, auth_user):
+    user_id, headers = auth_user
+    base = datetime(2026, 1, 1, 8)
+    # Repeated timestamps make the id the tie-breaker
+    runs = add_runs(user_id, [base + timedelta(hours=i // 3) for i in range(23)])
+
+    ids, pages = all_pages(client, headers, limit=5)
+    assert pages == 5
+    assert len(ids) == len(set(ids)) == 23
+    expected = sorted(runs, key=lambda run_id: (runs[run_id], run_id), reverse=True)
+    assert ids == [str(run_id) for run_id in expected]
+
+
+def test_last_page_has_no_cursor(client, auth_user):
+    user_id, headers = auth_user
+    add_runs(user_id, [datetime(2026, 2, 1) + timedelta(days=i) for i in range(4)])
+    response = client.get("/api/v1/runs", headers=headers, params={"limit": 4})
+    assert len(response.json()) == 4
+    assert "X-Next-Cursor" not in response.headers
+
+
+def test_invalid_cursor(client, auth_user):
+    _, headers = auth_user
+    response = client.get("/api/v1/runs", headers=headers, params={"cursor": "bm90IGpzb24"})
+    assert response.status_code == 400
@@ -0,0 +1,68 @@
+import numpy as np
+from app.services.run_validation import validate_run, validate_runs
+
+KM_PER_DEGREE_LAT = 111.195
+
+
+def straight_route(km, points=500, lat=37.5, lng=127.0):
+    """A northward route of `km` kilometers"""
+    return np.column_stack((lat + np.linspace(0, km / KM_PER_DEGREE_LAT, points), np.full(points, lng)))
+
+
+def test_normal_run_is_ok():
+    verdict = validate_run(straight_route(5), 1800)
+    assert verdict.status == "ok"
+    assert verdict.flags == ()
+    assert abs(verdict.distance_km - 5) < 0.01
+    assert abs(verdict.avg_pace - 6.0) < 0.05
+
+
+def test_vehicle_speed_is_rejected():
+    verdict = validate_run(straight_route(30), 1800)
+    assert verdict.status == "rejected"
+    assert "vehicle" in verdict.flags
+    assert "average_speed" in verdict.flags
+
+
+def test_teleport_is_flagged_and_not_counted():
+    route = np.concatenate((straight_route(3, 300), straight_route(3, 300, lat=38.0)))
+    verdict = validate_run(route, 1200)
+    assert "teleport" in verdict.flags
+    assert verdict.status == "flagged"
+    assert verdict.teleports == 1
+    # The jump between the two halves is left out of the distance
+    assert abs(verdict.distance_km - 6) < 0.05
+
+
+def test_claimed_distance():
+    route = straight_route(5)
+    assert validate_run(route, 1800, claimed_distance_km=5.1).status == "ok"
+    mismatch = validate_run(route, 1800, claimed_distance_km=6.0)
+    assert mismatch.status == "flagged" and "distance_mismatch" in mismatch.flags
+    overclaim = validate_run(route, 1800, claimed_distance_km=10.0)
+    assert overclaim.status == "rejected" and "distance_overclaim" in overclaim.flags
+
+
+def test_point_times_override_constant_pace():
+    route = straight_route(2, 101)
+    # The first kilometer driven in a minute, the second walked
+    times = np.concatenate((np.linspace(0, 60, 51), np.linspace(60, 1260, 51)[1:]))
+    verdict = validate_run(route, 1260, times=times)
+    assert verdict.status == "rejected"
+    assert "vehicle" in verdict.flags
+
+
+def test_no_route():
+    verdict = validate_run(np.empty((0, 2)), 1800)
+    assert verdict.status == "flagged"
+    assert verdict.flags == ("no_route",)
+    assert verdict.distance_km == 0
+
+
+def test_batch_matches_single_runs():
+    routes = [straight_route(5), straight_route(30), np.empty((0, 2)), straight_route(1, 2), straight_route(10, 2000)]
+    durations = [1800, 1800, 600, 400, 3600]
+    claimed = [5, None, None, 3, 10]
+    batch = validate_runs(routes, durations, claimed)
+    assert batch == [validate_run(r, d, c) for r, d, c in zip(routes, durations, claimed)]
+    assert [v.status for v in batch] == ["ok", "rejected", "flagged", "rejected", "ok"]
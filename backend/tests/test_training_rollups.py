@@ -0,0 +1,60 @@
+from datetime import date, datetime, timedelta, timezone
+from uuid import uuid4
+from app.services.training_rollups import range_pieces, rollup_rows
+
+
+def test_range_inside_one_month_uses_days():
+    assert range_pieces(date(2026, 3, 5), date(2026, 3, 20)) == [("day", date(2026, 3, 5), date(2026, 3, 20))]
+
+
+def test_whole_month():
+    assert range_pieces(date(2026, 2, 1), date(2026, 2, 28)) == [("month", date(2026, 2, 1), date(2026, 2, 28))]
+
+
+def test_partial_months_around_whole_months():
+    assert range_pieces(date(2026, 1, 20), date(2026, 4, 10)) == [
+        ("day", date(2026, 1, 20), date(2026, 1, 31)),
+        ("month", date(2026, 2, 1), date(2026, 3, 31)),
+        ("day", date(2026, 4, 1), date(2026, 4, 10)),
+    ]
+
+
+def test_range_crossing_one_month_boundary_without_whole_month():
+    assert range_pieces(date(2026, 1, 20), date(2026, 2, 10)) == [("day", date(2026, 1, 20), date(2026, 2, 10))]
+
+
+def test_leap_february_and_year_end():
+    assert range_pieces(date(2024, 2, 1), date(2024, 2, 29)) == [("month", date(2024, 2, 1), date(2024, 2, 29))]
+    assert range_pieces(date(2025, 12, 1), date(2026, 1, 3)) == [
+        ("month", date(2025, 12, 1), date(2025, 12, 31)),
+        ("day", date(2026, 1, 1), date(2026, 1, 3)),
+    ]
+
+
+def test_single_day():
+    assert range_pieces(date(2026, 5, 31), date(2026, 5, 31)) == [("day", date(2026, 5, 31), date(2026, 5, 31))]
+
+
+def _run(user_id, started_at):
+    return {"user_id": user_id, "started_at": started_at, "distance_km": 5.0, "duration_seconds": 1500, "avg_pace": 5.0}
+
+
+def test_rollups_use_the_utc_day_of_offset_timestamps():
+    user_id = uuid4()
+    # 00:30 on March 1st at UTC+2 is still February 28th in UTC
+    rows = rollup_rows([_run(user_id, datetime(2026, 3, 1, 0, 30, tzinfo=timezone(timedelta(hours=2))))])
+    assert {(row["period"], row["period_start"]) for row in rows} == {
+        ("day", date(2026, 2, 28)), ("week", date(2026, 2, 23)), ("month", date(2026, 2, 1)),
+    }
+
+
+def test_rollups_merge_naive_and_offset_starts_of_the_same_utc_day():
+    user_id = uuid4()
+    rows = rollup_rows([
+        _run(user_id, datetime(2026, 2, 28, 22, 0)),
+        _run(user_id, datetime(2026, 2, 28, 16, 0, tzinfo=timezone(timedelta(hours=-5)))),
+    ])
+    day = next(row for row in rows if row["period"] == "day")
+    assert day["period_start"] == date(2026, 2, 28)
+    assert day["run_count"] == 2
+    assert day["distance_km"] == 10.0